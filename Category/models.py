@@ -9,8 +9,28 @@ It includes fields for category name, slug, description, and an optional image.
 """
 
 
+from django.core.exceptions import ValidationError
 from django.db import models
-from django.utils.text import slugify
+from MyShop.slugs import save_with_unique_slug
+
+
+# Fixed routes under /store/ that a category slug would collide with
+# (see store/urls.py).
+RESERVED_SLUGS = frozenset({'search', 'catalog-stats', 'feed', 'delta'})
+
+
+def validate_slug_not_reserved(slug):
+    """
+    Rejects a category slug that names a fixed route.
+
+    Raises:
+        ValidationError: If the slug is reserved.
+    """
+    if slug in RESERVED_SLUGS:
+        raise ValidationError(
+            '"%(slug)s" is reserved for a store route.',
+            code='reserved', params={'slug': slug},
+        )
 
 
 class Category(models.Model):
@@ -23,11 +43,19 @@ class Category(models.Model):
         description (str): A text description of the category.
         cat_image (ImageField): An optional image for the category,
                                 uploaded to 'photos/categories/'
+        date_modified (datetime): When the category was last saved; drives
+                                  the delta sync endpoint.
     """
+    # The slug allocator never hands these out, and explicit slugs are
+    # validated against them.
+    RESERVED_SLUGS = RESERVED_SLUGS
+
     category_name = models.CharField(max_length=50)
-    slug = models.SlugField(max_length=100, unique=True)
+    slug = models.SlugField(max_length=100, unique=True,
+                            validators=[validate_slug_not_reserved])
     description = models.TextField()
     cat_image = models.ImageField(upload_to='photos/categories/', blank=True)
+    date_modified = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         """
@@ -52,25 +80,43 @@ class Category(models.Model):
 
         The slug is generated automatically using `slugify(category_name)`.
         If a duplicate slug exists, a numeric suffix\
-            is added to ensure uniqueness.
+            is added to ensure uniqueness (see `MyShop.slugs`).
 
         Example:
             - "electronics" → "electronics"
             - "electronics" (duplicate) → "electronics-1"
+            - "feed" (reserved) → "feed-1"
+
+        An explicit slug is checked against the reserved route names even
+        when the model was not validated first, e.g. by
+        `Category.objects.create(slug='search')`.
 
         Args:
             *args: Variable-length argument list.
             **kwargs: Arbitrary keyword arguments.
+
+        Raises:
+            ValidationError: If an explicit slug is reserved.
         """
         if not self.slug:
-            slug_value = slugify(self.category_name)
-            slug = slug_value
+            return save_with_unique_slug(
+                self, self.category_name,
+                lambda: super(Category, self).save(*args, **kwargs)
+            )
+        validate_slug_not_reserved(self.slug)
+        super().save(*args, **kwargs)
 
-            counter = 1
 
-            while Category.objects.filter(slug=slug).exists():
-                slug = f"{slug_value}-{counter}"
-                counter += 1
+class CategoryTombstone(models.Model):
+    """
+    Records a deleted category so delta sync clients can drop it.
 
-            self.slug = slug
-        super().save(*args, **kwargs)
+    Attributes:
+        category_id (int): Id of the deleted category.
+        deleted_at (datetime): When the category was deleted.
+    """
+    category_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f'Category {self.category_id} deleted at {self.deleted_at}'
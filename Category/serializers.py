@@ -2,10 +2,13 @@
 Serializers for the Category model.
 
 This module defines the serializer for the `Category` model,
-converting model instances to JSON format and vice versa.
+converting model instances to JSON format and vice versa, and
+`category_rows`, its compiled equivalent for `.values()` rows (see
+`MyShop.compiled`).
 """
 
 from rest_framework import serializers
+from MyShop.compiled import CompiledSerializer
 from .models import Category
 
 
@@ -26,3 +29,6 @@ class CategorySerializer(serializers.ModelSerializer):
         """
         model = Category
         fields = ['id', 'category_name', 'slug']
+
+
+category_rows = CompiledSerializer(CategorySerializer)
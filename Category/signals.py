@@ -0,0 +1,38 @@
+"""
+Category App Signals
+
+This module keeps derived catalog data in sync with the `Category` table.
+The receivers are connected in `CategoryConfig.ready`.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from MyShop.cache import bump_generation
+from MyShop.images import schedule_variants
+from .models import Category, CategoryTombstone
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog_cache(sender, instance, **kwargs):
+    """
+    Invalidates the cached catalog responses.
+    """
+    bump_generation(changes={'categories': [instance.id]})
+
+
+@receiver(post_save, sender=Category)
+def generate_image_variants(sender, instance, update_fields=None, **kwargs):
+    """
+    Generates the resized copies of the category image, once committed.
+    """
+    if update_fields is None or 'cat_image' in update_fields:
+        schedule_variants([instance.cat_image.name])
+
+
+@receiver(post_delete, sender=Category)
+def record_tombstone(sender, instance, **kwargs):
+    """
+    Records the deletion for delta sync clients.
+    """
+    CategoryTombstone.objects.create(category_id=instance.id)
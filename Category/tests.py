@@ -1,3 +1,98 @@
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from .models import Category
+
+
+class CategoryListTests(TestCase):
+    """
+    Tests the cached category list endpoint.
+    """
+
+    def setUp(self):
+        caches['catalog'].clear()
+        Category.objects.create(category_name='Shoes', description='Shoes')
+
+    def test_list_is_cached_until_a_category_changes(self):
+        self.client.get(reverse('category_list'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('category_list'))
+        self.assertEqual(len(response.data), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(category_name='Hats', description='Hats')
+        response = self.client.get(reverse('category_list'))
+        self.assertEqual(
+            [category['slug'] for category in response.data],
+            ['shoes', 'hats']
+        )
+
+
+class CategorySlugTests(TestCase):
+    """
+    Tests unique slug allocation for categories.
+    """
+
+    def test_duplicate_names_get_numbered_slugs(self):
+        slugs = [
+            Category.objects.create(
+                category_name='Electronics', description=''
+            ).slug
+            for _ in range(3)
+        ]
+        self.assertEqual(slugs, ['electronics', 'electronics-1',
+                                 'electronics-2'])
+
+    def test_route_names_are_reserved(self):
+        category = Category.objects.create(category_name='Feed',
+                                           description='')
+        self.assertEqual(category.slug, 'feed-1')
+        self.assertEqual(
+            self.client.get(f'/store/{category.slug}/').status_code, 200
+        )
+        category = Category.objects.create(category_name='Delta',
+                                           description='')
+        self.assertEqual(category.slug, 'delta-1')
+
+    def test_explicit_reserved_slugs_are_rejected(self):
+        for slug in ('search', 'delta'):
+            with self.subTest(slug):
+                with self.assertRaises(ValidationError):
+                    Category.objects.create(
+                        category_name='Anything', slug=slug, description=''
+                    )
+                category = Category(category_name='Anything', slug=slug,
+                                    description='')
+                with self.assertRaises(ValidationError) as caught:
+                    category.full_clean()
+                self.assertIn('slug', caught.exception.message_dict)
+
+
+class CategoryDeltaTests(TestCase):
+    """
+    Tests the category delta sync endpoint.
+    """
+
+    def test_returns_changes_since_watermark(self):
+        shoes = Category.objects.create(category_name='Shoes', description='')
+        hats = Category.objects.create(category_name='Hats', description='')
+        response = self.client.get(reverse('category_delta'))
+        self.assertTrue(response.data['reset'])
+        self.assertEqual(len(response.data['updated']), 2)
+
+        watermark = response.data['watermark']
+        shoes.category_name = 'Sneakers'
+        shoes.save()
+        hats_id = hats.id
+        hats.delete()
+        response = self.client.get(
+            reverse('category_delta'), {'since': watermark}
+        )
+        self.assertFalse(response.data['reset'])
+        self.assertEqual(
+            [c['category_name'] for c in response.data['updated']],
+            ['Sneakers']
+        )
+        self.assertEqual(response.data['deleted'], [hats_id])
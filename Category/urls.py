@@ -9,4 +9,5 @@ from django.urls import path
 
 urlpatterns = [
     path('', views.category_list, name='category_list'),
+    path('delta/', views.category_delta, name='category_delta'),
 ]
@@ -1,13 +1,58 @@
+from django.http import JsonResponse
 from django.shortcuts import render
-from .models import Category
+from django.views.decorators.http import require_GET
+from .models import Category, CategoryTombstone
 from .serializers import CategorySerializer
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
+from MyShop.cache import cache_response
+from MyShop.delta import (
+    InvalidWatermark, delta_response_data, get_delta_window,
+)
 
 
 # Create your views here.
 @api_view(['GET'])
+@cache_response
 def category_list(request):
     categories = Category.objects.all()
     serializer = CategorySerializer(categories, many=True)
-    return Response(serializer.data)
\ No newline at end of file
+    return Response(serializer.data)
+
+
+@api_view(['GET'])
+def category_delta(request):
+    """
+    Returns the categories created, updated or deleted since a watermark.
+
+    Query parameters:
+        since (str, optional): The `watermark` of the previous response.
+            Without it every category is returned with `reset` set.
+    """
+    try:
+        since, watermark, reset = get_delta_window(request)
+    except InvalidWatermark as error:
+        return Response({'error': str(error)}, status=400)
+
+    categories = Category.objects.order_by('date_modified', 'id')
+    deleted = []
+    if since is not None:
+        categories = categories.filter(date_modified__gt=since)
+        deleted = list(CategoryTombstone.objects.filter(
+            deleted_at__gt=since
+        ).values_list('category_id', flat=True))
+    serializer = CategorySerializer(categories, many=True)
+    return Response(
+        delta_response_data(serializer.data, deleted, watermark, reset)
+    )
+
+
+
+@require_GET
+async def async_category_list(request):
+    """
+    Async variant of `category_list`, read with the async ORM.
+    """
+    categories = [category async for category in Category.objects.all()]
+    serializer = CategorySerializer(categories, many=True)
+    return JsonResponse(serializer.data, safe=False)
@@ -0,0 +1,40 @@
+"""
+Async URL configuration.
+
+Async variants of the hot catalog and cart endpoints, mounted under
+`/async/`. They use the async ORM and only pay off when the project is
+served by an ASGI server (`MyShop.asgi`), e.g.:
+    uvicorn MyShop.asgi:application --workers 4
+
+Compare them against the WSGI endpoints with `manage.py load_test`.
+"""
+from django.urls import path
+
+from Category.views import async_category_list
+from cart.views import (
+    async_add_to_cart, async_get_cart, async_get_num_of_items,
+)
+from store.views import async_product_details, async_product_list
+
+
+urlpatterns = [
+    path('categories/', async_category_list, name='async_category_list'),
+    path('store/', async_product_list, name='async_product_list'),
+    path(
+        'store/<slug:category_slug>/',
+        async_product_list,
+        name='async_product_list_by_category'
+    ),
+    path(
+        'store/<slug:category_slug>/<slug:product_slug>/',
+        async_product_details,
+        name='async_product_details'
+    ),
+    path('cart/add_to_cart/', async_add_to_cart, name='async_add_to_cart'),
+    path(
+        'cart/get_num_of_items/',
+        async_get_num_of_items,
+        name='async_get_num_of_items'
+    ),
+    path('cart/get_cart/', async_get_cart, name='async_get_cart'),
+]
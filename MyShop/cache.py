@@ -0,0 +1,247 @@
+"""
+Catalog Response Cache
+
+This module caches the responses of the read-only catalog endpoints
+(categories, product listings and product details).
+
+Cache keys embed a catalog generation counter. `Product` and `Category`
+save/delete signals bump the counter once the write commits, which
+orphans every cached response at once in O(1); orphaned entries simply
+expire. A response computed while the catalog changes is stored under
+the old generation, so a stale response is never served.
+
+Each bump may record what changed under the new generation, so
+process-local copies of the catalog (see `store.catalog`) can catch up
+with `get_changes` instead of reloading everything.
+
+Cached responses carry an `ETag` derived from the generation and a
+`Last-Modified` date taken from the last catalog change. Conditional GETs
+whose `If-None-Match` matches the ETag are answered with
+`304 Not Modified`; `If-Modified-Since` is not honoured, since two changes
+within the same second share a `Last-Modified` date.
+
+The cache alias is configured with `settings.CATALOG_CACHE_ALIAS`. The
+generation counter lives in that cache, so every server process must
+share it: the local-memory backend only suits a single process.
+"""
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from MyShop.routers import pin_to_primary
+
+
+GENERATION_KEY = 'catalog:generation'
+LAST_MODIFIED_KEY = 'catalog:last_modified'
+RESPONSE_KEY = 'catalog:response:{generation}:{digest}'
+CHANGES_KEY = 'catalog:changes:{generation}'
+
+# Longest run of generations `get_changes` reads before giving up.
+MAX_CHANGES = 1000
+
+_stats = {'hits': 0, 'misses': 0, 'not_modified': 0, 'invalidations': 0}
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Returns the cache backend holding catalog responses.
+    """
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def get_stats():
+    """
+    Returns the hit/miss counters of this process.
+
+    Returns:
+        dict: Counters and the current catalog generation.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+    stats['generation'] = get_generation()
+    return stats
+
+
+def get_generation():
+    """
+    Returns the current catalog generation.
+
+    The counter starts at the current time in milliseconds rather than 1,
+    so a counter evicted from the cache never restarts at a value that
+    older cached responses were stored under.
+    """
+    cache = get_cache()
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        initial = int(time.time() * 1000)
+        cache.add(GENERATION_KEY, initial, timeout=None)
+        generation = cache.get(GENERATION_KEY, initial)
+    return generation
+
+
+def get_last_modified():
+    """
+    Returns the time of the last catalog change as a Unix timestamp.
+
+    Before any change has been recorded, the time of the first call is
+    used, so clients revalidate at least once against fresh data.
+    """
+    cache = get_cache()
+    cache.add(LAST_MODIFIED_KEY, int(timezone.now().timestamp()), None)
+    return cache.get(LAST_MODIFIED_KEY)
+
+
+def bump_generation(modified=None, changes=None):
+    """
+    Invalidates every cached catalog response once the current transaction
+    commits, or at once outside a transaction.
+
+    Bumping before the commit would let another request cache the old
+    rows under the new generation.
+
+    Args:
+        modified (datetime, optional): When the catalog changed, usually
+            the `date_modified` of the saved object. Defaults to now.
+        changes (dict, optional): What changed, recorded under the new
+            generation for `get_changes`; None if unknown.
+    """
+    modified = modified or timezone.now()
+    transaction.on_commit(lambda: _bump(modified, changes))
+
+
+def _bump(modified, changes):
+    cache = get_cache()
+    try:
+        generation = cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, int(time.time() * 1000), timeout=None)
+    else:
+        if changes is not None:
+            cache.set(
+                CHANGES_KEY.format(generation=generation), changes,
+                settings.CATALOG_CACHE_TIMEOUT,
+            )
+    cache.set(LAST_MODIFIED_KEY, int(modified.timestamp()), None)
+    _count('invalidations')
+
+
+def get_changes(since, until):
+    """
+    Returns what changed between two catalog generations.
+
+    Args:
+        since (int): Generation already seen; its own changes are excluded.
+        until (int): Newer generation; its changes are included.
+
+    Returns:
+        list or None: The `changes` of every bump in between, oldest
+        first, or None if one of them is unknown or expired, or the
+        generations are too far apart.
+    """
+    if not 0 <= until - since <= MAX_CHANGES:
+        return None
+    keys = [
+        CHANGES_KEY.format(generation=generation)
+        for generation in range(since + 1, until + 1)
+    ]
+    found = get_cache().get_many(keys)
+    if len(found) != len(keys):
+        return None
+    return [found[key] for key in keys]
+
+
+def _etag(generation, request):
+    digest = hashlib.md5(
+        f'{generation}:{request.get_full_path()}'.encode()
+    ).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _not_modified(request, etag):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is None:
+        return False
+    return etag in [tag.strip() for tag in if_none_match.split(',')] \
+        or if_none_match.strip() == '*'
+
+
+def cache_response(view):
+    """
+    Caches the successful GET responses of a DRF function view.
+
+    Apply it below `@api_view` so it receives the DRF `Request` and returns
+    a `Response`. The key covers the full path (including the query
+    string), the negotiated renderer and the catalog generation.
+
+    Args:
+        view (callable): The view function to wrap.
+
+    Returns:
+        callable: The caching view.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return view(request, *args, **kwargs)
+
+        generation = get_generation()
+        last_modified = get_last_modified()
+        etag = _etag(generation, request)
+        headers = {'ETag': etag, 'Last-Modified': http_date(last_modified)}
+
+        if _not_modified(request, etag):
+            _count('not_modified')
+            return Response(status=304, headers=headers)
+
+        renderer = getattr(request, 'accepted_renderer', None)
+        digest = hashlib.md5(
+            f'{request.get_full_path()}|{getattr(renderer, "format", "")}'
+            .encode()
+        ).hexdigest()
+        key = RESPONSE_KEY.format(generation=generation, digest=digest)
+        cache = get_cache()
+
+        cached = cache.get(key)
+        if cached is not None:
+            _count('hits')
+            return Response(cached, headers={**headers, 'X-Cache': 'HIT'})
+
+        _count('misses')
+        if time.time() - last_modified <= settings.REPLICA_LAG_SECONDS:
+            # Replicas may not have the change yet.
+            with pin_to_primary():
+                response = view(request, *args, **kwargs)
+        else:
+            response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.CATALOG_CACHE_TIMEOUT)
+            for header, value in headers.items():
+                response[header] = value
+        response['X-Cache'] = 'MISS'
+        return response
+    return wrapper
+
+
+@api_view(['GET'])
+def cache_stats(request):
+    """
+    Reports the catalog cache hit/miss counters of the serving process.
+    """
+    return Response(get_stats())
@@ -0,0 +1,276 @@
+"""
+Compiled Read-Only Serializers
+
+`CompiledSerializer` renders `.values()` rows exactly like a DRF
+`ModelSerializer` renders model instances, without building field
+instances or calling `to_representation` per field and object.
+
+The serializer class is introspected once, on first use, and a plain
+function returning a dict literal is generated from its field list:
+
+    def render(row, context):
+        return {'id': row['id'], 'image': c_image(row['image'], context)}
+
+Fields are read from the row as follows:
+
+- Plain columns (integers, strings, booleans, JSON, foreign keys) are
+  copied as they are; the database already returns the serialized value.
+- File and image fields hold the stored name and are rendered as the
+  storage URL, absolute when `context` holds the request.
+- Fields with a `row_representation(value, context)` method render the
+  column value with it.
+- Other fields (dates, decimals, UUIDs) go through the field's own
+  `to_representation`, once per value.
+- Nested one-to-one serializers are read from the same row under a
+  prefix (`category__slug`), see `with_prefix`; nested `many=True`
+  serializers expect the row to hold a list of child rows.
+- `SerializerMethodField`s without an entry in `methods` are read from a
+  row key of the same name (an annotation, or a column of that name).
+
+`values` lists the `.values()` lookups a row must contain. `narrow`
+returns a variant rendering fewer fields, or relations as their id, and
+reading fewer columns (see `MyShop.fieldsets`).
+"""
+from functools import cached_property, lru_cache
+
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+
+# DRF fields whose representation of a database value is the value itself.
+PASSTHROUGH_FIELDS = (
+    serializers.BooleanField, serializers.CharField,
+    serializers.IntegerField, serializers.JSONField,
+    serializers.PrimaryKeyRelatedField, serializers.ReadOnlyField,
+    serializers.SerializerMethodField,
+)
+
+# Narrowed variants kept compiled by `CompiledSerializer.narrow`.
+NARROWED_CACHE_SIZE = 256
+
+
+def _file_url(storage):
+    def render(name, context):
+        if not name:
+            return None
+        url = storage.url(name)
+        request = context.get('request') if context else None
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+    return render
+
+
+def _represent(field):
+    to_representation = field.to_representation
+
+    def render(value, context):
+        return None if value is None else to_representation(value)
+    return render
+
+
+class CompiledSerializer:
+    """
+    Renders `.values()` rows like a `ModelSerializer`; see the module
+    documentation.
+
+    Attributes:
+        serializer_class (type): The serializer whose output is
+            reproduced.
+        prefix (str): Prepended to every row key, for nested use.
+        nested (dict): Field name -> `CompiledSerializer` of a nested
+            serializer or `SerializerMethodField` returning one.
+        methods (dict): Field name -> `method(row, context)` computing the
+            field; only allowed without a prefix.
+        method_values (dict): Field name -> row keys its method reads.
+        fields (tuple): Names of the rendered fields; None for all.
+        expand (frozenset): Nested relations rendered as objects, the
+            others being rendered as their id; None to expand all.
+    """
+
+    def __init__(self, serializer_class, prefix='', nested=None,
+                 methods=None, method_values=None, fields=None,
+                 expand=None):
+        if prefix and methods:
+            raise ValueError('Methods cannot be used with a prefix.')
+        self.serializer_class = serializer_class
+        self.prefix = prefix
+        self.nested = nested or {}
+        self.methods = methods or {}
+        self.method_values = method_values or {}
+        self.fields = fields
+        self.expand = expand
+
+    def with_prefix(self, prefix):
+        """
+        Returns a copy reading its fields under `prefix` (such as
+        `'product__'`), for nesting in the rows of another model.
+        """
+        return CompiledSerializer(
+            self.serializer_class, prefix + self.prefix,
+            {
+                name: nested if self._is_many(name)
+                else nested.with_prefix(prefix)
+                for name, nested in self.nested.items()
+            },
+            self.methods, self.method_values, self.fields, self.expand,
+        )
+
+    def narrow(self, fields=None, expand=None):
+        """
+        Returns a variant rendering only some fields and relations.
+
+        The `NARROWED_CACHE_SIZE` most recently used variants of all
+        serializers are kept compiled. Fields are deduplicated and put in
+        declaration order first, so requests listing the same fields share
+        a variant.
+
+        Args:
+            fields (iterable, optional): Names of the fields to render, in
+                any order; None for all.
+            expand (frozenset, optional): Relations to render as objects,
+                at any depth; the others are rendered as their id. None to
+                expand every relation.
+
+        Returns:
+            CompiledSerializer: The variant.
+        """
+        if fields is None and expand is None:
+            return self
+        if fields is not None:
+            fields = set(fields)
+            fields = tuple(name for name in self._fields if name in fields)
+        return self._narrow(fields, expand)
+
+    @lru_cache(maxsize=NARROWED_CACHE_SIZE)
+    def _narrow(self, fields, expand):
+        return CompiledSerializer(
+            self.serializer_class, self.prefix,
+            {
+                name: nested.narrow(None, expand)
+                for name, nested in self.nested.items()
+            },
+            self.methods, self.method_values, fields, expand,
+        )
+
+    @property
+    def field_names(self):
+        """
+        Names of every field of the serializer, in output order.
+        """
+        return tuple(self._fields)
+
+    @property
+    def expandable(self):
+        """
+        Names of the relations that can be rendered as their id, at any
+        depth.
+        """
+        names = set()
+        for name, nested in self.nested.items():
+            if not self._is_many(name):
+                names.add(name)
+            names |= nested.expandable
+        return frozenset(names)
+
+    def _is_many(self, name):
+        return isinstance(self._fields[name], serializers.ListSerializer)
+
+    def _is_collapsed(self, name):
+        return self.expand is not None and not self._is_many(name) and \
+            name not in self.expand
+
+    @cached_property
+    def _fields(self):
+        return self.serializer_class().fields
+
+    def _selected(self):
+        return [
+            (name, field) for name, field in self._fields.items()
+            if self.fields is None or name in self.fields
+        ]
+
+    @cached_property
+    def values(self):
+        """
+        The `.values()` lookups the rows must contain.
+        """
+        lookups = []
+        for name, field in self._selected():
+            if name in self.methods:
+                lookups.extend(self.method_values.get(name, ()))
+            elif self._is_many(name):
+                continue
+            elif name in self.nested and not self._is_collapsed(name):
+                lookups.extend(self.nested[name].values)
+            else:
+                lookups.append(self._key(name, field))
+        return tuple(dict.fromkeys(lookups))
+
+    def _key(self, name, field):
+        source = name if field.source == '*' else field.source
+        return self.prefix + source.replace('.', '__')
+
+    @cached_property
+    def render(self):
+        """
+        The generated `render(row, context=None)` function.
+        """
+        namespace = {}
+        items = []
+        for name, field in self._selected():
+            if name in self.methods:
+                namespace[f'm_{name}'] = self.methods[name]
+                value = f'm_{name}(row, context)'
+            elif name in self.nested and self._is_collapsed(name):
+                value = f'row[{self._key(name, field)!r}]'
+            elif name in self.nested:
+                namespace[f'n_{name}'] = self.nested[name]
+                if self._is_many(name):
+                    value = f'n_{name}.many(row[{name!r}], context)'
+                else:
+                    value = f'n_{name}.render(row, context)'
+            else:
+                key = self._key(name, field)
+                converter = self._converter(name, field)
+                if converter is None:
+                    value = f'row[{key!r}]'
+                else:
+                    namespace[f'c_{name}'] = converter
+                    value = f'c_{name}(row[{key!r}], context)'
+            items.append(f'{name!r}: {value}')
+
+        source = (
+            'def render(row, context=None):\n'
+            f'    return {{{", ".join(items)}}}\n'
+        )
+        exec(source, namespace)
+        return namespace['render']
+
+    def _converter(self, name, field):
+        if isinstance(field, serializers.BaseSerializer):
+            raise ValueError(
+                f'{self.serializer_class.__name__}.{name} is a nested '
+                'serializer and needs a CompiledSerializer in `nested`.'
+            )
+        if hasattr(field, 'row_representation'):
+            return field.row_representation
+        if isinstance(field, serializers.FileField):
+            if not getattr(field, 'use_url',
+                           api_settings.UPLOADED_FILES_USE_URL):
+                return lambda name, context: name or None
+            model = self.serializer_class.Meta.model
+            return _file_url(model._meta.get_field(field.source).storage)
+        if isinstance(field, PASSTHROUGH_FIELDS):
+            return None
+        return _represent(field)
+
+    def __call__(self, row, context=None):
+        return self.render(row, context)
+
+    def many(self, rows, context=None):
+        """
+        Renders a list of rows.
+        """
+        render = self.render
+        return [render(row, context) for row in rows]
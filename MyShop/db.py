@@ -0,0 +1,106 @@
+"""
+Database Profiles
+
+This module builds `settings.DATABASES` from environment variables.
+
+`DB_PROFILE` selects one of:
+- `dev` (default): a plain SQLite file, as in development so far.
+- `sqlite`: SQLite tuned for a single-node deployment. WAL journaling lets
+  readers proceed while a write commits, `IMMEDIATE` transactions take the
+  write lock up front instead of failing on lock upgrade, and the busy
+  timeout makes writers queue rather than error.
+- `postgres`: PostgreSQL with persistent connections and health checks,
+  or a psycopg connection pool when `DB_POOL_MAX_SIZE` is set.
+
+With `DB_REPLICA_HOSTS` (comma-separated hosts, `postgres` only) every
+replica gets a `replica_<n>` alias mirroring the primary in tests, and
+`MyShop.routers.ReplicaRouter` sends catalog reads to them.
+
+Variables:
+    DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT: Connection settings.
+    DB_CONN_MAX_AGE: Seconds a connection is reused (default 60).
+    DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE: Pool bounds; pooling replaces
+        persistent connections.
+    DB_REPLICA_HOSTS: Replica hosts.
+"""
+import os
+
+
+PROFILES = ('dev', 'sqlite', 'postgres')
+
+# Applied to every new SQLite connection of the `sqlite` profile.
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-64000',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=268435456',
+)
+
+
+def _postgres(env, host):
+    database = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': env.get('DB_NAME', 'myshop'),
+        'USER': env.get('DB_USER', 'myshop'),
+        'PASSWORD': env.get('DB_PASSWORD', ''),
+        'HOST': host,
+        'PORT': env.get('DB_PORT', '5432'),
+        'CONN_HEALTH_CHECKS': True,
+        'CONN_MAX_AGE': int(env.get('DB_CONN_MAX_AGE', 60)),
+        'OPTIONS': {},
+    }
+    if env.get('DB_POOL_MAX_SIZE'):
+        # Django refuses persistent connections on top of a pool.
+        database['CONN_MAX_AGE'] = 0
+        database['OPTIONS']['pool'] = {
+            'min_size': int(env.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(env['DB_POOL_MAX_SIZE']),
+            'timeout': 10,
+        }
+    return database
+
+
+def database_settings(base_dir, env=os.environ):
+    """
+    Returns the `DATABASES` setting of the selected profile.
+
+    Args:
+        base_dir (Path): Project directory, holding the SQLite file.
+        env (Mapping): Environment variables.
+
+    Returns:
+        dict: Alias -> database settings.
+
+    Raises:
+        ValueError: If `DB_PROFILE` is unknown.
+    """
+    profile = env.get('DB_PROFILE', 'dev')
+    if profile not in PROFILES:
+        raise ValueError(
+            f'DB_PROFILE must be one of {", ".join(PROFILES)}, '
+            f'not {profile!r}'
+        )
+    if profile != 'postgres':
+        database = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': env.get('DB_NAME', base_dir / 'db.sqlite3'),
+        }
+        if profile == 'sqlite':
+            database['OPTIONS'] = {
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+                'init_command': ';'.join(SQLITE_PRAGMAS),
+            }
+        return {'default': database}
+
+    databases = {'default': _postgres(env, env.get('DB_HOST', 'localhost'))}
+    replicas = [
+        host.strip() for host in env.get('DB_REPLICA_HOSTS', '').split(',')
+        if host.strip()
+    ]
+    for index, host in enumerate(replicas, 1):
+        replica = _postgres(env, host)
+        replica['TEST'] = {'MIRROR': 'default'}
+        databases[f'replica_{index}'] = replica
+    return databases
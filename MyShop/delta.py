@@ -0,0 +1,78 @@
+"""
+Catalog Delta Sync
+
+Helpers shared by the `/store/delta/` and `/categories/delta/` endpoints,
+which return the rows created, updated or deleted since a client-supplied
+watermark.
+
+Changes are found through the indexed `date_modified` column of each
+model; deletions through tombstone rows written by `post_delete` signals.
+Both are stamped before their transaction commits, so a row can become
+visible after a delta that ran later than its timestamp. The watermark
+handed out therefore lags the request by
+`settings.DELTA_WATERMARK_MARGIN_SECONDS`, which must exceed the longest
+write transaction: consecutive deltas overlap by that margin, and clients
+apply them by id, replacing what they hold, rather than appending.
+Tombstones older than `settings.DELTA_TOMBSTONE_RETENTION_DAYS` are pruned
+(see the `prune_tombstones` command), so a client whose watermark is older
+than that receives a full reset instead of a delta.
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidWatermark(ValueError):
+    """
+    Raised when the `since` parameter is not an ISO 8601 timestamp.
+    """
+
+
+def get_delta_window(request):
+    """
+    Reads the `since` watermark of a delta request.
+
+    Args:
+        request (Request): The DRF request.
+
+    Returns:
+        tuple: `(since, watermark, reset)`. `since` is None when every row
+        must be sent; `watermark` is the value the client passes next
+        time, overlapping this delta by the margin; `reset` tells the
+        client to drop its local copy first.
+
+    Raises:
+        InvalidWatermark: If `since` cannot be parsed.
+    """
+    # Taken before reading, and moved back by the margin, so rows written
+    # by transactions still open show up again in the next delta rather
+    # than being skipped.
+    watermark = timezone.now() - timedelta(
+        seconds=settings.DELTA_WATERMARK_MARGIN_SECONDS
+    )
+    since = request.query_params.get('since')
+    if not since:
+        return None, watermark, True
+    parsed = parse_datetime(since)
+    if parsed is None:
+        raise InvalidWatermark('since must be an ISO 8601 timestamp')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    retention = timedelta(days=settings.DELTA_TOMBSTONE_RETENTION_DAYS)
+    if parsed < watermark - retention:
+        return None, watermark, True
+    return parsed, watermark, False
+
+
+def delta_response_data(updated, deleted, watermark, reset):
+    """
+    Builds the body of a delta response.
+    """
+    return {
+        'watermark': watermark.isoformat(),
+        'reset': reset,
+        'updated': updated,
+        'deleted': deleted,
+    }
@@ -0,0 +1,119 @@
+"""
+Sparse Fieldsets
+
+Lets clients of the product and cart endpoints ask for less:
+
+- `?fields=id,product_name,price,image` keeps only the listed top-level
+  fields.
+- `?expand=category` lists the relations embedded as objects, at any
+  depth; relations left out are rendered as their id. Without `expand`,
+  every relation is embedded, as before.
+
+Views narrow their queries to match. Row-based views read only the
+columns of the narrowed `CompiledSerializer` (see `MyShop.compiled`);
+model-based views load the fields with `only()` and join relations only
+when they are expanded.
+"""
+
+
+class InvalidFieldset(ValueError):
+    """
+    Raised when `fields` or `expand` names an unknown field.
+    """
+
+
+def _names(request, param):
+    params = getattr(request, 'query_params', request.GET)
+    raw = params.get(param)
+    if raw is None:
+        return None
+    return [name.strip() for name in raw.split(',') if name.strip()]
+
+
+def get_fieldset(request, field_names, expandable=frozenset()):
+    """
+    Reads the `fields` and `expand` query parameters.
+
+    Args:
+        request (HttpRequest): The request.
+        field_names (iterable): Every field the endpoint renders.
+        expandable (iterable): Relations that can be rendered as their id.
+
+    Returns:
+        tuple: `(fields, expand)`; `fields` is a tuple of distinct field
+        names in the order of `field_names`, or None for all fields;
+        `expand` a frozenset of relations or None to expand every
+        relation.
+
+    Raises:
+        InvalidFieldset: If a name is unknown.
+    """
+    fields = _names(request, 'fields')
+    expand = _names(request, 'expand')
+    unknown = set(fields or ()) - set(field_names)
+    unknown |= set(expand or ()) - set(expandable)
+    if unknown:
+        raise InvalidFieldset(
+            f'Unknown fields: {", ".join(sorted(unknown))}'
+        )
+    if fields:
+        fields = set(fields)
+        fields = tuple(name for name in field_names if name in fields)
+    return (
+        fields or None,
+        frozenset(expand) if expand is not None else None,
+    )
+
+
+def narrow_serializer(request, serializer):
+    """
+    Narrows a `CompiledSerializer` to the fieldset of the request.
+
+    Raises:
+        InvalidFieldset: If a name is unknown.
+    """
+    return serializer.narrow(*get_fieldset(
+        request, serializer.field_names, serializer.expandable
+    ))
+
+
+class FieldsetSerializerMixin:
+    """
+    Lets a `ModelSerializer` render only some fields.
+
+    Pass the names to keep as the `fields` keyword argument, usually the
+    first item of `get_fieldset`; None keeps every field. Columns read by
+    fields that are not model fields are declared in
+    `Meta.fieldset_columns` (field name -> model field names).
+    """
+
+    @classmethod
+    def narrow_queryset(cls, queryset, fields):
+        """
+        Defers the columns the given fields do not need.
+
+        Args:
+            queryset (QuerySet): Instances for this serializer.
+            fields (tuple): Names of the rendered fields; None for all.
+
+        Returns:
+            QuerySet: The queryset, with `only()` applied.
+        """
+        if fields is None:
+            return queryset
+        model_fields = {
+            field.name for field in cls.Meta.model._meta.concrete_fields
+        }
+        extra = getattr(cls.Meta, 'fieldset_columns', {})
+        columns = []
+        for name in fields:
+            if name in model_fields:
+                columns.append(name)
+            columns.extend(extra.get(name, ()))
+        return queryset.only(*dict.fromkeys(columns))
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
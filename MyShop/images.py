@@ -0,0 +1,203 @@
+"""
+Image Derivatives
+
+Uploaded product and category images are served in smaller, re-encoded
+copies ("variants") so listing pages do not download full-size photos.
+For every width of `settings.IMAGE_VARIANT_WIDTHS` and format of
+`settings.IMAGE_VARIANT_FORMATS`, a variant is stored next to the original:
+
+    photos/products/shoe.jpg -> photos/products/shoe.jpg.320w.webp
+
+The original name is kept whole, so `shoe.jpg` and `shoe.png` get
+distinct variants.
+
+Variants are generated after the saving transaction commits, in a pool of
+`settings.IMAGE_VARIANT_WORKERS` threads, so uploads do not wait for
+them; with 0 workers they are generated in the saving thread. Pillow
+releases the GIL while decoding, resizing and encoding, so the threads
+run in parallel. Images narrower than a width are stored at their own
+size under that width's name, so variant URLs follow from the original
+name and configuration alone and rendering them costs no storage calls.
+Until its variants are written, an image's variant URLs do not resolve.
+
+The `generate_image_variants` command backfills variants of existing
+images.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variant_name(name, width, image_format):
+    """
+    Returns the storage name of a variant of the image `name`.
+    """
+    return f'{name}.{width}w.{EXTENSIONS[image_format]}'
+
+
+def variant_urls(name, request=None):
+    """
+    Returns the URLs of the variants of an image.
+
+    Args:
+        name (str): Storage name of the original image.
+        request (HttpRequest, optional): Used to build absolute URLs.
+
+    Returns:
+        dict or None: Format -> width (as a string) -> URL, or None when
+        there is no image.
+    """
+    if not name:
+        return None
+    urls = {}
+    for image_format in settings.IMAGE_VARIANT_FORMATS:
+        urls[image_format] = {}
+        for width in settings.IMAGE_VARIANT_WIDTHS:
+            url = default_storage.url(
+                variant_name(name, width, image_format)
+            )
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            urls[image_format][str(width)] = url
+    return urls
+
+
+def _encode(image, image_format):
+    if image_format == 'jpeg' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    elif image_format == 'webp' and image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    buffer = BytesIO()
+    image.save(
+        buffer, format=image_format.upper(),
+        quality=settings.IMAGE_VARIANT_QUALITY,
+    )
+    return buffer.getvalue()
+
+
+def generate_variants(name, overwrite=False, storage=default_storage):
+    """
+    Writes the variants of an image.
+
+    Args:
+        name (str): Storage name of the original image.
+        overwrite (bool): Rewrite variants that already exist.
+        storage (Storage, optional): Where the image is stored.
+
+    Returns:
+        list: Names of the variants written; empty if they all existed.
+    """
+    widths = sorted(settings.IMAGE_VARIANT_WIDTHS, reverse=True)
+    formats = settings.IMAGE_VARIANT_FORMATS
+    if not overwrite and all(
+        storage.exists(variant_name(name, width, image_format))
+        for width in widths for image_format in formats
+    ):
+        return []
+
+    with storage.open(name, 'rb') as original:
+        image = Image.open(original)
+        # Lets JPEG decoding skip detail that no variant keeps.
+        image.draft('RGB', (widths[0], widths[0] * image.height //
+                            max(image.width, 1)))
+        image.load()
+    image = ImageOps.exif_transpose(image)
+
+    written = []
+    for width in widths:
+        # Widths are visited in decreasing order, so each variant is
+        # resized from the previous variant rather than the original.
+        if image.width > width:
+            height = max(round(image.height * width / image.width), 1)
+            image = image.resize((width, height), Image.LANCZOS)
+        for image_format in formats:
+            target = variant_name(name, width, image_format)
+            if storage.exists(target):
+                storage.delete(target)
+            storage.save(target, ContentFile(_encode(image, image_format)))
+            written.append(target)
+    return written
+
+
+def _generate_logged(name):
+    try:
+        return generate_variants(name)
+    except FileNotFoundError:
+        logger.warning('Image %s is missing; no variants generated', name)
+        return []
+    except Exception:
+        logger.exception('Could not generate the variants of %s', name)
+        return []
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_VARIANT_WORKERS,
+                thread_name_prefix='image-variants',
+            )
+        return _executor
+
+
+def schedule_variants(names):
+    """
+    Generates the variants of images once the current transaction
+    commits, off the request path.
+
+    Args:
+        names (iterable): Storage names of the images; empty names are
+            skipped.
+    """
+    names = [name for name in names if name]
+    if not names:
+        return
+
+    def submit():
+        for name in names:
+            if settings.IMAGE_VARIANT_WORKERS:
+                _get_executor().submit(_generate_logged, name)
+            else:
+                _generate_logged(name)
+    transaction.on_commit(submit)
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    Renders the variant URLs of an image field, see `variant_urls`.
+
+    Give the image field as `source`. The URLs are absolute when the
+    serializer context holds the request.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return variant_urls(value.name, self.context.get('request'))
+
+    @staticmethod
+    def row_representation(name, context):
+        """
+        Renders a stored image name, for `MyShop.compiled`.
+        """
+        request = context.get('request') if context else None
+        return variant_urls(name, request)
@@ -0,0 +1,180 @@
+"""
+Request Metrics
+
+This module aggregates the per-request measurements of
+`MyShop.middleware.ProfilingMiddleware` into histograms and serves them at
+`/metrics/` in the Prometheus text exposition format, together with the
+catalog response cache counters of `MyShop.cache`.
+
+Metrics are kept per process, like the cache counters; scrape every
+worker, or run a single worker per container.
+"""
+import threading
+from bisect import bisect_left
+
+from django.http import HttpResponse
+
+from MyShop import cache
+
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+def _format_labels(labels):
+    return ','.join(
+        f'{name}="{str(value).replace(chr(34), chr(39))}"'
+        for name, value in labels
+    )
+
+
+class Histogram:
+    """
+    A labelled Prometheus histogram.
+
+    Attributes:
+        name (str): Metric name.
+        help (str): Metric description.
+        buckets (tuple): Upper bounds of the buckets, ascending.
+    """
+
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        """
+        Records one value.
+
+        Args:
+            labels (tuple): `(name, value)` label pairs.
+            value (float): The observation.
+        """
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = {
+                    'buckets': [0] * len(self.buckets), 'sum': 0, 'count': 0,
+                }
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series['buckets'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        """
+        Returns the histogram in the Prometheus text format.
+        """
+        lines = [f'# HELP {self.name} {self.help}',
+                 f'# TYPE {self.name} histogram']
+        with self.lock:
+            series = {
+                labels: dict(values, buckets=list(values['buckets']))
+                for labels, values in self.series.items()
+            }
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, values['buckets']):
+                cumulative += count
+                bucket_labels = _format_labels(labels + (('le', bound),))
+                lines.append(
+                    f'{self.name}_bucket{{{bucket_labels}}} {cumulative}'
+                )
+            inf_labels = _format_labels(labels + (('le', '+Inf'),))
+            lines.append(f'{self.name}_bucket{{{inf_labels}}} '
+                         f'{values["count"]}')
+            lines.append(f'{self.name}_sum{{{_format_labels(labels)}}} '
+                         f'{values["sum"]}')
+            lines.append(f'{self.name}_count{{{_format_labels(labels)}}} '
+                         f'{values["count"]}')
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    'myshop_request_duration_seconds', 'Wall time of each request.',
+    DURATION_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    'myshop_db_queries', 'Database queries per request.', QUERY_BUCKETS,
+)
+DB_DURATION = Histogram(
+    'myshop_db_duration_seconds', 'Database time per request.',
+    DURATION_BUCKETS,
+)
+DUPLICATE_QUERIES = Histogram(
+    'myshop_db_duplicate_queries',
+    'Queries per request repeating an SQL statement already run.',
+    QUERY_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    'myshop_response_size_bytes', 'Size of non-streaming response bodies.',
+    SIZE_BUCKETS,
+)
+HISTOGRAMS = (
+    REQUEST_DURATION, DB_QUERIES, DB_DURATION, DUPLICATE_QUERIES,
+    RESPONSE_SIZE,
+)
+
+
+def record_request(view, method, status, profile, size=None):
+    """
+    Adds the measurements of one request to the histograms.
+
+    Args:
+        view (str): URL name of the view.
+        method (str): HTTP method.
+        status (int): Response status code.
+        profile (RequestProfile): The request measurements.
+        size (int, optional): Response body size, if known.
+    """
+    labels = (('view', view), ('method', method), ('status', status))
+    REQUEST_DURATION.observe(labels, profile.duration)
+    view_labels = (('view', view),)
+    DB_QUERIES.observe(view_labels, profile.query_count)
+    DB_DURATION.observe(view_labels, profile.query_time)
+    DUPLICATE_QUERIES.observe(view_labels, profile.duplicate_count)
+    if size is not None:
+        RESPONSE_SIZE.observe(view_labels, size)
+
+
+def reset():
+    """
+    Drops every recorded series.
+    """
+    for histogram in HISTOGRAMS:
+        with histogram.lock:
+            histogram.series.clear()
+
+
+def render():
+    """
+    Returns every metric in the Prometheus text format.
+    """
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    stats = cache.get_stats()
+    for name in ('hits', 'misses', 'not_modified', 'invalidations'):
+        metric = f'myshop_catalog_cache_{name}_total'
+        lines.extend([
+            f'# HELP {metric} Catalog response cache {name}.',
+            f'# TYPE {metric} counter',
+            f'{metric} {stats[name]}',
+        ])
+    return '\n'.join(lines) + '\n'
+
+
+def metrics(request):
+    """
+    Serves the metrics of this process to a Prometheus scraper.
+    """
+    return HttpResponse(
+        render(), content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
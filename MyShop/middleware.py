@@ -0,0 +1,169 @@
+"""
+Profiling Middleware
+
+`ProfilingMiddleware` measures every request: wall time, number and time
+of database queries, queries repeating an SQL statement already run by
+the same request (the signature of an N+1), and response size.
+
+The measurements are returned in a `Server-Timing` header, visible in the
+browser developer tools, and aggregated into the histograms served at
+`/metrics/` (see `MyShop.metrics`). Requests running more duplicate
+queries than `settings.PROFILING_DUPLICATE_QUERY_THRESHOLD` are logged
+with the repeated statement.
+
+Queries are captured by an execute wrapper installed on every database
+connection when it opens or a request starts; the request they belong to
+is tracked with a context variable, so queries run by async views through
+`sync_to_async` in other threads are attributed too.
+"""
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from MyShop import metrics
+
+
+logger = logging.getLogger(__name__)
+
+_current_profile = ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    """
+    Measurements of one request.
+
+    Attributes:
+        started (float): `perf_counter` at the start of the request.
+        duration (float): Wall time in seconds, once finished.
+        query_count (int): Number of queries run.
+        query_time (float): Seconds spent in queries.
+        statements (Counter): SQL statement -> executions.
+    """
+    __slots__ = ('started', 'duration', 'query_count', 'query_time',
+                 'statements')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.query_count = 0
+        self.query_time = 0.0
+        self.statements = Counter()
+
+    @property
+    def duplicate_count(self):
+        """
+        Number of queries repeating a statement already run.
+        """
+        return self.query_count - len(self.statements)
+
+    def server_timing(self):
+        """
+        Formats the measurements as a `Server-Timing` header value.
+        """
+        return (
+            f'total;dur={self.duration * 1000:.1f}, '
+            f'db;dur={self.query_time * 1000:.1f};'
+            f'desc="{self.query_count} queries", '
+            f'dup;desc="{self.duplicate_count} duplicate queries"'
+        )
+
+
+def _record_query(execute, sql, params, many, context):
+    profile = _current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.query_time += time.perf_counter() - started
+        profile.query_count += 1
+        profile.statements[sql] += 1
+
+
+def _install_wrapper(sender, connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def _install_wrappers(sender, **kwargs):
+    # `request_started` runs in the thread that will serve the request's
+    # queries, also under ASGI, and finds connections opened before the
+    # middleware was loaded.
+    for connection in connections.all(initialized_only=True):
+        _install_wrapper(sender, connection)
+
+
+class ProfilingMiddleware:
+    """
+    Measures each request; see the module documentation.
+
+    Place it first in `MIDDLEWARE` so the measurements cover the whole
+    middleware stack. Disabled when `settings.PROFILING_ENABLED` is False.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.PROFILING_ENABLED
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        if self.enabled:
+            connection_created.connect(_install_wrapper)
+            request_started.connect(_install_wrappers)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+        return self.finish(request, response, profile)
+
+    def finish(self, request, response, profile):
+        """
+        Adds the `Server-Timing` header and records the request metrics.
+        """
+        profile.duration = time.perf_counter() - profile.started
+        response['Server-Timing'] = profile.server_timing()
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unmatched'
+        size = None if response.streaming else len(response.content)
+        metrics.record_request(
+            view, request.method, response.status_code, profile, size
+        )
+
+        if profile.duplicate_count > \
+                settings.PROFILING_DUPLICATE_QUERY_THRESHOLD:
+            statement, count = profile.statements.most_common(1)[0]
+            logger.warning(
+                '%s %s ran %d duplicate queries; %d x %s',
+                request.method, request.path, profile.duplicate_count,
+                count, statement,
+            )
+        return response
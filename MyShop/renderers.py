@@ -0,0 +1,85 @@
+"""
+JSON Renderers and Parsers
+
+`ORJSONRenderer` and `ORJSONParser` replace DRF's `JSONRenderer` and
+`JSONParser` project-wide (see `REST_FRAMEWORK` in the settings). They
+encode and decode with orjson, which is several times faster than the
+standard library on large listing pages, and fall back to the DRF
+classes when orjson is not installed.
+
+UUIDs (`cart_code`, `order_code`) and datetimes are encoded natively by
+orjson; decimals, lazy translations and everything else DRF's encoder
+knows are handed to it, and image field files, which `JSONRenderer`
+cannot encode, are encoded as their URL. Otherwise the output matches
+`JSONRenderer` byte for byte, except that datetimes left unserialized
+keep their microseconds.
+
+The `bench_renderers` command compares both renderers.
+"""
+from django.conf import settings
+from django.db.models.fields.files import FieldFile
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+_encoder = JSONEncoder()
+
+
+def _default(obj):
+    if isinstance(obj, FieldFile):
+        return obj.url if obj else None
+    return _encoder.default(obj)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Renders JSON with orjson; see the module documentation.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or not api_settings.UNICODE_JSON:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            # orjson only indents by two spaces.
+            option |= orjson.OPT_INDENT_2
+        ret = orjson.dumps(data, default=_default, option=option)
+
+        # Escaped like JSONRenderer does, so the output is safe to embed
+        # in JavaScript.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028')
+            ret = ret.replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class ORJSONParser(JSONParser):
+    """
+    Parses JSON request bodies with orjson.
+    """
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        encoding = (parser_context or {}).get(
+            'encoding', settings.DEFAULT_CHARSET
+        )
+        body = stream.read()
+        try:
+            if encoding.lower().replace('-', '') != 'utf8':
+                body = body.decode(encoding)
+            return orjson.loads(body)
+        except (UnicodeDecodeError, orjson.JSONDecodeError) as exc:
+            raise ParseError(f'JSON parse error - {exc}')
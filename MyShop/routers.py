@@ -0,0 +1,70 @@
+"""
+Database Routers
+
+`ReplicaRouter` spreads catalog reads over the read replicas configured in
+`MyShop.db` and keeps everything else on the primary (`default`).
+
+Only models of `REPLICA_APPS` (the read-mostly catalog) are read from
+replicas. Cart and order reads stay on the primary, since they are read
+right after being written and replication lag would show stale carts.
+Reads made inside a transaction on the primary also stay there, so the
+stock checked by checkout and add-to-cart is never a lagging copy.
+
+Reads that fill caches right after a write (the catalog snapshot, the
+similar-products candidates, cached catalog responses) must not see a
+lagging replica either, or the stale rows would be cached under the new
+catalog generation. They name the primary with `.using()`, or run inside
+`pin_to_primary()`.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+
+REPLICA_APPS = {'store', 'Category'}
+
+_pinned = ContextVar('pinned_to_primary', default=False)
+
+
+@contextmanager
+def pin_to_primary():
+    """
+    Routes every read of the enclosed block to the primary.
+    """
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Routes catalog reads to a random replica and every write to the
+    primary.
+    """
+
+    def __init__(self):
+        self.replicas = [
+            alias for alias in settings.DATABASES if alias != 'default'
+        ]
+
+    def db_for_read(self, model, **hints):
+        if not self.replicas or model._meta.app_label not in REPLICA_APPS:
+            return 'default'
+        if _pinned.get() or connections['default'].in_atomic_block:
+            return 'default'
+        return random.choice(self.replicas)
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
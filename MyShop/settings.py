@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from MyShop.db import database_settings
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -46,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'MyShop.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -87,11 +91,84 @@ WSGI_APPLICATION = 'MyShop.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
+#
+# DB_PROFILE selects 'dev' (plain SQLite), 'sqlite' (WAL, tuned for a
+# single node) or 'postgres' (persistent or pooled connections, optional
+# read replicas); see MyShop/db.py.
+
+DATABASES = database_settings(BASE_DIR)
+DATABASE_ROUTERS = ['MyShop.routers.ReplicaRouter']
+
+# Seconds after a catalog change during which cached catalog responses are
+# computed from the primary rather than a possibly lagging replica
+# (see MyShop/cache.py)
+REPLICA_LAG_SECONDS = 5
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+#
+# CATALOG_CACHE_BACKEND selects where catalog responses are cached:
+# 'locmem' (per process), 'file' (per host) or 'redis'. The catalog
+# generation counter lives in this cache and must be shared by every server
+# process, so 'locmem' is refused when WEB_CONCURRENCY asks for several
+# workers.
+
+CATALOG_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'catalog',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get(
+            'CATALOG_CACHE_LOCATION', BASE_DIR / '.cache' / 'catalog'
+        ),
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get(
+            'CATALOG_CACHE_LOCATION', 'redis://127.0.0.1:6379'
+        ),
+    },
+}
+
+CATALOG_CACHE_BACKEND = os.environ.get('CATALOG_CACHE_BACKEND', 'locmem')
+if CATALOG_CACHE_BACKEND == 'locmem' and \
+        int(os.environ.get('WEB_CONCURRENCY', 1)) > 1:
+    raise ValueError(
+        'CATALOG_CACHE_BACKEND=locmem cannot be shared by several workers; '
+        "use 'file' or 'redis'."
+    )
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': CATALOG_CACHE_BACKENDS[CATALOG_CACHE_BACKEND],
+}
+
+# Response cache of the catalog endpoints (see MyShop/cache.py)
+CATALOG_CACHE_ALIAS = 'catalog'
+CATALOG_CACHE_TIMEOUT = 60 * 10
+
+
+# Django REST framework
+# https://www.django-rest-framework.org/api-guide/settings/
+#
+# JSON is encoded and decoded with orjson when it is installed
+# (see MyShop/renderers.py).
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'MyShop.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'MyShop.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 
@@ -138,3 +215,56 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'Account.Account'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Similar products shown on the product detail page (see store/similar.py)
+SIMILAR_PRODUCTS_LIMIT = 6
+SIMILAR_PRODUCTS_RANKING = 'recent'
+SIMILAR_PRODUCTS_CACHE_TIMEOUT = 60 * 60
+
+# Product search backend used by /store/search/ (see store/search.py).
+# 'store.search.DatabaseSearchBackend' uses SQLite FTS5 or Postgres tsvector
+# and is shared by every process; 'store.search.InMemorySearchBackend' is
+# per process and only suits single-process deployments.
+STORE_SEARCH_BACKEND = 'store.search.DatabaseSearchBackend'
+STORE_SEARCH_MAX_RESULTS = 1000
+
+# Process-local catalog snapshot used to render products without queries
+# (see store/catalog.py)
+CATALOG_SNAPSHOT_ENABLED = True
+CATALOG_SNAPSHOT_MAX_BYTES = 64 * 1024 * 1024
+CATALOG_SNAPSHOT_RECHECK_SECONDS = 1.0
+# Minimum delay between rebuilds of a snapshot that exceeded the budget
+CATALOG_SNAPSHOT_RETRY_SECONDS = 300
+
+# Rows fetched per database round trip by the /store/feed/ stream
+FEED_CHUNK_SIZE = 2000
+
+# How long deletions are remembered for /store/delta/ and /categories/delta/;
+# clients with an older watermark get a full reset (see MyShop/delta.py)
+DELTA_TOMBSTONE_RETENTION_DAYS = 30
+# How far delta watermarks lag the request; must exceed the longest write
+# transaction, since rows are stamped before they commit
+DELTA_WATERMARK_MARGIN_SECONDS = 60
+
+# Minutes a checkout holds its stock before unpaid orders are released
+# by the expire_reservations command (see cart/checkout.py)
+CHECKOUT_RESERVATION_MINUTES = 15
+
+# Unpaid carts older than this are deleted by purge_carts (see cart/purge.py).
+# Set CART_PURGE_INTERVAL_SECONDS to also purge from each server process.
+CART_TTL_DAYS = 30
+CART_PURGE_BATCH_SIZE = 1000
+CART_PURGE_INTERVAL_SECONDS = None
+
+# Per-request timing and query profiling, reported in Server-Timing headers
+# and at /metrics/ (see MyShop/middleware.py)
+PROFILING_ENABLED = True
+PROFILING_DUPLICATE_QUERY_THRESHOLD = 5
+
+# Resized copies of uploaded product and category images, generated after
+# each save by a thread pool (0 workers: in the saving thread) and listed
+# in ProductSerializer.image_variants (see MyShop/images.py)
+IMAGE_VARIANT_WIDTHS = (160, 320, 640, 1280)
+IMAGE_VARIANT_FORMATS = ('webp', 'jpeg')
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_VARIANT_WORKERS = 2
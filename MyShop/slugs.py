@@ -0,0 +1,167 @@
+"""
+Unique Slug Allocation
+
+This module allocates unique slugs for models with a unique `slug` field
+(`Product` and `Category`).
+
+A slug is derived from a name with `slugify`. When it is taken, a numeric
+suffix is added: "shirt", "shirt-1", "shirt-2", ... Instead of probing one
+candidate per query, every slug sharing the base is read with a single
+`slug__startswith` query and the next free suffix is computed in memory.
+Concurrent inserts that grab the same slug are retried on IntegrityError.
+
+Models can list slugs that must never be allocated, such as the names of
+fixed routes sharing a URL segment with the slug, in `RESERVED_SLUGS`.
+"""
+import re
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.text import slugify
+
+
+# Bases looked up per query by `unique_slugs`.
+BULK_QUERY_SIZE = 200
+
+
+def slug_base(model, value, field='slug'):
+    """
+    Slugifies `value`, leaving room for a numeric suffix.
+
+    Args:
+        model (type): The model owning the slug field.
+        value (str): The text to derive the slug from.
+        field (str): Name of the slug field.
+
+    Returns:
+        str: The base slug, never empty.
+    """
+    max_length = model._meta.get_field(field).max_length
+    base = slugify(value) or model._meta.model_name
+    return base[:max_length - 8].strip('-') or model._meta.model_name
+
+
+def _suffix_re(base):
+    return re.compile(rf'^{re.escape(base)}(?:-(\d+))?$')
+
+
+class SlugAllocator:
+    """
+    Hands out unique slugs given the slugs already taken.
+
+    Attributes:
+        taken (set): Every slug already used.
+        next_suffix (dict): Base -> smallest suffix worth trying next.
+    """
+
+    def __init__(self, taken=()):
+        self.taken = set(taken)
+        self.next_suffix = {}
+
+    def allocate(self, base):
+        """
+        Returns a free slug for `base` and marks it as taken.
+        """
+        if base not in self.taken:
+            self.taken.add(base)
+            return base
+        suffix = self.next_suffix.get(base)
+        if suffix is None:
+            pattern = _suffix_re(base)
+            suffix = 1 + max(
+                int(match.group(1) or 0)
+                for match in map(pattern.match, self.taken) if match
+            )
+        slug = f'{base}-{suffix}'
+        while slug in self.taken:
+            suffix += 1
+            slug = f'{base}-{suffix}'
+        self.taken.add(slug)
+        self.next_suffix[base] = suffix + 1
+        return slug
+
+
+def _taken_slugs(model, bases, field='slug', exclude_pk=None):
+    queryset = model._default_manager.all()
+    if exclude_pk is not None:
+        queryset = queryset.exclude(pk=exclude_pk)
+    taken = set(getattr(model, 'RESERVED_SLUGS', ()))
+    bases = list(bases)
+    for start in range(0, len(bases), BULK_QUERY_SIZE):
+        condition = Q()
+        for base in bases[start:start + BULK_QUERY_SIZE]:
+            condition |= Q(**{f'{field}__startswith': base})
+        taken.update(
+            queryset.filter(condition).values_list(field, flat=True)
+        )
+    return taken
+
+
+def unique_slug(model, value, field='slug', exclude_pk=None):
+    """
+    Returns a slug for `value` that no saved row uses, with one query.
+
+    Args:
+        model (type): The model owning the slug field.
+        value (str): The text to derive the slug from.
+        field (str): Name of the slug field.
+        exclude_pk (optional): Primary key of the row being renamed.
+
+    Returns:
+        str: The unique slug.
+    """
+    base = slug_base(model, value, field)
+    taken = _taken_slugs(model, [base], field, exclude_pk)
+    return SlugAllocator(taken).allocate(base)
+
+
+def unique_slugs(model, values, field='slug'):
+    """
+    Returns unique slugs for many values at once.
+
+    Slugs are unique among themselves and against the database, which is
+    read with one query per `BULK_QUERY_SIZE` distinct bases.
+
+    Args:
+        model (type): The model owning the slug field.
+        values (iterable): The texts to derive slugs from.
+        field (str): Name of the slug field.
+
+    Returns:
+        list: One slug per value, in order.
+    """
+    bases = [slug_base(model, value, field) for value in values]
+    allocator = SlugAllocator(_taken_slugs(model, set(bases), field))
+    return [allocator.allocate(base) for base in bases]
+
+
+def save_with_unique_slug(instance, value, save, field='slug', attempts=5):
+    """
+    Fills in a unique slug and saves, retrying if a concurrent insert took
+    the same slug first.
+
+    Args:
+        instance (Model): The instance being saved, with an empty slug.
+        value (str): The text to derive the slug from.
+        save (callable): Performs the actual save.
+        field (str): Name of the slug field.
+        attempts (int): Number of slugs tried before giving up.
+
+    Raises:
+        IntegrityError: If the save fails for another reason, or every
+        attempt collided.
+    """
+    model = type(instance)
+    for attempt in range(attempts):
+        slug = unique_slug(model, value, field, exclude_pk=instance.pk)
+        setattr(instance, field, slug)
+        try:
+            with transaction.atomic():
+                return save()
+        except IntegrityError:
+            collided = model._default_manager.filter(
+                **{field: slug}
+            ).exclude(pk=instance.pk).exists()
+            if not collided or attempt == attempts - 1:
+                setattr(instance, field, '')
+                raise
@@ -18,12 +18,17 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from MyShop.cache import cache_stats
+from MyShop.metrics import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('store/', include('store.urls')),
     path('categories/', include('Category.urls')),
     path('cart/', include('cart.urls')),
+    path('cache-stats/', cache_stats, name='cache_stats'),
+    path('metrics/', metrics, name='metrics'),
+    path('async/', include('MyShop.async_urls')),
 ]
 
 if settings.DEBUG:
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from cart.models import Cart, CartItem
+from cart.models import Cart, CartItem, Order, OrderItem
 
 
 # Create an Inline model for CartItem
@@ -18,10 +18,18 @@ class CartAdmin(admin.ModelAdmin):
     Custom admin configuration for the Cart model.
     Includes inline display of associated cart items.
     """
-    list_display = ['cart_code', 'created']
+    list_display = ['cart_code', 'created', 'item_count', 'total_price']
     search_fields = ['cart_code']
+    readonly_fields = ['item_count', 'total_price']
     inlines = [CartItemInline]
 
+    def save_related(self, request, form, formsets, change):
+        """
+        Saves the inline cart items, then refreshes the cart summary.
+        """
+        super().save_related(request, form, formsets, change)
+        form.instance.refresh_summary()
+
 
 @admin.register(CartItem)
 class CartItemAdmin(admin.ModelAdmin):
@@ -31,3 +39,51 @@ class CartItemAdmin(admin.ModelAdmin):
     """
     list_display = ['product', 'cart', 'quantity']
     search_fields = ['product__name', 'cart__cart_code']
+
+    def save_model(self, request, obj, form, change):
+        """
+        Saves the cart item and refreshes its cart summary.
+        """
+        super().save_model(request, obj, form, change)
+        obj.cart.refresh_summary()
+
+    def delete_model(self, request, obj):
+        """
+        Deletes the cart item and refreshes its cart summary.
+        """
+        super().delete_model(request, obj)
+        obj.cart.refresh_summary()
+
+    def delete_queryset(self, request, queryset):
+        """
+        Deletes the selected cart items and refreshes their carts.
+        """
+        cart_ids = list(queryset.values_list('cart_id', flat=True))
+        super().delete_queryset(request, queryset)
+        Cart.objects.filter(pk__in=cart_ids).refresh_summaries()
+
+
+class OrderItemInline(admin.TabularInline):
+    """
+    Displays the lines of an order, read-only.
+    """
+    model = OrderItem
+    extra = 0
+    readonly_fields = ['product', 'quantity', 'price']
+    can_delete = False
+
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for the Order model.
+
+    Orders are read-only here: their status moves only through
+    `cart.checkout`, which keeps product stock in sync.
+    """
+    list_display = ['order_code', 'status', 'total_price', 'created',
+                    'expires_at']
+    list_filter = ['status']
+    search_fields = ['order_code', 'cart__cart_code']
+    readonly_fields = ['cart', 'status', 'total_price', 'expires_at']
+    inlines = [OrderItemInline]
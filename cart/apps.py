@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class CartConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cart'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from django.conf import settings
+        if settings.CART_PURGE_INTERVAL_SECONDS:
+            from .purge import start_scheduler
+            start_scheduler()
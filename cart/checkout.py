@@ -0,0 +1,189 @@
+"""
+Checkout and Stock Reservation
+
+This module turns a cart into an `Order` and reserves its stock so
+concurrent checkouts cannot oversell.
+
+Each line is reserved with a conditional
+`UPDATE product SET stock = stock - n WHERE id = ... AND stock >= n`; the
+row lock taken by the UPDATE is held until the transaction ends and the
+condition is re-evaluated against the committed stock, so two buyers of
+the last unit cannot both succeed. Lines are always reserved in product-id
+order, so two carts sharing products lock them in the same order and
+cannot deadlock. If any line is short, the whole transaction rolls back.
+
+Unpaid orders hold their stock until `expires_at`
+(`settings.CHECKOUT_RESERVATION_MINUTES` after checkout);
+`expire_reservations` then returns it to the products. Stock changes
+touch `date_modified`, so delta sync clients see them, and are announced
+with `store.signals.products_changed` once committed.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from store.models import Product
+from store.signals import products_changed
+from .models import Cart, CartItem, Order, OrderItem
+
+
+class CheckoutError(ValueError):
+    """
+    Raised when a cart cannot be checked out or an order cannot be paid.
+    """
+
+
+class OutOfStock(CheckoutError):
+    """
+    Raised when a product has fewer units in stock than ordered.
+
+    Attributes:
+        product_id (int): The product that ran out.
+    """
+
+    def __init__(self, product_id, message):
+        super().__init__(message)
+        self.product_id = product_id
+
+
+def _announce_stock_change(product_ids):
+    product_ids = sorted(product_ids)
+    transaction.on_commit(lambda: products_changed.send(
+        sender=Product, product_ids=product_ids, fields={'stock'}
+    ))
+
+
+def _restock(order):
+    lines = order.items.order_by('product_id').values_list(
+        'product_id', 'quantity'
+    )
+    product_ids = []
+    for product_id, quantity in lines:
+        Product.objects.filter(pk=product_id).update(
+            stock=F('stock') + quantity, date_modified=Now()
+        )
+        product_ids.append(product_id)
+    _announce_stock_change(product_ids)
+
+
+def checkout(cart):
+    """
+    Converts a cart into a pending order and reserves its stock.
+
+    Args:
+        cart (Cart): The cart to check out.
+
+    Returns:
+        Order: The pending order, with `items` loaded.
+
+    Raises:
+        CheckoutError: If the cart is paid, empty or already checked out.
+        OutOfStock: If a product has fewer units left than ordered; no
+            stock is reserved in that case.
+    """
+    with transaction.atomic():
+        cart = Cart.objects.select_for_update().get(pk=cart.pk)
+        if cart.paid:
+            raise CheckoutError('Cart is already paid')
+        if Order.objects.filter(cart=cart, status=Order.PENDING).exists():
+            raise CheckoutError('Cart already has a pending order')
+
+        lines = list(CartItem.objects.filter(cart=cart).order_by(
+            'product_id'
+        ).values_list(
+            'product_id', 'quantity', 'product__price',
+            'product__product_name',
+        ))
+        if not lines:
+            raise CheckoutError('Cart is empty')
+
+        for product_id, quantity, _, name in lines:
+            reserved = Product.objects.filter(
+                pk=product_id, is_available=True, stock__gte=quantity
+            ).update(stock=F('stock') - quantity, date_modified=Now())
+            if not reserved:
+                raise OutOfStock(
+                    product_id, f'Not enough {name} in stock'
+                )
+
+        order = Order.objects.create(
+            cart=cart,
+            total_price=sum(q * price for _, q, price, _ in lines),
+            expires_at=timezone.now() + timedelta(
+                minutes=settings.CHECKOUT_RESERVATION_MINUTES
+            ),
+        )
+        items = OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order, product_id=product_id, quantity=quantity,
+                price=price,
+            )
+            for product_id, quantity, price, _ in lines
+        ])
+        _announce_stock_change(line[0] for line in lines)
+
+    order._prefetched_objects_cache = {'items': items}
+    return order
+
+
+def confirm_payment(order):
+    """
+    Marks a pending order, and its cart, as paid.
+
+    Args:
+        order (Order): The order that was paid for.
+
+    Returns:
+        Order: The paid order.
+
+    Raises:
+        CheckoutError: If the order is not pending or its reservation
+            has expired.
+    """
+    with transaction.atomic():
+        order = Order.objects.select_for_update().get(pk=order.pk)
+        if order.status != Order.PENDING:
+            raise CheckoutError(f'Order is {order.status}')
+        if order.expires_at <= timezone.now():
+            raise CheckoutError('Order reservation has expired')
+        order.status = Order.PAID
+        order.save(update_fields=['status'])
+        Cart.objects.filter(pk=order.cart_id).update(paid=True)
+    return order
+
+
+def expire_reservations(now=None, batch_size=100):
+    """
+    Releases the stock of pending orders whose reservation has expired.
+
+    Each order is expired in its own short transaction, so a long backlog
+    never holds product locks for long.
+
+    Args:
+        now (datetime, optional): The reference time; defaults to now.
+        batch_size (int): Orders read per query.
+
+    Returns:
+        int: The number of orders expired.
+    """
+    now = now or timezone.now()
+    expired = 0
+    while True:
+        order_ids = list(Order.objects.filter(
+            status=Order.PENDING, expires_at__lte=now
+        ).order_by('expires_at').values_list('id', flat=True)[:batch_size])
+        if not order_ids:
+            return expired
+        for order_id in order_ids:
+            with transaction.atomic():
+                # Another worker or a payment may have got there first.
+                updated = Order.objects.filter(
+                    pk=order_id, status=Order.PENDING, expires_at__lte=now
+                ).update(status=Order.EXPIRED)
+                if updated:
+                    _restock(Order(pk=order_id))
+                    expired += updated
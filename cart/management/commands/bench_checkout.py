@@ -0,0 +1,127 @@
+"""
+Hammers one hot product with concurrent checkouts.
+
+A product with `--stock` units is seeded into a throwaway test database,
+together with `--buyers` carts holding one unit each. The carts are then
+checked out from `--threads` threads at once. The command reports
+throughput and latency, and fails if more units were sold than were in
+stock.
+
+Example:
+    python manage.py bench_checkout --threads 32 --buyers 500 --stock 100
+"""
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+
+from Category.models import Category
+from cart.checkout import CheckoutError, OutOfStock, checkout
+from cart.models import Cart, CartItem, Order
+from store.models import Product
+from store.seeding import benchmark_database
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks concurrent checkouts of a single hot product.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--buyers', type=int, default=300)
+        parser.add_argument('--stock', type=int, default=100)
+        parser.add_argument(
+            '--retries', type=int, default=5,
+            help='Attempts per checkout when the database reports a lock '
+                 'conflict (SQLite).'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            # Deferred SQLite transactions that read before writing fail
+            # with "database is locked" instead of waiting for the writer
+            # (the DB_PROFILE=sqlite profile sets this too).
+            connection.settings_dict.setdefault('OPTIONS', {}).setdefault(
+                'transaction_mode', 'IMMEDIATE'
+            )
+        with benchmark_database(on_disk=True):
+            product = self.seed(options['buyers'], options['stock'])
+            self.run_benchmark(product, options)
+
+    def seed(self, buyers, stock):
+        category = Category.objects.create(
+            category_name='Flash sale', description='Benchmark'
+        )
+        product = Product.objects.create(
+            product_name='Hot item', price=100, stock=stock,
+            category=category,
+        )
+        Cart.objects.bulk_create([Cart() for _ in range(buyers)])
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, product=product, quantity=1)
+            for cart in Cart.objects.only('id')
+        ])
+        return product
+
+    def run_benchmark(self, product, options):
+        outcomes = {'sold': 0, 'out_of_stock': 0, 'failed': 0, 'retries': 0}
+        lock = threading.Lock()
+        latencies = []
+
+        def buy(cart):
+            started = time.perf_counter()
+            outcome = 'failed'
+            try:
+                for _ in range(options['retries']):
+                    try:
+                        checkout(cart)
+                        outcome = 'sold'
+                    except OutOfStock:
+                        outcome = 'out_of_stock'
+                    except CheckoutError:
+                        pass
+                    except OperationalError:
+                        with lock:
+                            outcomes['retries'] += 1
+                        continue
+                    break
+            finally:
+                connection.close()
+            with lock:
+                outcomes[outcome] += 1
+                latencies.append(time.perf_counter() - started)
+
+        carts = list(Cart.objects.only('id'))
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['threads']) as pool:
+            list(pool.map(buy, carts))
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        quantiles = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f"{len(carts)} checkouts from {options['threads']} threads in "
+            f'{elapsed:.2f}s ({len(carts) / elapsed:.0f}/s)'
+        )
+        self.stdout.write(
+            f'latency p50 {quantiles[49] * 1000:.1f} ms, '
+            f'p95 {quantiles[94] * 1000:.1f} ms, '
+            f'p99 {quantiles[98] * 1000:.1f} ms'
+        )
+        self.stdout.write(
+            ', '.join(f'{name} {count}' for name, count in outcomes.items())
+        )
+
+        product.refresh_from_db()
+        orders = Order.objects.count()
+        sold = options['stock'] - product.stock
+        if product.stock < 0 or sold != orders or orders > options['stock']:
+            raise CommandError(
+                f'Oversold: {orders} orders for {options["stock"]} units, '
+                f'{product.stock} left in stock.'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'No overselling: {orders} orders, {product.stock} units left.'
+        ))
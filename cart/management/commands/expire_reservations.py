@@ -0,0 +1,25 @@
+"""
+Releases the stock held by unpaid orders whose reservation has expired.
+
+Run it every minute or so from cron or a task scheduler, e.g.:
+    python manage.py expire_reservations
+"""
+from django.core.management.base import BaseCommand
+
+from cart.checkout import expire_reservations
+
+
+class Command(BaseCommand):
+    help = 'Expires unpaid orders and returns their stock to the products.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Number of orders read per query.'
+        )
+
+    def handle(self, *args, **options):
+        expired = expire_reservations(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Expired {expired} orders.'
+        ))
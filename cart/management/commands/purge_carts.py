@@ -0,0 +1,50 @@
+"""
+Deletes abandoned carts.
+
+Unpaid carts older than `--ttl-days` (default `settings.CART_TTL_DAYS`)
+are deleted with their items in id-range batches, each in its own short
+transaction (see `cart.purge`). Run it daily, e.g.:
+    python manage.py purge_carts --ttl-days 30
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from cart.purge import purge_carts
+
+
+class Command(BaseCommand):
+    help = 'Deletes unpaid carts older than a TTL in bounded batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ttl-days', type=int, default=settings.CART_TTL_DAYS,
+            help='Age in days of the unpaid carts to delete.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.CART_PURGE_BATCH_SIZE,
+            help='Number of cart ids covered per DELETE.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report how many carts would be deleted.'
+        )
+
+    def handle(self, *args, **options):
+        def progress(carts, items, last_id):
+            self.stdout.write(
+                f'Up to cart id {last_id}: {carts} carts, {items} items '
+                'deleted'
+            )
+
+        carts, items = purge_carts(
+            options['ttl_days'], options['batch_size'],
+            dry_run=options['dry_run'],
+            progress=progress if options['verbosity'] > 0 else None,
+        )
+        if options['dry_run']:
+            self.stdout.write(f'{carts} carts with {items} items would be '
+                              'deleted.')
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Deleted {carts} carts with {items} items.'
+            ))
@@ -0,0 +1,48 @@
+"""
+Recomputes the denormalized cart summaries.
+
+`Cart.item_count` and `Cart.total_price` are maintained by every cart
+mutation path; this command repairs them after writes that bypassed those
+paths, such as raw SQL or bulk imports. Carts are processed in primary-key
+ranges so each UPDATE touches a bounded number of rows.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Max, Q
+
+from cart.models import Cart
+
+
+class Command(BaseCommand):
+    help = 'Recomputes Cart.item_count and Cart.total_price in bulk.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of cart ids recomputed per UPDATE.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report the carts whose summary is out of date.'
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            stale = Cart.objects.with_totals().filter(
+                ~Q(item_count=F('num_of_items_value')) |
+                ~Q(total_price=F('total_price_value'))
+            ).count()
+            self.stdout.write(f'{stale} carts have an out-of-date summary.')
+            return
+
+        batch_size = options['batch_size']
+        last_id = Cart.objects.aggregate(last=Max('id'))['last'] or 0
+        updated = 0
+        for start in range(0, last_id + 1, batch_size):
+            with transaction.atomic():
+                updated += Cart.objects.filter(
+                    id__gte=start, id__lt=start + batch_size
+                ).refresh_summaries()
+        self.stdout.write(self.style.SUCCESS(
+            f'Recomputed the summary of {updated} carts.'
+        ))
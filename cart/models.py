@@ -6,13 +6,74 @@ ecommerce application. The Cart model represents a shopping cart, while
 the CartItem model represents individual products within a cart.
 """
 
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, OuterRef, Prefetch, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.conf import settings
 import uuid
 
+from store import catalog
 from store.models import Product
 
 
+class CartQuerySet(models.QuerySet):
+    """
+    Custom queryset for the `Cart` model.
+    """
+
+    def with_totals(self):
+        """
+        Annotates each cart with totals computed by the database.
+
+        Returns:
+            CartQuerySet: Carts with `total_price_value` (sum of quantity
+            times product price) and `num_of_items_value` (sum of
+            quantities).
+        """
+        return self.annotate(
+            total_price_value=Coalesce(
+                Sum(F('items__quantity') * F('items__product__price')), 0
+            ),
+            num_of_items_value=Coalesce(Sum('items__quantity'), 0),
+        )
+
+    def refresh_summaries(self):
+        """
+        Recomputes the denormalized `item_count` and `total_price` of the
+        selected carts with a single UPDATE.
+
+        Returns:
+            int: The number of carts updated.
+        """
+        items = CartItem.objects.filter(cart=OuterRef('pk')).order_by()
+        items = items.values('cart')
+        return self.update(
+            item_count=Coalesce(Subquery(
+                items.annotate(total=Sum('quantity')).values('total')
+            ), 0),
+            total_price=Coalesce(Subquery(
+                items.annotate(
+                    total=Sum(F('quantity') * F('product__price'))
+                ).values('total')
+            ), 0),
+        )
+
+    def with_items(self):
+        """
+        Prefetches the cart items in one extra query.
+
+        Products and categories are joined in only when the catalog
+        snapshot, which `CartItemSerializer` reads them from, is disabled.
+
+        Returns:
+            CartQuerySet: Carts ready for `CartSerializer`.
+        """
+        items = CartItem.objects.all()
+        if catalog.get_snapshot() is None:
+            items = items.select_related('product__category')
+        return self.prefetch_related(Prefetch('items', queryset=items))
+
+
 class Cart(models.Model):
     """
     Represents a shopping cart.
@@ -20,6 +81,10 @@ class Cart(models.Model):
     Each cart has a unique UUID code,
     and may be optionally associated with a user.
     Carts are marked as 'paid' once a purchase is completed.
+
+    `item_count` and `total_price` are denormalized from the cart items and
+    refreshed by every cart mutation (see `refresh_summary`), so reading
+    them costs a single primary-key lookup.
     """
     cart_code = models.UUIDField(
         default=uuid.uuid4,
@@ -35,10 +100,144 @@ class Cart(models.Model):
     )
     created = models.DateTimeField(auto_now_add=True)
     paid = models.BooleanField(default=False)
+    item_count = models.PositiveIntegerField(default=0)
+    total_price = models.IntegerField(default=0)
+
+    objects = CartQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Lets `purge_carts` find abandoned carts without a full scan.
+            models.Index(fields=['paid', 'created'],
+                         name='cart_paid_created_idx'),
+        ]
 
     def __str__(self):
         return str(self.cart_code)
 
+    def refresh_summary(self):
+        """
+        Recomputes `item_count` and `total_price` in the database and loads
+        the new values into this instance.
+
+        Call it in the transaction that changed the cart items.
+        """
+        Cart.objects.filter(pk=self.pk).refresh_summaries()
+        self.refresh_from_db(fields=['item_count', 'total_price'])
+
+
+class CartItemQuerySet(models.QuerySet):
+    """
+    Custom queryset for the `CartItem` model.
+    """
+
+    def add_product(self, cart, product, quantity=1):
+        """
+        Adds `quantity` units of a product to a cart as an atomic upsert.
+
+        An existing line is incremented in place with
+        `quantity = quantity + n`, guarded by the stock column in the
+        statement's WHERE clause, so a concurrent stock change is seen;
+        otherwise a new line is inserted, checked against `product.stock`.
+        A concurrent insert of the same line hits the `(cart, product)`
+        unique constraint and is retried as an increment.
+
+        Call it inside a transaction.
+
+        Args:
+            cart (Cart): The cart to add to.
+            product (Product): The product, with `stock` loaded.
+            quantity (int): Units to add.
+
+        Returns:
+            bool: True if a new cart line was created.
+
+        Raises:
+            ValueError: If the cart would hold more units than in stock.
+        """
+        line = self.filter(cart=cart, product=product)
+        for _ in range(2):
+            updated = line.filter(
+                product__stock__gte=F('quantity') + quantity
+            ).update(quantity=F('quantity') + quantity)
+            if updated:
+                return False
+            if line.exists() or quantity > product.stock:
+                raise ValueError(
+                    f'Only {product.stock} of {product.product_name} '
+                    'in stock'
+                )
+            try:
+                with transaction.atomic():
+                    self.create(cart=cart, product=product, quantity=quantity)
+                return True
+            except IntegrityError:
+                continue
+        raise ValueError('Could not add the product to the cart')
+
+    def apply_operations(self, cart, products, operations):
+        """
+        Applies a batch of add/remove/set operations to a cart.
+
+        The final quantity of every touched line is computed in memory, then
+        written with at most one `bulk_create`, one `bulk_update` and one
+        delete. Call it inside a transaction.
+
+        Args:
+            cart (Cart): The cart to change.
+            products (dict): Product id -> product with `stock` loaded, for
+                every product referenced by `operations`.
+            operations (list): Dicts with `op` (`add`, `remove` or `set`),
+                `product_id` and, except for `remove`, `quantity`.
+
+        Raises:
+            ValueError: If a line would hold more units than in stock.
+        """
+        existing = {
+            item.product_id: item
+            for item in self.filter(cart=cart, product_id__in=products)
+        }
+        quantities = {
+            product_id: item.quantity for product_id, item in existing.items()
+        }
+        for operation in operations:
+            product_id = operation['product_id']
+            if operation['op'] == 'add':
+                quantities[product_id] = (
+                    quantities.get(product_id, 0) + operation['quantity']
+                )
+            elif operation['op'] == 'set':
+                quantities[product_id] = operation['quantity']
+            else:
+                quantities[product_id] = 0
+
+        to_create, to_update, to_delete = [], [], []
+        for product_id, quantity in quantities.items():
+            product = products[product_id]
+            if quantity > product.stock:
+                raise ValueError(
+                    f'Only {product.stock} of {product.product_name} '
+                    'in stock'
+                )
+            item = existing.get(product_id)
+            if item is None:
+                if quantity:
+                    to_create.append(self.model(
+                        cart=cart, product=product, quantity=quantity
+                    ))
+            elif not quantity:
+                to_delete.append(product_id)
+            elif quantity != item.quantity:
+                item.quantity = quantity
+                to_update.append(item)
+
+        if to_create:
+            self.bulk_create(to_create)
+        if to_update:
+            self.bulk_update(to_update, ['quantity'])
+        if to_delete:
+            self.filter(cart=cart, product_id__in=to_delete).delete()
+
 
 class CartItem(models.Model):
     """
@@ -58,5 +257,87 @@ class CartItem(models.Model):
         on_delete=models.CASCADE
     )
 
+    objects = CartItemQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['cart', 'product'], name='unique_cart_product'
+            ),
+        ]
+
     def __str__(self):
         return f'{self.quantity} x {self.product.product_name}'
+
+
+class Order(models.Model):
+    """
+    A checked-out cart.
+
+    Creating an order reserves its stock: the ordered units are taken off
+    `Product.stock` until the order is paid, or put back when the
+    reservation expires unpaid (see `cart.checkout`).
+
+    Attributes:
+        order_code (UUID): Public identifier of the order.
+        cart (ForeignKey): The cart that was checked out.
+        status (str): `pending` while the stock is reserved, then `paid`
+            or `expired`.
+        total_price (int): Sum of the order lines at checkout prices.
+        created (datetime): When the order was placed.
+        expires_at (datetime): When an unpaid reservation is released.
+    """
+    PENDING = 'pending'
+    PAID = 'paid'
+    EXPIRED = 'expired'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'), (PAID, 'Paid'), (EXPIRED, 'Expired'),
+    ]
+
+    order_code = models.UUIDField(
+        default=uuid.uuid4,
+        unique=True,
+        editable=False
+    )
+    cart = models.ForeignKey(
+        Cart,
+        on_delete=models.CASCADE,
+        related_name='orders'
+    )
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=PENDING
+    )
+    total_price = models.IntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['cart'], condition=models.Q(status='pending'),
+                name='one_pending_order_per_cart'
+            ),
+        ]
+
+    def __str__(self):
+        return str(self.order_code)
+
+
+class OrderItem(models.Model):
+    """
+    A line of an order, with the unit price charged at checkout.
+    """
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='items'
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE
+    )
+    quantity = models.PositiveIntegerField()
+    price = models.IntegerField()
+
+    def __str__(self):
+        return f'{self.quantity} x {self.product_id} @ {self.price}'
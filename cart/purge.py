@@ -0,0 +1,124 @@
+"""
+Abandoned Cart Purge
+
+Anonymous carts are created by the first `add_to_cart` of every visitor
+and are never paid for most of them. This module deletes unpaid carts
+older than `settings.CART_TTL_DAYS`.
+
+Carts are deleted in primary-key ranges of `settings.CART_PURGE_BATCH_SIZE`
+ids, each in its own short transaction, so the purge never holds locks on
+a large part of the cart tables. Carts with a pending order keep their
+stock reservation and are skipped.
+
+The purge runs from the `purge_carts` command, or in a background thread
+of each server process when `settings.CART_PURGE_INTERVAL_SECONDS` is set
+(see `start_scheduler`).
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import Cart, CartItem, Order
+
+
+logger = logging.getLogger(__name__)
+
+
+def abandoned_carts(ttl_days=None, now=None):
+    """
+    Returns the unpaid carts older than the TTL.
+
+    Args:
+        ttl_days (int, optional): Age in days; defaults to
+            `settings.CART_TTL_DAYS`.
+        now (datetime, optional): The reference time; defaults to now.
+
+    Returns:
+        CartQuerySet: The carts to purge.
+    """
+    if ttl_days is None:
+        ttl_days = settings.CART_TTL_DAYS
+    cutoff = (now or timezone.now()) - timedelta(days=ttl_days)
+    return Cart.objects.filter(paid=False, created__lt=cutoff).exclude(
+        orders__status=Order.PENDING
+    )
+
+
+def purge_carts(ttl_days=None, batch_size=None, dry_run=False,
+                progress=None):
+    """
+    Deletes abandoned carts and their items in id-range batches.
+
+    Args:
+        ttl_days (int, optional): Age in days of the carts to delete.
+        batch_size (int, optional): Cart ids covered per batch; defaults to
+            `settings.CART_PURGE_BATCH_SIZE`.
+        dry_run (bool): Count the carts and items without deleting them.
+        progress (callable, optional): Called after each batch with the
+            carts and items deleted so far and the last id covered.
+
+    Returns:
+        tuple: `(carts, items)` deleted, or that would be deleted.
+    """
+    batch_size = batch_size or settings.CART_PURGE_BATCH_SIZE
+    candidates = abandoned_carts(ttl_days)
+    if dry_run:
+        return candidates.count(), CartItem.objects.filter(
+            cart__in=candidates
+        ).count()
+
+    bounds = candidates.aggregate(first=Min('id'), last=Max('id'))
+    if bounds['first'] is None:
+        return 0, 0
+    carts = items = 0
+    for start in range(bounds['first'], bounds['last'] + 1, batch_size):
+        with transaction.atomic():
+            ids = list(candidates.filter(
+                id__gte=start, id__lt=start + batch_size
+            ).values_list('id', flat=True))
+            if ids:
+                items += CartItem.objects.filter(cart_id__in=ids).delete()[0]
+                _, deleted = Cart.objects.filter(id__in=ids).delete()
+                carts += deleted.get(Cart._meta.label, 0)
+        if progress is not None:
+            progress(carts, items, start + batch_size - 1)
+    return carts, items
+
+
+def start_scheduler(interval=None):
+    """
+    Runs `purge_carts` every `interval` seconds in a daemon thread.
+
+    Called from `CartConfig.ready` when
+    `settings.CART_PURGE_INTERVAL_SECONDS` is set. Deployments with cron or
+    a task queue should leave it unset and schedule the `purge_carts`
+    command instead.
+
+    Args:
+        interval (float, optional): Seconds between runs; defaults to
+            `settings.CART_PURGE_INTERVAL_SECONDS`.
+
+    Returns:
+        threading.Timer: The timer of the next run.
+    """
+    interval = interval or settings.CART_PURGE_INTERVAL_SECONDS
+
+    def run():
+        try:
+            carts, items = purge_carts()
+            logger.info('Purged %d carts and %d cart items', carts, items)
+        except Exception:
+            logger.exception('Cart purge failed')
+        finally:
+            connection.close()
+            start_scheduler(interval)
+
+    timer = threading.Timer(interval, run)
+    timer.daemon = True
+    timer.start()
+    return timer
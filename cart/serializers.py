@@ -9,11 +9,16 @@ Serializers:
 - CartSerializer: Serializes the entire cart with all items.
 - SimpleCartSerializer: Serializes minimal cart details\
     such as cart code and total item count.
+- OrderSerializer: Serializes an order and its lines.
+- cart_item_rows, cart_rows: Render `.values()` rows like\
+    CartItemSerializer and CartSerializer, see `MyShop.compiled`.
 """
 
 from rest_framework import serializers
-from .models import Cart, CartItem
-from store.serializers import ProductSerializer
+from .models import Cart, CartItem, Order, OrderItem
+from store import catalog
+from MyShop.compiled import CompiledSerializer
+from store.serializers import ProductSerializer, product_rows
 
 
 class CartItemSerializer(serializers.ModelSerializer):
@@ -22,8 +27,11 @@ class CartItemSerializer(serializers.ModelSerializer):
 
     Serializes cart item fields,\
         including product details and the calculated item price.
+
+    Product details are rendered from the catalog snapshot when possible,
+    so cart items can be serialized without loading their products.
     """
-    product = ProductSerializer(read_only=True)
+    product = serializers.SerializerMethodField()
     item_price = serializers.SerializerMethodField()
 
     class Meta:
@@ -36,12 +44,25 @@ class CartItemSerializer(serializers.ModelSerializer):
             'id', 'quantity', 'cart', 'product', 'item_price'
         ]
 
+    def get_product(self, cartitem):
+        """
+        Serialize the product like `ProductSerializer`.
+        """
+        record = catalog.get_product(cartitem.product_id)
+        if record is not None:
+            data = catalog.product_data(record, self.context.get('request'))
+            if data is not None:
+                return data
+        return ProductSerializer(cartitem.product, context=self.context).data
+
     def get_item_price(self, cartitem):
         """
         Calculate the total price for a cart item based on\
             quantity and product price.
         """
-        return cartitem.quantity * cartitem.product.price
+        record = catalog.get_product(cartitem.product_id)
+        price = record.price if record else cartitem.product.price
+        return cartitem.quantity * price
 
 
 class CartSerializer(serializers.ModelSerializer):
@@ -65,12 +86,51 @@ class CartSerializer(serializers.ModelSerializer):
 
     def get_total_price(self, cart):
         """
-        Compute the total price of all items in the cart.
+        Return the total price of all items in the cart.
+
+        Uses the `total_price_value` annotation of
+        `Cart.objects.with_totals()` when present, otherwise the
+        denormalized `Cart.total_price`.
         """
-        return sum([
-            item.quantity * item.product.price
-            for item in cart.items.all()
-        ])
+        return getattr(cart, 'total_price_value', cart.total_price)
+
+
+cart_item_rows = CompiledSerializer(
+    CartItemSerializer,
+    nested={'product': product_rows.with_prefix('product__')},
+    methods={
+        'item_price': lambda row, context:
+            row['quantity'] * row['product__price'],
+    },
+    method_values={'item_price': ('quantity', 'product__price')},
+)
+cart_rows = CompiledSerializer(CartSerializer, nested={
+    'items': cart_item_rows,
+})
+
+
+def cart_values(carts, serializer=cart_rows):
+    """
+    Reads carts as rows for `cart_rows`, in two queries.
+
+    Args:
+        carts (QuerySet): The carts.
+        serializer (CompiledSerializer, optional): The `cart_rows` variant
+            the rows are read for, when narrowed.
+
+    Returns:
+        list: Cart rows, each with its item rows under `items`.
+    """
+    rows = list(carts.values('id', *serializer.values))
+    if serializer.fields is not None and 'items' not in serializer.fields:
+        return rows
+    by_id = {row['id']: row for row in rows}
+    for row in rows:
+        row['items'] = []
+    items = CartItem.objects.filter(cart_id__in=list(by_id)).order_by('id')
+    for item in items.values('cart', *serializer.nested['items'].values):
+        by_id[item['cart']]['items'].append(item)
+    return rows
 
 
 class SimpleCartSerializer(serializers.ModelSerializer):
@@ -94,6 +154,33 @@ class SimpleCartSerializer(serializers.ModelSerializer):
 
     def get_num_of_items(self, cart):
         """
-        Calculate the total number of items (quantities summed) in the cart.
+        Return the total number of items (quantities summed) in the cart.
+
+        Uses the `num_of_items_value` annotation of
+        `Cart.objects.with_totals()` when present, otherwise the
+        denormalized `Cart.item_count`.
         """
-        return sum([item.quantity for item in cart.items.all()])
+        return getattr(cart, 'num_of_items_value', cart.item_count)
+
+
+class OrderItemSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the OrderItem model.
+    """
+    class Meta:
+        model = OrderItem
+        fields = ['product', 'quantity', 'price']
+
+
+class OrderSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the Order model, including its lines.
+    """
+    items = OrderItemSerializer(read_only=True, many=True)
+
+    class Meta:
+        model = Order
+        fields = [
+            'order_code', 'status', 'total_price', 'created', 'expires_at',
+            'items'
+        ]
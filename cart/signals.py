@@ -0,0 +1,63 @@
+"""
+Cart App Signals
+
+This module keeps the denormalized cart summaries in sync with product
+prices and contents. The receivers are connected in `CartConfig.ready`.
+"""
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from store.models import Product
+from store.signals import products_changed
+from .models import Cart
+
+
+@receiver(post_save, sender=Product)
+def refresh_cart_totals(sender, instance, created, **kwargs):
+    """
+    Recomputes the totals of unpaid carts holding the saved product, since
+    its price may have changed.
+    """
+    if not created:
+        Cart.objects.filter(
+            paid=False, items__product=instance
+        ).refresh_summaries()
+
+
+@receiver(pre_delete, sender=Product)
+def remember_product_carts(sender, instance, using, **kwargs):
+    """
+    Records the unpaid carts holding a product about to be deleted, before
+    the delete cascades to their items.
+    """
+    instance._cart_ids = list(Cart.objects.using(using).filter(
+        paid=False, items__product=instance
+    ).values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Product)
+def refresh_deleted_product_carts(sender, instance, using, **kwargs):
+    """
+    Recomputes the totals of the unpaid carts that held the deleted product.
+    """
+    cart_ids = getattr(instance, '_cart_ids', ())
+    for start in range(0, len(cart_ids), 500):
+        Cart.objects.using(using).filter(
+            pk__in=cart_ids[start:start + 500]
+        ).refresh_summaries()
+
+
+@receiver(products_changed)
+def refresh_bulk_cart_totals(sender, product_ids, fields=None, **kwargs):
+    """
+    Recomputes the totals of unpaid carts holding products whose price was
+    changed in bulk.
+    """
+    if fields is not None and 'price' not in fields:
+        return
+    product_ids = list(product_ids)
+    for start in range(0, len(product_ids), 500):
+        Cart.objects.filter(
+            paid=False,
+            items__product_id__in=product_ids[start:start + 500]
+        ).refresh_summaries()
@@ -1,3 +1,576 @@
-from django.test import TestCase
+import uuid
+from datetime import timedelta
+from io import StringIO
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from Category.models import Category
+from store import catalog
+from store.models import Product
+from .checkout import OutOfStock, checkout, expire_reservations
+from .models import Cart, CartItem, Order
+from .serializers import CartSerializer, cart_rows, cart_values
+
+
+class CartTestCase(TestCase):
+    """
+    Base class creating a small catalog and an empty cart code.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(
+            category_name='Shirts', description='Shirts'
+        )
+        cls.shirt = Product.objects.create(
+            product_name='Shirt', price=1500, stock=5, category=cls.category
+        )
+        cls.hat = Product.objects.create(
+            product_name='Hat', price=700, stock=2, category=cls.category
+        )
+
+    def setUp(self):
+        caches['catalog'].clear()
+        catalog.reset()
+        self.cart_code = str(uuid.uuid4())
+
+    def add(self, product, quantity=None):
+        data = {'product_id': product.id, 'cart_code': self.cart_code}
+        if quantity is not None:
+            data['quantity'] = quantity
+        return self.client.post(reverse('add_to_cart'), data)
+
+
+class AddToCartTests(CartTestCase):
+    """
+    Tests the atomic add-to-cart upsert.
+    """
+
+    def test_repeated_adds_increment_one_line(self):
+        self.add(self.shirt)
+        response = self.add(self.shirt, 2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['quantity'], 3)
+        self.assertEqual(response.data['cart']['num_of_items'], 3)
+        self.assertEqual(response.data['cart']['total_price'], 4500)
+        self.assertEqual(CartItem.objects.count(), 1)
+
+    def test_stock_is_checked(self):
+        self.add(self.hat, 2)
+        response = self.add(self.hat)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('in stock', response.data['error'])
+        self.assertEqual(CartItem.objects.get().quantity, 2)
+
+    def test_increment_checks_current_stock(self):
+        cart = Cart.objects.create(cart_code=self.cart_code)
+        CartItem.objects.add_product(cart, self.shirt, 2)
+        Product.objects.filter(id=self.shirt.id).update(stock=2)
+        with self.assertRaises(ValueError):
+            # `self.shirt.stock` still says 5.
+            CartItem.objects.add_product(cart, self.shirt, 1)
+        self.assertEqual(CartItem.objects.get().quantity, 2)
+
+    def test_invalid_quantity(self):
+        self.assertEqual(self.add(self.shirt, 0).status_code, 400)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_summary_covers_every_line(self):
+        self.add(self.shirt)
+        response = self.add(self.hat, 2)
+        self.assertEqual(response.data['cart']['num_of_items'], 3)
+        self.assertEqual(response.data['cart']['total_price'], 2900)
+        self.assertEqual(Cart.objects.count(), 1)
+
+
+class BatchUpdateCartTests(CartTestCase):
+    """
+    Tests the batch cart mutation endpoint.
+    """
+
+    def batch(self, operations):
+        return self.client.post(
+            reverse('batch_update_cart'),
+            {'cart_code': self.cart_code, 'operations': operations},
+            content_type='application/json'
+        )
+
+    def test_operations_are_applied_in_order(self):
+        self.add(self.hat)
+        response = self.batch([
+            {'op': 'add', 'product_id': self.shirt.id, 'quantity': 2},
+            {'op': 'add', 'product_id': self.shirt.id},
+            {'op': 'remove', 'product_id': self.hat.id},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_price'], 4500)
+        self.assertEqual(
+            [(item['product']['id'], item['quantity'])
+             for item in response.data['items']],
+            [(self.shirt.id, 3)]
+        )
+
+    def test_set_quantity_and_zero_removes(self):
+        self.add(self.shirt)
+        self.batch([
+            {'op': 'set', 'product_id': self.shirt.id, 'quantity': 4},
+            {'op': 'set', 'product_id': self.hat.id, 'quantity': 1},
+        ])
+        self.assertEqual(
+            dict(CartItem.objects.values_list('product_id', 'quantity')),
+            {self.shirt.id: 4, self.hat.id: 1}
+        )
+        self.batch([{'op': 'set', 'product_id': self.shirt.id,
+                     'quantity': 0}])
+        self.assertFalse(
+            CartItem.objects.filter(product=self.shirt).exists()
+        )
+
+    def test_batch_is_all_or_nothing(self):
+        for operations in (
+            [{'op': 'add', 'product_id': self.shirt.id},
+             {'op': 'add', 'product_id': self.hat.id, 'quantity': 3}],
+            [{'op': 'add', 'product_id': self.shirt.id},
+             {'op': 'add', 'product_id': 0}],
+            [{'op': 'drop', 'product_id': self.shirt.id}],
+        ):
+            response = self.batch(operations)
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(CartItem.objects.exists())
+
+
+class CartReadQueryCountTests(CartTestCase):
+    """
+    Cart reads cost the same number of queries for 1 or 500 items.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Product.objects.bulk_create([
+            Product(
+                product_name=f'Bulk {index}', slug=f'bulk-{index}',
+                price=index, stock=10, category=cls.category
+            )
+            for index in range(500)
+        ])
+        cls.small = Cart.objects.create()
+        cls.large = Cart.objects.create()
+        products = list(Product.objects.filter(slug__startswith='bulk-'))
+        CartItem.objects.create(cart=cls.small, product=products[0])
+        CartItem.objects.bulk_create([
+            CartItem(cart=cls.large, product=product, quantity=2)
+            for product in products
+        ])
+        Cart.objects.refresh_summaries()
+
+    def setUp(self):
+        super().setUp()
+        # Products are rendered from the warm catalog snapshot.
+        catalog.get_snapshot()
+
+    def get(self, name, cart, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get(
+                reverse(name), {'cart_code': str(cart.cart_code)}
+            )
+        return response.data
+
+    def test_get_cart(self):
+        for cart in (self.small, self.large):
+            data = self.get('get_cart', cart, 2)
+        self.assertEqual(len(data['items']), 500)
+        self.assertEqual(data['total_price'], 2 * sum(range(500)))
+
+    def test_get_num_of_items(self):
+        self.assertEqual(
+            self.get('get_num_of_items', self.small, 1)['num_of_items'], 1
+        )
+        self.assertEqual(
+            self.get('get_num_of_items', self.large, 1)['num_of_items'], 1000
+        )
+
+    def test_remove_cart_item(self):
+        product = self.large.items.first().product
+        url = reverse('remove_cart_item')
+        # Savepoint, cart, delete, summary update, release, cart, items.
+        with self.assertNumQueries(7):
+            response = self.client.get(url, {
+                'cart_code': str(self.large.cart_code),
+                'product_id': product.id,
+            })
+        self.assertEqual(len(response.data['items']), 499)
+
+
+class CartSummaryCounterTests(CartTestCase):
+    """
+    Tests the denormalized cart item count and total price.
+    """
+
+    def cart(self):
+        return Cart.objects.get(cart_code=self.cart_code)
+
+    def test_mutations_keep_counters_in_sync(self):
+        self.add(self.shirt, 2)
+        self.add(self.hat)
+        cart = self.cart()
+        self.assertEqual((cart.item_count, cart.total_price), (3, 3700))
+
+        self.client.get(reverse('remove_cart_item'), {
+            'cart_code': self.cart_code, 'product_id': self.shirt.id
+        })
+        cart = self.cart()
+        self.assertEqual((cart.item_count, cart.total_price), (1, 700))
+
+        self.client.post(reverse('batch_update_cart'), {
+            'cart_code': self.cart_code,
+            'operations': [{'op': 'set', 'product_id': self.hat.id,
+                            'quantity': 2}],
+        }, content_type='application/json')
+        cart = self.cart()
+        self.assertEqual((cart.item_count, cart.total_price), (2, 1400))
+
+    def test_badge_is_a_single_query(self):
+        self.add(self.shirt, 2)
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse('get_num_of_items'), {'cart_code': self.cart_code}
+            )
+        self.assertEqual(response.data['num_of_items'], 2)
+
+    def test_price_change_updates_totals(self):
+        self.add(self.shirt, 2)
+        self.shirt.price = 2000
+        self.shirt.save()
+        self.assertEqual(self.cart().total_price, 4000)
+
+    def test_deleting_a_product_updates_totals(self):
+        self.add(self.shirt, 2)
+        self.add(self.hat, 2)
+        self.shirt.delete()
+        cart = self.cart()
+        self.assertEqual((cart.item_count, cart.total_price), (2, 1400))
+
+    def test_repair_command(self):
+        self.add(self.shirt, 2)
+        Cart.objects.update(item_count=0, total_price=0)
+        out = StringIO()
+        call_command('repair_cart_summaries', '--dry-run', stdout=out)
+        self.assertIn('1 carts', out.getvalue())
+        call_command('repair_cart_summaries', stdout=StringIO())
+        cart = self.cart()
+        self.assertEqual((cart.item_count, cart.total_price), (2, 3000))
+
+
+class CatalogSnapshotCartTests(CartTestCase):
+    """
+    Tests rendering cart products from the catalog snapshot.
+    """
+
+    def test_snapshot_matches_product_serializer(self):
+        self.add(self.shirt)
+        with self.settings(CATALOG_SNAPSHOT_ENABLED=False):
+            expected = self.client.get(
+                reverse('get_cart'), {'cart_code': self.cart_code}
+            ).json()
+        catalog.get_snapshot()
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                reverse('get_cart'), {'cart_code': self.cart_code}
+            )
+        self.assertEqual(response.json(), expected)
+
+    def test_snapshot_follows_product_changes(self):
+        self.add(self.shirt)
+        catalog.get_snapshot()
+        builds = catalog.get_stats()['builds']
+        self.shirt.product_name = 'Linen shirt'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shirt.save()
+        response = self.client.get(
+            reverse('get_cart'), {'cart_code': self.cart_code}
+        )
+        self.assertEqual(
+            response.data['items'][0]['product']['product_name'],
+            'Linen shirt'
+        )
+        # The changed product is patched in; nothing is rebuilt.
+        self.assertEqual(catalog.get_stats()['builds'], builds)
+        self.assertEqual(
+            catalog.get_snapshot().products_by_slug['shirt'].product_name,
+            'Linen shirt'
+        )
+
+    def test_uncommitted_changes_are_not_applied(self):
+        snapshot = catalog.get_snapshot()
+        with self.captureOnCommitCallbacks():
+            self.shirt.product_name = 'Linen shirt'
+            self.shirt.save()
+        self.assertEqual(
+            catalog.get_snapshot().products[self.shirt.id].product_name,
+            'Shirt'
+        )
+        self.assertIs(catalog.get_snapshot(), snapshot)
+
+    def test_over_budget_falls_back_to_orm(self):
+        self.add(self.shirt)
+        with self.settings(CATALOG_SNAPSHOT_MAX_BYTES=10):
+            catalog.reset()
+            response = self.client.get(
+                reverse('get_cart'), {'cart_code': self.cart_code}
+            )
+            stats = self.client.get(reverse('catalog_stats')).data
+        self.assertTrue(stats['over_budget'])
+        self.assertEqual(
+            response.data['items'][0]['product']['product_name'], 'Shirt'
+        )
+
+    def test_over_budget_is_not_rebuilt_on_every_change(self):
+        with self.settings(CATALOG_SNAPSHOT_MAX_BYTES=10):
+            catalog.reset()
+            self.assertIsNone(catalog.get_snapshot())
+            builds = catalog.get_stats()['builds']
+            with self.captureOnCommitCallbacks(execute=True):
+                self.shirt.save()
+            self.assertIsNone(catalog.get_snapshot())
+            self.assertEqual(catalog.get_stats()['builds'], builds)
+
+            catalog.recheck()
+            with self.settings(CATALOG_SNAPSHOT_RETRY_SECONDS=0):
+                self.assertIsNone(catalog.get_snapshot())
+            self.assertEqual(catalog.get_stats()['builds'], builds + 1)
+
+
+class CheckoutTests(CartTestCase):
+    """
+    Tests order placement and stock reservation.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.cart = Cart.objects.create()
+        CartItem.objects.create(cart=self.cart, product=self.hat, quantity=2)
+        CartItem.objects.create(cart=self.cart, product=self.shirt,
+                                quantity=1)
+
+    def stock(self, product):
+        return Product.objects.values_list('stock', flat=True).get(
+            pk=product.pk
+        )
+
+    def test_checkout_reserves_stock(self):
+        response = self.client.post(
+            reverse('checkout_cart'), {'cart_code': self.cart.cart_code}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['status'], Order.PENDING)
+        self.assertEqual(response.data['total_price'], 2900)
+        self.assertEqual(len(response.data['items']), 2)
+        self.assertEqual(self.stock(self.hat), 0)
+        self.assertEqual(self.stock(self.shirt), 4)
+
+        response = self.client.post(
+            reverse('checkout_cart'), {'cart_code': self.cart.cart_code}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_short_stock_reserves_nothing(self):
+        other = Cart.objects.create()
+        CartItem.objects.create(cart=other, product=self.hat, quantity=1)
+        checkout(other)
+        with self.assertRaises(OutOfStock) as raised:
+            checkout(self.cart)
+        self.assertEqual(raised.exception.product_id, self.hat.id)
+        self.assertEqual(self.stock(self.shirt), 5)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_stock_changes_touch_date_modified(self):
+        before = Product.objects.get(pk=self.hat.pk).date_modified
+        order = checkout(self.cart)
+        reserved = Product.objects.get(pk=self.hat.pk).date_modified
+        self.assertGreater(reserved, before)
+        order.expires_at = timezone.now() - timedelta(minutes=1)
+        order.save()
+        expire_reservations()
+        self.assertGreater(
+            Product.objects.get(pk=self.hat.pk).date_modified, reserved
+        )
+
+    def test_checkout_patches_the_snapshot(self):
+        catalog.get_snapshot()
+        builds = catalog.get_stats()['builds']
+        with self.captureOnCommitCallbacks(execute=True):
+            checkout(self.cart)
+        with self.assertNumQueries(1):
+            # Only the two ordered products are reloaded.
+            self.assertEqual(catalog.get_product(self.hat.id).stock, 0)
+        self.assertEqual(catalog.get_stats()['builds'], builds)
+
+    def test_pay_order(self):
+        order = checkout(self.cart)
+        response = self.client.post(
+            reverse('pay_order', args=[order.order_code])
+        )
+        self.assertEqual(response.data['status'], Order.PAID)
+        self.assertTrue(Cart.objects.get(pk=self.cart.pk).paid)
+        self.assertEqual(expire_reservations(
+            now=timezone.now() + timedelta(days=1)
+        ), 0)
+
+    def test_expired_reservations_are_restocked(self):
+        order = checkout(self.cart)
+        Order.objects.filter(pk=order.pk).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        out = StringIO()
+        call_command('expire_reservations', stdout=out)
+        self.assertIn('Expired 1 orders', out.getvalue())
+        self.assertEqual(Order.objects.get().status, Order.EXPIRED)
+        self.assertEqual(self.stock(self.hat), 2)
+        self.assertEqual(self.stock(self.shirt), 5)
+        response = self.client.post(
+            reverse('pay_order', args=[order.order_code])
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_stock_change_reaches_the_snapshot(self):
+        catalog.get_snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            checkout(self.cart)
+        self.assertEqual(catalog.get_product(self.hat.id).stock, 0)
+
+
+class PurgeCartsTests(CartTestCase):
+    """
+    Tests the abandoned cart purge.
+    """
+
+    def setUp(self):
+        super().setUp()
+        old = timezone.now() - timedelta(days=60)
+        self.abandoned = [Cart.objects.create() for _ in range(5)]
+        self.paid = Cart.objects.create(paid=True)
+        self.recent = Cart.objects.create()
+        self.pending = Cart.objects.create()
+        for cart in self.abandoned + [self.paid, self.recent, self.pending]:
+            CartItem.objects.create(cart=cart, product=self.shirt)
+        checkout(self.pending)
+        Cart.objects.exclude(pk=self.recent.pk).update(created=old)
+
+    def test_dry_run_deletes_nothing(self):
+        out = StringIO()
+        call_command('purge_carts', '--dry-run', stdout=out)
+        self.assertIn('5 carts with 5 items would be deleted',
+                      out.getvalue())
+        self.assertEqual(Cart.objects.count(), 8)
+
+    def test_purges_abandoned_carts_in_batches(self):
+        out = StringIO()
+        call_command('purge_carts', '--batch-size', '2', stdout=out)
+        self.assertIn('Deleted 5 carts with 5 items', out.getvalue())
+        self.assertIn('Up to cart id', out.getvalue())
+        self.assertCountEqual(
+            Cart.objects.values_list('pk', flat=True),
+            [self.paid.pk, self.recent.pk, self.pending.pk]
+        )
+        self.assertEqual(CartItem.objects.count(), 3)
+
+
+class AsyncCartViewTests(CartTestCase):
+    """
+    Checks that the async cart views behave like the sync views.
+    """
+
+    async def test_add_and_read_cart(self):
+        response = await self.async_client.post(
+            '/async/cart/add_to_cart/',
+            {'product_id': self.shirt.id, 'cart_code': self.cart_code,
+             'quantity': 2},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['cart']['total_price'], 3000)
+
+        for name in ('get_cart', 'get_num_of_items'):
+            url = f'/cart/{name}/?cart_code={self.cart_code}'
+            expected = await sync_to_async(self.client.get)(url)
+            response = await self.async_client.get(f'/async{url}')
+            self.assertEqual(response.json(), expected.json())
+
+    async def test_stock_error(self):
+        response = await self.async_client.post(
+            '/async/cart/add_to_cart/',
+            {'product_id': self.hat.id, 'cart_code': self.cart_code,
+             'quantity': 3},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('in stock', response.json()['error'])
+
+    def test_read_cart_joins_products(self):
+        cart = Cart.objects.create(cart_code=self.cart_code)
+        CartItem.objects.create(cart=cart, product=self.shirt)
+        CartItem.objects.create(cart=cart, product=self.hat)
+        with self.settings(CATALOG_SNAPSHOT_ENABLED=False):
+            with self.assertNumQueries(2):
+                response = async_to_sync(self.async_client.get)(
+                    f'/async/cart/get_cart/?cart_code={self.cart_code}'
+                )
+        self.assertEqual(len(response.json()['items']), 2)
+
+
+class CompiledCartSerializerTests(CartTestCase):
+    """
+    Tests that `cart_rows` renders exactly like `CartSerializer`.
+    """
+
+    def test_output_is_byte_identical(self):
+        self.hat.image = 'photos/products/hat.jpg'
+        self.hat.save()
+        full = Cart.objects.create()
+        CartItem.objects.create(cart=full, product=self.shirt, quantity=2)
+        CartItem.objects.create(cart=full, product=self.hat)
+        full.refresh_summary()
+        Cart.objects.create()
+        request = RequestFactory().get('/cart/get_cart/')
+        renderer = JSONRenderer()
+
+        carts = Cart.objects.order_by('id')
+        for context in ({}, {'request': request}):
+            expected = CartSerializer(
+                carts.prefetch_related('items'), many=True, context=context
+            ).data
+            with self.assertNumQueries(2):
+                rows = cart_values(carts)
+            self.assertEqual(
+                renderer.render(cart_rows.many(rows, context)),
+                renderer.render(expected),
+            )
+
+    def test_get_cart_fieldset(self):
+        cart = Cart.objects.create()
+        CartItem.objects.create(cart=cart, product=self.shirt, quantity=2)
+        cart.refresh_summary()
+        response = self.client.get(reverse('get_cart'), {
+            'cart_code': str(cart.cart_code),
+            'fields': 'total_price,items', 'expand': '',
+        })
+        self.assertEqual(response.json(), {
+            'total_price': 3000,
+            'items': [{
+                'id': cart.items.get().id, 'quantity': 2, 'cart': cart.id,
+                'product': self.shirt.id, 'item_price': 3000,
+            }],
+        })
+
+        response = self.client.get(reverse('get_cart'), {
+            'cart_code': str(cart.cart_code), 'fields': 'id,secret',
+        })
+        self.assertEqual(response.status_code, 400)
 
-# Create your tests here.
@@ -23,5 +23,14 @@ urlpatterns = [
     path('get_cart/', views.get_cart, name='get_cart'),
 
     # Remove an item from the cart
-    path('remove_cart_item', views.remove_cart_item, name='remove_cart_item')
+    path('remove_cart_item', views.remove_cart_item, name='remove_cart_item'),
+
+    # Apply several add/remove/set-quantity operations at once
+    path('batch/', views.batch_update_cart, name='batch_update_cart'),
+
+    # Place an order and reserve its stock
+    path('checkout/', views.checkout_cart, name='checkout_cart'),
+
+    # Confirm the payment of a pending order
+    path('orders/<uuid:order_code>/pay/', views.pay_order, name='pay_order'),
 ]
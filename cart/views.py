@@ -3,49 +3,100 @@ Cart App Views
 
 This module contains API views that manage the shopping cart functionality,
 including adding items to the cart, checking if an item exists, retrieving
-cart details, counting items, and removing items from the cart.
+cart details, counting items, removing items from the cart, and applying
+batches of changes in one request.
 
-All views are decorated with @api_view for use with Django REST Framework.
+All views are decorated with @api_view for use with Django REST Framework,
+except the `async_*` views: plain Django async views for ASGI deployments,
+served under `/async/` (see `MyShop.async_urls`).
 """
 
+import json
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Prefetch, aprefetch_related_objects
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
-from cart.models import Cart, CartItem
+from cart.checkout import OutOfStock, checkout, confirm_payment
+from cart.models import Cart, CartItem, Order
 from cart.serializers import (
-    CartItemSerializer, SimpleCartSerializer, CartSerializer
+    CartItemSerializer, SimpleCartSerializer, CartSerializer, OrderSerializer,
+    cart_rows, cart_values,
 )
+from MyShop.fieldsets import InvalidFieldset, get_fieldset
 from store.models import Product
 
 
+def add_product_to_cart(cart_code, product_id, quantity=1):
+    """
+    Adds a product to a cart and builds the `add_to_cart` response body.
+
+    Shared by the sync and async add-to-cart views.
+
+    Raises:
+        ValueError: If the quantity is invalid or exceeds the stock.
+        Http404: If the product does not exist.
+    """
+    quantity = int(quantity)
+    if quantity < 1:
+        raise ValueError('Quantity must be at least 1')
+
+    with transaction.atomic():
+        cart, _ = Cart.objects.get_or_create(cart_code=cart_code)
+        product = get_object_or_404(
+            Product.objects.only('id', 'product_name', 'stock'),
+            id=product_id
+        )
+        created = CartItem.objects.add_product(cart, product, quantity)
+        cart.refresh_summary()
+
+    cartitem = CartItem.objects.select_related(
+        'product__category'
+    ).get(cart=cart, product=product)
+    serializer = CartItemSerializer(cartitem)
+    message = 'Cart item created successfully' if created \
+        else 'Cart item updated successfully'
+    return {
+        'data': serializer.data,
+        'cart': {
+            'cart_code': cart.cart_code,
+            'num_of_items': cart.item_count,
+            'total_price': cart.total_price,
+        },
+        'message': message,
+    }
+
+
 @api_view(['POST'])
 def add_to_cart(request):
     """
     Adds a product to the cart. If the cart does not exist, it is created.
 
+    Adding a product that is already in the cart increments its quantity
+    instead of creating a second line. The increment and the stock check
+    run in one transaction.
+
     Request data:
     - product_id: ID of the product to add
     - cart_code: Unique cart identifier (UUID)
+    - quantity: Number of units to add (optional, defaults to 1)
 
     Returns:
-    - CartItem data and success message, or error message
+    - CartItem data, the updated cart summary and a success message,
+      or error message
     """
     try:
-        product_id = request.data.get('product_id')
-        cart_code = request.data.get('cart_code')
-
-        cart, _ = Cart.objects.get_or_create(cart_code=cart_code)
-        product = get_object_or_404(Product, id=product_id)
-
-        cartitem = CartItem(product=product, cart=cart, quantity=1)
-        cartitem.save()
-
-        serializer = CartItemSerializer(cartitem)
-        return Response({
-            'data': serializer.data,
-            'message': 'Cart item created successfully',
-        }, status=200)
+        return Response(add_product_to_cart(
+            request.data.get('cart_code'),
+            request.data.get('product_id'),
+            request.data.get('quantity', 1),
+        ), status=200)
     except Exception as e:
         return Response({'error': str(e)}, status=400)
 
@@ -88,7 +139,10 @@ def get_num_of_items(request):
     """
     try:
         cart_code = request.query_params.get('cart_code')
-        cart = get_object_or_404(Cart, cart_code=cart_code)
+        cart = get_object_or_404(
+            Cart.objects.only('id', 'cart_code', 'item_count'),
+            cart_code=cart_code
+        )
 
         serializer = SimpleCartSerializer(cart)
         return Response(serializer.data)
@@ -103,13 +157,23 @@ def get_cart(request):
 
     Query parameters:
     - cart_code: Unique cart identifier (UUID)
+    - fields, expand (optional): Fieldset, see `MyShop.fieldsets`;
+      `expand=` renders item products as their id
 
     Returns:
     - Serialized cart with nested cart items and total price
     """
+    try:
+        fields, expand = get_fieldset(
+            request, cart_rows.field_names, cart_rows.expandable
+        )
+    except InvalidFieldset as e:
+        return Response({'error': str(e)}, status=400)
     try:
         cart_code = request.query_params.get('cart_code')
-        cart = Cart.objects.get(cart_code=cart_code)
+        if fields is not None or expand is not None:
+            return Response(narrowed_cart_data(cart_code, fields, expand))
+        cart = Cart.objects.with_items().get(cart_code=cart_code)
 
         serializer = CartSerializer(cart)
         return Response(serializer.data)
@@ -117,6 +181,23 @@ def get_cart(request):
         return Response({'message': str(e)})
 
 
+def narrowed_cart_data(cart_code, fields, expand):
+    """
+    Renders a cart with a fieldset from `.values()` rows.
+
+    Only the columns of the requested fields are read, and products and
+    categories are joined in only when expanded.
+
+    Raises:
+        Cart.DoesNotExist: If no cart has the code.
+    """
+    serializer = cart_rows.narrow(fields, expand)
+    rows = cart_values(Cart.objects.filter(cart_code=cart_code), serializer)
+    if not rows:
+        raise Cart.DoesNotExist('Cart matching query does not exist.')
+    return serializer(rows[0])
+
+
 @api_view(['GET'])
 def remove_cart_item(request):
     """
@@ -133,13 +214,223 @@ def remove_cart_item(request):
         cart_code = request.query_params.get('cart_code')
         product_id = request.query_params.get('product_id')
 
-        cart = Cart.objects.get(cart_code=cart_code)
-        product = Product.objects.get(id=product_id)
-
-        cart_item = get_object_or_404(CartItem, cart=cart, product=product)
-        cart_item.delete()
+        with transaction.atomic():
+            cart = Cart.objects.get(cart_code=cart_code)
+            deleted, _ = CartItem.objects.filter(
+                cart=cart, product_id=product_id
+            ).delete()
+            if not deleted:
+                raise Http404('No CartItem matches the given query.')
+            Cart.objects.filter(pk=cart.pk).refresh_summaries()
 
+        cart = Cart.objects.with_items().get(pk=cart.pk)
         serializer = CartSerializer(cart)
         return Response(serializer.data)
     except Exception as e:
         return Response({'message': str(e)})
+
+
+BATCH_OPERATIONS = ('add', 'remove', 'set')
+
+
+def parse_batch_operations(operations):
+    """
+    Validates the operations of a batch cart request.
+
+    Args:
+        operations (list): The raw operations from the request body.
+
+    Returns:
+        list: Operations with integer `product_id` and `quantity`.
+
+    Raises:
+        ValueError: If an operation is malformed.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise ValueError('operations must be a non-empty list')
+    parsed = []
+    for operation in operations:
+        if not isinstance(operation, dict) or \
+                operation.get('op') not in BATCH_OPERATIONS:
+            raise ValueError(
+                f'Each operation needs an op in {", ".join(BATCH_OPERATIONS)}'
+            )
+        op = operation['op']
+        try:
+            product_id = int(operation.get('product_id'))
+            quantity = int(operation.get('quantity', 1 if op == 'add' else 0))
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid operation: {operation}')
+        if quantity < (1 if op == 'add' else 0):
+            raise ValueError(f'Invalid quantity for {op}: {quantity}')
+        parsed.append({
+            'op': op, 'product_id': product_id, 'quantity': quantity,
+        })
+    return parsed
+
+
+@api_view(['POST'])
+def batch_update_cart(request):
+    """
+    Applies several cart changes in one request and one transaction.
+
+    Either every operation is applied or none is.
+
+    Request data:
+    - cart_code: Unique cart identifier (UUID); the cart is created if
+      it does not exist
+    - operations: List of operations, each one of
+        - {"op": "add", "product_id": 1, "quantity": 2}
+        - {"op": "set", "product_id": 1, "quantity": 5} (0 removes the item)
+        - {"op": "remove", "product_id": 1}
+
+    Returns:
+    - Serialized cart with nested cart items and total price, or error
+      message
+    """
+    try:
+        cart_code = request.data.get('cart_code')
+        operations = parse_batch_operations(request.data.get('operations'))
+        product_ids = {operation['product_id'] for operation in operations}
+
+        with transaction.atomic():
+            cart, _ = Cart.objects.select_for_update().get_or_create(
+                cart_code=cart_code
+            )
+            products = Product.objects.only(
+                'id', 'product_name', 'stock'
+            ).in_bulk(product_ids)
+            missing = product_ids - products.keys()
+            if missing:
+                raise ValueError(
+                    f'Unknown product ids: {sorted(missing)}'
+                )
+            CartItem.objects.apply_operations(cart, products, operations)
+            Cart.objects.filter(pk=cart.pk).refresh_summaries()
+
+        cart = Cart.objects.with_items().get(pk=cart.pk)
+        serializer = CartSerializer(cart)
+        return Response(serializer.data)
+    except Exception as e:
+        return Response({'error': str(e)}, status=400)
+
+
+@api_view(['POST'])
+def checkout_cart(request):
+    """
+    Places an order for the cart and reserves its stock.
+
+    The stock stays reserved until the order is paid or the reservation
+    expires (see `cart.checkout`).
+
+    Request data:
+    - cart_code: Unique cart identifier (UUID)
+
+    Returns:
+    - The pending order (201), 409 if a product ran out of stock, or
+      error message
+    """
+    try:
+        cart = get_object_or_404(
+            Cart.objects.only('id'), cart_code=request.data.get('cart_code')
+        )
+        order = checkout(cart)
+        return Response(OrderSerializer(order).data, status=201)
+    except OutOfStock as e:
+        return Response(
+            {'error': str(e), 'product_id': e.product_id}, status=409
+        )
+    except Exception as e:
+        return Response({'error': str(e)}, status=400)
+
+
+@api_view(['POST'])
+def pay_order(request, order_code):
+    """
+    Confirms the payment of a pending order and marks its cart as paid.
+
+    Returns:
+    - The paid order, or error message
+    """
+    try:
+        order = get_object_or_404(Order, order_code=order_code)
+        order = confirm_payment(order)
+        order = Order.objects.prefetch_related('items').get(pk=order.pk)
+        return Response(OrderSerializer(order).data)
+    except Exception as e:
+        return Response({'error': str(e)}, status=400)
+
+
+@csrf_exempt
+@require_POST
+async def async_add_to_cart(request):
+    """
+    Async variant of `add_to_cart`.
+
+    The ORM has no async transactions, so the upsert runs in a worker
+    thread; the event loop stays free while it waits.
+
+    Request data (JSON or form):
+    - product_id, cart_code, quantity: As for `add_to_cart`
+    """
+    try:
+        if request.content_type == 'application/json':
+            data = json.loads(request.body or b'{}')
+        else:
+            data = request.POST
+        body = await sync_to_async(add_product_to_cart)(
+            data.get('cart_code'), data.get('product_id'),
+            data.get('quantity', 1),
+        )
+        return JsonResponse(body)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+@require_GET
+async def async_get_num_of_items(request):
+    """
+    Async variant of `get_num_of_items`.
+    """
+    try:
+        cart = await Cart.objects.only(
+            'id', 'cart_code', 'item_count'
+        ).aget(cart_code=request.GET.get('cart_code'))
+    except Exception as e:
+        return JsonResponse({'message': str(e)})
+    return JsonResponse(SimpleCartSerializer(cart).data)
+
+
+@require_GET
+async def async_get_cart(request):
+    """
+    Async variant of `get_cart`.
+
+    The cart and its items, with their products and categories joined in,
+    are read with the async ORM in two queries. Serialization reads the
+    catalog snapshot, which may need the database to refresh, so it runs
+    in a worker thread.
+    """
+    try:
+        fields, expand = get_fieldset(
+            request, cart_rows.field_names, cart_rows.expandable
+        )
+    except InvalidFieldset as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    try:
+        if fields is not None or expand is not None:
+            data = await sync_to_async(narrowed_cart_data)(
+                request.GET.get('cart_code'), fields, expand
+            )
+            return JsonResponse(data)
+        cart = await Cart.objects.aget(
+            cart_code=request.GET.get('cart_code')
+        )
+        await aprefetch_related_objects([cart], Prefetch(
+            'items',
+            queryset=CartItem.objects.select_related('product__category'),
+        ))
+        data = await sync_to_async(lambda: CartSerializer(cart).data)()
+    except Exception as e:
+        return JsonResponse({'message': str(e)})
+    return JsonResponse(data)
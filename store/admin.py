@@ -7,6 +7,7 @@ including handling JSON fields as comma-separated values.
 """
 from django.contrib import admin
 from .models import Product
+from .utils import split_comma_separated
 from django import forms
 
 
@@ -57,8 +58,9 @@ class ProductAdminForm(forms.ModelForm):
         Returns:
             list: A list of cleaned color values.
         """
-        colors = self.cleaned_data.get("available_colors", "")
-        return [color.strip() for color in colors.split(",") if color.strip()]
+        return split_comma_separated(
+            self.cleaned_data.get("available_colors", "")
+        )
 
     def clean_available_sizes(self):
         """
@@ -68,8 +70,9 @@ class ProductAdminForm(forms.ModelForm):
         Returns:
             list: A list of cleaned size values.
         """
-        sizes = self.cleaned_data.get("available_sizes", "")
-        return [size.strip() for size in sizes.split(",") if size.strip()]
+        return split_comma_separated(
+            self.cleaned_data.get("available_sizes", "")
+        )
 
 
 class ProductAdmin(admin.ModelAdmin):
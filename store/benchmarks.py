@@ -0,0 +1,239 @@
+"""
+Endpoint Benchmarks
+
+This module defines the scripted request scenarios run by the `benchmark`
+command against a seeded database, and compares their results with a
+stored baseline.
+
+Every scenario issues the same sequence of requests on every run: the data
+is seeded deterministically and the requests cycle through it by index.
+By default the catalog response cache stores nothing while a
+request is timed, so repeated URLs are computed every time rather than
+measured as cache hits. Results hold latency percentiles, requests per
+second and database queries per request. Latency depends on the machine,
+so baselines should be recorded on the machine that checks against them;
+query counts do not.
+"""
+import json
+import statistics
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from cart.checkout import checkout
+from cart.models import Cart, CartItem
+from Category.models import Category
+from .models import Product
+from .seeding import WORDS
+
+
+class Scenario:
+    """
+    A named request repeated with varying arguments.
+
+    Attributes:
+        name (str): Unique name, `<app>:<endpoint>`.
+        request (callable): `request(client, index, data)` issues one
+            request and returns the response.
+        prepare (callable, optional): `prepare(index, data)` runs untimed
+            before each request and returns extra keyword data for it.
+    """
+
+    def __init__(self, name, request, prepare=None):
+        self.name = name
+        self.request = request
+        self.prepare = prepare
+
+
+def benchmark_data(cart_codes):
+    """
+    Collects the seeded rows the scenarios cycle through.
+
+    Args:
+        cart_codes (list): Codes of the seeded carts.
+
+    Returns:
+        dict: Categories, products, cart codes and search words.
+    """
+    products = list(
+        Product.objects.available().filter(stock__gte=100)
+        .order_by('id').values('id', 'slug', 'category__slug')[:500]
+    )
+    return {
+        'categories': list(
+            Category.objects.order_by('id').values_list('slug', flat=True)
+        ),
+        'products': products,
+        'cart_codes': [str(code) for code in cart_codes],
+        'words': WORDS,
+    }
+
+
+def _pick(items, index):
+    return items[index % len(items)]
+
+
+def _new_cart(index, data):
+    cart = Cart.objects.create()
+    product = _pick(data['products'], index)
+    CartItem.objects.create(cart=cart, product_id=product['id'])
+    cart.refresh_summary()
+    return cart, product
+
+
+def _prepare_remove(index, data):
+    cart, product = _new_cart(index, data)
+    return {'cart_code': str(cart.cart_code), 'product_id': product['id']}
+
+
+def _prepare_checkout(index, data):
+    cart, _ = _new_cart(index, data)
+    return {'cart_code': str(cart.cart_code)}
+
+
+def _prepare_pay(index, data):
+    cart, _ = _new_cart(index, data)
+    return {'order_code': checkout(cart).order_code}
+
+
+def _post_json(client, url, payload):
+    return client.post(
+        url, json.dumps(payload), content_type='application/json'
+    )
+
+
+SCENARIOS = [
+    Scenario('store:list', lambda client, i, data: client.get(
+        f'/store/?page={1 + i % 20}')),
+    Scenario('store:list_cursor', lambda client, i, data: client.get(
+        '/store/?pagination=cursor')),
+    Scenario('store:category', lambda client, i, data: client.get(
+        f'/store/{_pick(data["categories"], i)}/')),
+    Scenario('store:details', lambda client, i, data: client.get(
+        '/store/{category__slug}/{slug}/'.format(
+            **_pick(data['products'], i)))),
+    Scenario('store:search', lambda client, i, data: client.get(
+        f'/store/search/?query={_pick(data["words"], i)}')),
+    Scenario('categories:list', lambda client, i, data: client.get(
+        '/categories/')),
+    Scenario('cart:add_to_cart', lambda client, i, data: _post_json(
+        client, '/cart/add_to_cart/', {
+            'cart_code': _pick(data['cart_codes'], i),
+            'product_id': _pick(data['products'], i // 7)['id'],
+        })),
+    Scenario('cart:item_in_cart', lambda client, i, data: client.get(
+        '/cart/item_in_cart/', {
+            'cart_code': _pick(data['cart_codes'], i),
+            'productId': _pick(data['products'], i)['id'],
+        })),
+    Scenario('cart:get_num_of_items', lambda client, i, data: client.get(
+        '/cart/get_num_of_items/',
+        {'cart_code': _pick(data['cart_codes'], i)})),
+    Scenario('cart:get_cart', lambda client, i, data: client.get(
+        '/cart/get_cart/', {'cart_code': _pick(data['cart_codes'], i)})),
+    Scenario('cart:remove_cart_item', lambda client, i, data: client.get(
+        '/cart/remove_cart_item', {
+            'cart_code': data['cart_code'], 'product_id': data['product_id'],
+        }), prepare=_prepare_remove),
+    Scenario('cart:batch', lambda client, i, data: _post_json(
+        client, '/cart/batch/', {
+            'cart_code': _pick(data['cart_codes'], i),
+            'operations': [
+                {'op': 'set', 'product_id': _pick(data['products'], i)['id'],
+                 'quantity': 1},
+                {'op': 'add',
+                 'product_id': _pick(data['products'], i + 1)['id'],
+                 'quantity': 1},
+            ],
+        })),
+    Scenario('cart:checkout', lambda client, i, data: client.post(
+        '/cart/checkout/', {'cart_code': data['cart_code']}),
+        prepare=_prepare_checkout),
+    Scenario('cart:pay_order', lambda client, i, data: client.post(
+        f'/cart/orders/{data["order_code"]}/pay/'), prepare=_prepare_pay),
+]
+
+
+def run_scenario(scenario, client, data, requests, warmup=0,
+                 cache_responses=False):
+    """
+    Runs a scenario and measures it.
+
+    Args:
+        scenario (Scenario): The scenario.
+        client (Client): The test client issuing the requests.
+        data (dict): Seeded rows, from `benchmark_data`.
+        requests (int): Measured requests.
+        warmup (int): Unmeasured requests issued first.
+        cache_responses (bool): Let the catalog response cache answer
+            repeated requests.
+
+    Returns:
+        dict: `p50`, `p95`, `p99` (ms), `rps`, `queries` (mean per
+        request) and `errors` (responses with a status of 400 or more).
+    """
+    latencies, queries, errors = [], 0, 0
+    busy = 0.0
+    for index in range(warmup + requests):
+        extra = scenario.prepare(index, data) if scenario.prepare else {}
+        timeout = settings.CATALOG_CACHE_TIMEOUT if cache_responses else 0
+        with override_settings(CATALOG_CACHE_TIMEOUT=timeout), \
+                CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = scenario.request(client, index, {**data, **extra})
+            elapsed = time.perf_counter() - started
+        if index < warmup:
+            continue
+        busy += elapsed
+        latencies.append(elapsed * 1000)
+        queries += len(captured)
+        errors += response.status_code >= 400
+    quantiles = statistics.quantiles(latencies, n=100, method='inclusive')
+    return {
+        'p50': round(quantiles[49], 3),
+        'p95': round(quantiles[94], 3),
+        'p99': round(quantiles[98], 3),
+        'rps': round(requests / busy, 1),
+        'queries': round(queries / requests, 2),
+        'errors': errors,
+    }
+
+
+def find_regressions(results, baseline, threshold, min_delta_ms=1.0):
+    """
+    Compares results with a baseline.
+
+    A scenario regresses if its p95 latency grew by more than `threshold`
+    (a fraction) and `min_delta_ms`, or if it runs more than half a query
+    per request more than before. Scenarios missing from the baseline are
+    ignored.
+
+    Args:
+        results (dict): Scenario name -> results of this run.
+        baseline (dict): Scenario name -> baseline results.
+        threshold (float): Tolerated relative latency increase.
+        min_delta_ms (float): Latency increases below this are noise.
+
+    Returns:
+        list: Human-readable regression descriptions.
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        delta = result['p95'] - base['p95']
+        if delta > base['p95'] * threshold and delta > min_delta_ms:
+            regressions.append(
+                f'{name}: p95 {base["p95"]:.1f} -> {result["p95"]:.1f} ms'
+            )
+        if result['queries'] > base['queries'] + 0.5:
+            regressions.append(
+                f'{name}: {base["queries"]} -> {result["queries"]} '
+                'queries per request'
+            )
+    return regressions
+
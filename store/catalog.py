@@ -0,0 +1,400 @@
+"""
+Catalog Snapshot
+
+This module keeps a process-local, read-only copy of the product catalog
+so hot read paths (cart serialization in particular) can render product
+and category data without querying the database or instantiating models.
+
+Records are compact named tuples indexed by id and slug. Every process
+follows the catalog generation counter of `MyShop.cache`, checked at most
+every `CATALOG_SNAPSHOT_RECHECK_SECONDS` and right after this process
+commits a write. When the generation moved, the ids recorded with each
+bump (see `MyShop.cache.get_changes`) are reloaded and patched into the
+snapshot in place, so a stock change costs one small query rather than a
+reload of the catalog. The snapshot is rebuilt when a change is unknown,
+such as a bump recorded without ids or one that already expired.
+Records are always read from the primary database: a lagging replica
+would leave the snapshot stale until the next change.
+
+If the estimated size of the catalog exceeds
+`settings.CATALOG_SNAPSHOT_MAX_BYTES`, the snapshot is disabled and
+callers fall back to the ORM. A disabled snapshot is rebuilt at most every
+`CATALOG_SNAPSHOT_RETRY_SECONDS`, since each attempt scans the catalog up
+to the budget.
+"""
+import sys
+import threading
+import time
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import DEFAULT_DB_ALIAS
+
+from Category.models import Category
+from MyShop.cache import get_changes, get_generation
+from MyShop.images import variant_urls
+from .models import Product
+
+
+class CategoryRecord(NamedTuple):
+    """
+    Immutable copy of the `Category` fields emitted by the API.
+    """
+    id: int
+    category_name: str
+    slug: str
+
+    @classmethod
+    def from_instance(cls, category):
+        return cls(category.id, category.category_name, category.slug)
+
+
+class ProductRecord(NamedTuple):
+    """
+    Immutable copy of the `Product` fields emitted by `ProductSerializer`.
+    """
+    id: int
+    product_name: str
+    description: str
+    price: int
+    slug: str
+    image: str
+    stock: int
+    is_available: bool
+    category_id: int
+
+    @classmethod
+    def from_instance(cls, product):
+        return cls(
+            product.id, product.product_name, product.description,
+            product.price, product.slug, product.image.name or '',
+            product.stock, product.is_available, product.category_id,
+        )
+
+    @classmethod
+    def from_row(cls, row):
+        """
+        Builds a record from a `values_list(*ProductRecord._fields)` row.
+        """
+        return cls(*row[:5], row[5] or '', *row[6:])
+
+
+def _record_size(record):
+    # Tuple plus its values plus two dict slots (by id and by slug).
+    return sys.getsizeof(record) + sum(map(sys.getsizeof, record)) + 200
+
+
+class CatalogSnapshot:
+    """
+    A view of every product and category.
+
+    Snapshots are only changed by `apply`, with the module lock held;
+    readers look records up without the lock.
+
+    Attributes:
+        products (dict): Product id -> `ProductRecord`.
+        products_by_slug (dict): Product slug -> `ProductRecord`.
+        categories (dict): Category id -> `CategoryRecord`.
+        categories_by_slug (dict): Category slug -> `CategoryRecord`.
+        generation (int): Catalog generation the snapshot reflects.
+        size (int): Estimated memory footprint in bytes.
+        over_budget (bool): True if the catalog did not fit the budget; the
+            snapshot is then empty and unused.
+    """
+    __slots__ = (
+        'products', 'products_by_slug', 'categories', 'categories_by_slug',
+        'generation', 'size', 'over_budget', 'built_at',
+    )
+
+    def __init__(self, products, categories, generation, size,
+                 over_budget=False):
+        self.products = products
+        self.products_by_slug = {r.slug: r for r in products.values()}
+        self.categories = categories
+        self.categories_by_slug = {r.slug: r for r in categories.values()}
+        self.generation = generation
+        self.size = size
+        self.over_budget = over_budget
+        self.built_at = time.time()
+
+    @classmethod
+    def build(cls, generation):
+        """
+        Loads every product and category with two `values_list` queries
+        on the primary.
+
+        Args:
+            generation (int): The catalog generation being loaded.
+
+        Returns:
+            CatalogSnapshot: The new snapshot.
+        """
+        budget = settings.CATALOG_SNAPSHOT_MAX_BYTES
+        categories = {
+            row[0]: CategoryRecord(*row)
+            for row in Category.objects.using(DEFAULT_DB_ALIAS)
+            .values_list(*CategoryRecord._fields)
+        }
+        size = sum(map(_record_size, categories.values()))
+        products = {}
+        rows = Product.objects.using(DEFAULT_DB_ALIAS).order_by() \
+            .values_list(*ProductRecord._fields)
+        for row in rows.iterator(chunk_size=2000):
+            record = ProductRecord.from_row(row)
+            products[record.id] = record
+            size += _record_size(record)
+            if size > budget:
+                return cls({}, {}, generation, size, over_budget=True)
+        return cls(products, categories, generation, size)
+
+    def apply(self, products=None, categories=None, generation=None):
+        """
+        Adds, replaces or removes records in place.
+
+        Args:
+            products (dict, optional): Product id -> record, or None to
+                remove the product.
+            categories (dict, optional): Category id -> record, or None to
+                remove the category.
+            generation (int, optional): Generation the snapshot reflects
+                afterwards.
+        """
+        for by_id, by_slug, changes in (
+            (self.products, self.products_by_slug, products),
+            (self.categories, self.categories_by_slug, categories),
+        ):
+            for pk, record in (changes or {}).items():
+                old = by_id.pop(pk, None)
+                if old is not None:
+                    self.size -= _record_size(old)
+                    if by_slug.get(old.slug) is old:
+                        del by_slug[old.slug]
+                if record is not None:
+                    by_id[pk] = by_slug[record.slug] = record
+                    self.size += _record_size(record)
+        if generation is not None:
+            self.generation = generation
+        self.over_budget = self.size > settings.CATALOG_SNAPSHOT_MAX_BYTES
+
+
+_snapshot = None
+_checked_at = 0.0
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'builds': 0, 'updates': 0}
+
+
+def get_snapshot():
+    """
+    Returns the current catalog snapshot, building it on first use.
+
+    Returns:
+        CatalogSnapshot or None: None when the snapshot is disabled or the
+        catalog exceeds the memory budget.
+    """
+    global _snapshot, _checked_at
+    if not settings.CATALOG_SNAPSHOT_ENABLED:
+        return None
+    snapshot = _snapshot
+    now = time.monotonic()
+    if snapshot is None or \
+            now - _checked_at > settings.CATALOG_SNAPSHOT_RECHECK_SECONDS:
+        with _lock:
+            generation = get_generation()
+            if _snapshot is None or (
+                _snapshot.generation != generation and
+                (_retry_due(_snapshot) if _snapshot.over_budget
+                 else not _catch_up(_snapshot, generation))
+            ):
+                _snapshot = CatalogSnapshot.build(generation)
+                _stats['builds'] += 1
+            _checked_at = now
+            snapshot = _snapshot
+    return None if snapshot.over_budget else snapshot
+
+
+def _retry_due(snapshot):
+    """
+    Tells whether a snapshot disabled by the budget may be rebuilt.
+    """
+    return time.time() - snapshot.built_at >= \
+        settings.CATALOG_SNAPSHOT_RETRY_SECONDS
+
+
+def _catch_up(snapshot, generation):
+    """
+    Patches the records changed since the snapshot's generation.
+
+    Returns:
+        bool: False if the changes are unknown and a rebuild is needed.
+    """
+    changes = get_changes(snapshot.generation, generation)
+    if changes is None:
+        return False
+    product_ids, category_ids = set(), set()
+    for change in changes:
+        product_ids.update(change.get('products', ()))
+        category_ids.update(change.get('categories', ()))
+    snapshot.apply(
+        load_records(product_ids), load_category_records(category_ids),
+        generation,
+    )
+    _stats['updates'] += 1
+    return True
+
+
+def recheck():
+    """
+    Makes the next `get_snapshot` compare the catalog generation instead
+    of waiting for `CATALOG_SNAPSHOT_RECHECK_SECONDS`.
+
+    The signals call it once a write of this process commits, so the
+    process reads its own writes.
+    """
+    global _checked_at
+    _checked_at = 0.0
+
+
+def load_records(product_ids, chunk_size=500):
+    """
+    Reads the current records of some products from the primary.
+
+    Args:
+        product_ids (iterable): Ids of the products to read.
+        chunk_size (int): Ids per query.
+
+    Returns:
+        dict: Product id -> `ProductRecord`, or None for deleted products.
+    """
+    product_ids = list(product_ids)
+    records = dict.fromkeys(product_ids)
+    for start in range(0, len(product_ids), chunk_size):
+        rows = Product.objects.using(DEFAULT_DB_ALIAS).filter(
+            id__in=product_ids[start:start + chunk_size]
+        ).order_by().values_list(*ProductRecord._fields)
+        for row in rows:
+            records[row[0]] = ProductRecord.from_row(row)
+    return records
+
+
+def load_category_records(category_ids):
+    """
+    Reads the current records of some categories from the primary.
+
+    Returns:
+        dict: Category id -> `CategoryRecord`, or None for deleted
+        categories.
+    """
+    records = dict.fromkeys(category_ids)
+    if records:
+        rows = Category.objects.using(DEFAULT_DB_ALIAS).filter(
+            id__in=records
+        ).values_list(*CategoryRecord._fields)
+        for row in rows:
+            records[row[0]] = CategoryRecord(*row)
+    return records
+
+
+def reset():
+    """
+    Drops the snapshot of this process; the next access rebuilds it.
+    """
+    global _snapshot
+    with _lock:
+        _snapshot = None
+
+
+def get_product(product_id):
+    """
+    Looks a product up in the snapshot.
+
+    Returns:
+        ProductRecord or None: None if unknown or the snapshot is disabled.
+    """
+    snapshot = get_snapshot()
+    record = snapshot.products.get(product_id) if snapshot else None
+    _stats['hits' if record else 'misses'] += 1
+    return record
+
+
+def get_category(category_id):
+    """
+    Looks a category up in the snapshot.
+
+    Returns:
+        CategoryRecord or None: None if unknown or the snapshot is disabled.
+    """
+    snapshot = get_snapshot()
+    record = snapshot.categories.get(category_id) if snapshot else None
+    _stats['hits' if record else 'misses'] += 1
+    return record
+
+
+def category_data(record):
+    """
+    Renders a category record exactly like `CategorySerializer`.
+    """
+    return {
+        'id': record.id,
+        'category_name': record.category_name,
+        'slug': record.slug,
+    }
+
+
+def product_data(record, request=None):
+    """
+    Renders a product record exactly like `ProductSerializer`.
+
+    Args:
+        record (ProductRecord): The product.
+        request (HttpRequest, optional): Used to build absolute image URLs,
+            as DRF does when the request is in the serializer context.
+
+    Returns:
+        dict or None: None if the product's category is unknown.
+    """
+    category = get_category(record.category_id)
+    if category is None:
+        return None
+    image = None
+    if record.image:
+        image = default_storage.url(record.image)
+        if request is not None:
+            image = request.build_absolute_uri(image)
+    return {
+        'id': record.id,
+        'product_name': record.product_name,
+        'description': record.description,
+        'price': record.price,
+        'slug': record.slug,
+        'image': image,
+        'image_variants': variant_urls(record.image, request),
+        'stock': record.stock,
+        'category': category_data(category),
+    }
+
+
+def get_stats():
+    """
+    Describes the snapshot of this process.
+
+    Returns:
+        dict: Sizes, budget, build time and lookup counters.
+    """
+    snapshot = _snapshot
+    stats = dict(_stats)
+    stats.update({
+        'enabled': settings.CATALOG_SNAPSHOT_ENABLED,
+        'budget_bytes': settings.CATALOG_SNAPSHOT_MAX_BYTES,
+        'built': snapshot is not None,
+    })
+    if snapshot is not None:
+        stats.update({
+            'over_budget': snapshot.over_budget,
+            'products': len(snapshot.products),
+            'categories': len(snapshot.categories),
+            'size_bytes': snapshot.size,
+            'generation': snapshot.generation,
+            'built_at': snapshot.built_at,
+        })
+    return stats
@@ -0,0 +1,89 @@
+"""
+Benchmarks deep-page latency of page-number vs cursor pagination.
+
+The catalog is seeded into a throwaway test database, then the same deep
+page of `/store/` is requested with `?page=N`, `?page=N&count=false` and
+the equivalent `?cursor=...`.
+
+Example:
+    python manage.py bench_pagination --products 1000000 --depth 0.9
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from store.models import Product
+from store.pagination import PAGE_SIZE, ProductCursorPagination
+from store.seeding import benchmark_database, seed_catalog
+
+
+class Command(BaseCommand):
+    help = 'Compares deep-page latency of page-number and cursor pagination.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1_000_000)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument(
+            '--depth', type=float, default=0.9,
+            help='Position of the benchmarked page as a fraction of the '
+                 'catalog (0 is the first page).'
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            started = time.perf_counter()
+            seed_catalog(options['categories'], options['products'])
+            self.stdout.write(
+                f"Seeded {options['products']} products in "
+                f'{time.perf_counter() - started:.1f}s'
+            )
+            self.run_benchmark(options['depth'], options['repeat'])
+
+    def run_benchmark(self, depth, repeat):
+        listing = Product.objects.available()
+        total = listing.count()
+        page = max(int(total * depth) // PAGE_SIZE, 1)
+        offset = (page - 1) * PAGE_SIZE
+
+        # Key of the last product on the previous page.
+        cursor = ''
+        if offset:
+            last = listing.order_by(
+                *ProductCursorPagination.ordering
+            ).values_list('date_created', 'id')[offset - 1]
+            cursor = ProductCursorPagination.make_cursor(tuple(last))
+
+        url = reverse('product_list')
+        scenarios = [
+            ('page number', f'{url}?page={page}'),
+            ('page number, count=false', f'{url}?page={page}&count=false'),
+            ('cursor', f'{url}?pagination=cursor&cursor={cursor}'),
+        ]
+        client = Client()
+        self.stdout.write(f'Page {page} of {total} available products:')
+        results = {}
+        for name, scenario_url in scenarios:
+            timings = []
+            for _ in range(repeat):
+                # A zero timeout keeps the response cache from answering
+                # the repeats, so every timing includes the queries.
+                with override_settings(CATALOG_CACHE_TIMEOUT=0):
+                    started = time.perf_counter()
+                    response = client.get(scenario_url)
+                    timings.append(time.perf_counter() - started)
+                assert response.status_code == 200, response.content
+                assert response['X-Cache'] == 'MISS'
+            results[name] = response.json()['results']
+            self.stdout.write(
+                f'  {name:<28} median {statistics.median(timings) * 1000:8.2f}'
+                f' ms, best {min(timings) * 1000:8.2f} ms'
+            )
+
+        if results['cursor'] != results['page number']:
+            self.stderr.write(
+                'Cursor and page-number pages differ (date_created ties).'
+            )
@@ -0,0 +1,89 @@
+"""
+Benchmarks the JSON renderer and parser against DRF's defaults.
+
+The catalog is seeded into a throwaway test database and a listing of
+`--products` serialized products is rendered with DRF's `JSONRenderer`
+and the project's `ORJSONRenderer`, then parsed back with `JSONParser`
+and `ORJSONParser`. Serialization itself is not timed. The command fails
+if the two renderers disagree.
+
+Example:
+    python manage.py bench_renderers --products 1000 --repeat 50
+"""
+import io
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from MyShop import renderers
+from MyShop.renderers import ORJSONParser, ORJSONRenderer
+from store.models import Product
+from store.seeding import benchmark_database, seed_catalog
+from store.serializers import ProductSerializer
+
+
+def _median_ms(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+class Command(BaseCommand):
+    help = 'Compares the orjson renderer and parser with the DRF ones.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            raise CommandError(
+                'orjson is not installed; ORJSONRenderer falls back to '
+                'JSONRenderer.'
+            )
+        with benchmark_database():
+            seed_catalog(options['categories'], options['products'])
+            products = Product.objects.select_related('category')
+            data = ProductSerializer(products, many=True).data
+
+        stdlib, fast = JSONRenderer(), ORJSONRenderer()
+        expected = stdlib.render(data)
+        if fast.render(data) != expected:
+            raise CommandError('The renderers produce different output.')
+
+        repeat = options['repeat']
+        size = len(expected) / 1024
+        self.stdout.write(
+            f'{len(data)} products, {size:.0f} KiB of JSON, median of '
+            f'{repeat}:'
+        )
+        timings = [
+            ('render  JSONRenderer', lambda: stdlib.render(data)),
+            ('render  ORJSONRenderer', lambda: fast.render(data)),
+            ('parse   JSONParser',
+             lambda: JSONParser().parse(io.BytesIO(expected))),
+            ('parse   ORJSONParser',
+             lambda: ORJSONParser().parse(io.BytesIO(expected))),
+        ]
+        results = {}
+        for name, function in timings:
+            results[name] = _median_ms(function, repeat)
+            self.stdout.write(
+                f'  {name:<24} {results[name]:8.2f} ms '
+                f'{size / 1024 / results[name] * 1000:8.0f} MiB/s'
+            )
+        render_speedup = results['render  JSONRenderer'] / \
+            results['render  ORJSONRenderer']
+        parse_speedup = results['parse   JSONParser'] / \
+            results['parse   ORJSONParser']
+        self.stdout.write(
+            f'Render speedup {render_speedup:.1f}x, '
+            f'parse speedup {parse_speedup:.1f}x'
+        )
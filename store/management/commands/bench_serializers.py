@@ -0,0 +1,98 @@
+"""
+Benchmarks the compiled row serializers against the DRF ones.
+
+The catalog and a few carts are seeded into a throwaway test database.
+`--products` products are serialized with `ProductSerializer` from model
+instances and with `product_rows` from `.values()` rows, and the carts
+with `CartSerializer` and `cart_rows`. Each is timed alone and together
+with the queries that load it. The command fails if the outputs differ.
+
+Example:
+    python manage.py bench_serializers --products 5000 --repeat 10
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from cart.models import Cart
+from cart.serializers import CartSerializer, cart_rows, cart_values
+from store import catalog
+from store.models import Product
+from store.seeding import benchmark_database, seed_carts, seed_catalog
+from store.serializers import ProductSerializer, product_rows
+
+
+def _median_ms(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+class Command(BaseCommand):
+    help = 'Compares the compiled row serializers with the DRF ones.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--carts', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        with benchmark_database():
+            seed_catalog(options['categories'], options['products'])
+            seed_carts(options['carts'], max_items=20)
+            catalog.reset()
+
+            products = Product.objects.order_by('id')
+            instances = list(products.select_related('category'))
+            rows = list(products.values(*product_rows.values))
+            carts = Cart.objects.order_by('id')
+            cart_instances = list(carts.with_items())
+            cart_row_list = cart_values(carts)
+
+            renderer = JSONRenderer()
+            if renderer.render(product_rows.many(rows)) != renderer.render(
+                    ProductSerializer(instances, many=True).data):
+                raise CommandError('The product outputs differ.')
+            if renderer.render(cart_rows.many(cart_row_list)) != \
+                    renderer.render(
+                        CartSerializer(cart_instances, many=True).data):
+                raise CommandError('The cart outputs differ.')
+
+            scenarios = [
+                ('products  ProductSerializer', len(instances),
+                 lambda: ProductSerializer(instances, many=True).data),
+                ('products  product_rows', len(rows),
+                 lambda: product_rows.many(rows)),
+                ('products  ORM + ProductSerializer', len(instances),
+                 lambda: ProductSerializer(
+                     products.select_related('category'), many=True
+                 ).data),
+                ('products  values + product_rows', len(rows),
+                 lambda: product_rows.many(
+                     products.values(*product_rows.values)
+                 )),
+                ('carts     CartSerializer', len(cart_instances),
+                 lambda: CartSerializer(cart_instances, many=True).data),
+                ('carts     cart_rows', len(cart_row_list),
+                 lambda: cart_rows.many(cart_row_list)),
+                ('carts     ORM + CartSerializer', len(cart_instances),
+                 lambda: CartSerializer(
+                     carts.with_items(), many=True
+                 ).data),
+                ('carts     values + cart_rows', len(cart_row_list),
+                 lambda: cart_rows.many(cart_values(carts))),
+            ]
+            self.stdout.write(f'Median of {repeat} runs:')
+            for name, count, function in scenarios:
+                elapsed = _median_ms(function, repeat)
+                self.stdout.write(
+                    f'  {name:<36} {elapsed:9.2f} ms '
+                    f'{count / elapsed * 1000:10.0f} objects/s'
+                )
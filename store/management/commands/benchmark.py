@@ -0,0 +1,132 @@
+"""
+Benchmarks every public endpoint against a stored baseline.
+
+A deterministic catalog and set of carts are seeded into a throwaway test
+database, then each scenario of `store.benchmarks` is requested
+`--requests` times in-process. The command prints p50/p95/p99 latency,
+requests per second and queries per request, and fails if a scenario
+regressed against the baseline by more than `--threshold`. Catalog
+responses are not cached unless `--cache-responses` is given.
+
+For throughput under concurrency, see `load_test`.
+
+Examples:
+    python manage.py benchmark --save-baseline
+    python manage.py benchmark --threshold 0.25
+    python manage.py benchmark --scenario cart: --requests 500
+"""
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from MyShop.cache import bump_generation
+from store import catalog, search
+from store.benchmarks import (
+    SCENARIOS, benchmark_data, find_regressions, run_scenario,
+)
+from store.seeding import benchmark_database, seed_carts, seed_catalog
+
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the public endpoints and checks for regressions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--products', type=int, default=5000)
+        parser.add_argument('--carts', type=int, default=500)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument(
+            '--cache-responses', action='store_true',
+            help='Let the catalog response cache answer repeated requests. '
+                 'Compare against a baseline recorded the same way.'
+        )
+        parser.add_argument(
+            '--scenario', action='append', default=[],
+            help='Only run scenarios whose name starts with this prefix.'
+        )
+        parser.add_argument('--baseline', type=Path,
+                            default=DEFAULT_BASELINE)
+        parser.add_argument(
+            '--save-baseline', action='store_true',
+            help='Write the results as the new baseline.'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Tolerated relative p95 latency increase.'
+        )
+
+    def handle(self, *args, **options):
+        scenarios = [
+            scenario for scenario in SCENARIOS
+            if not options['scenario'] or
+            scenario.name.startswith(tuple(options['scenario']))
+        ]
+        if not scenarios:
+            raise CommandError('No scenario matches --scenario.')
+
+        with benchmark_database():
+            seed_catalog(options['categories'], options['products'])
+            # Seeding bypasses the signals that keep the index current.
+            search.get_backend().rebuild()
+            cart_codes = seed_carts(options['carts'])
+            # Responses cached for another database must not be served.
+            bump_generation()
+            catalog.reset()
+            data = benchmark_data(cart_codes)
+            client = Client()
+            results = {}
+            self.stdout.write(
+                f'{"scenario":<24}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+                f'{"req/s":>9}{"queries":>9}{"errors":>8}'
+            )
+            for scenario in scenarios:
+                result = run_scenario(
+                    scenario, client, data, options['requests'],
+                    options['warmup'], options['cache_responses'],
+                )
+                results[scenario.name] = result
+                self.stdout.write(
+                    f'{scenario.name:<24}{result["p50"]:>9.2f}'
+                    f'{result["p95"]:>9.2f}{result["p99"]:>9.2f}'
+                    f'{result["rps"]:>9.0f}{result["queries"]:>9.2f}'
+                    f'{result["errors"]:>8}'
+                )
+
+        baseline_path = options['baseline']
+        if options['save_baseline']:
+            baseline = {}
+            if baseline_path.exists():
+                baseline = json.loads(baseline_path.read_text())
+            baseline.update(results)
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(
+                json.dumps(baseline, indent=2, sort_keys=True) + '\n'
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'Saved the baseline to {baseline_path}.'
+            ))
+            return
+
+        if not baseline_path.exists():
+            self.stdout.write(
+                f'No baseline at {baseline_path}; run with --save-baseline.'
+            )
+            return
+        regressions = find_regressions(
+            results, json.loads(baseline_path.read_text()),
+            options['threshold'],
+        )
+        if regressions:
+            raise CommandError(
+                'Regressions against the baseline:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'No regressions against the baseline.'
+        ))
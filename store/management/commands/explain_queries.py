@@ -0,0 +1,150 @@
+"""
+Checks the query plans of the hot endpoint queries.
+
+A large catalog and a few carts are seeded into a throwaway test database,
+the planner statistics are refreshed with ANALYZE, and every query below
+is run through EXPLAIN. The command fails if any plan reads a whole table
+(`SCAN <table>` on SQLite, `Seq Scan` on PostgreSQL), unless it is listed
+in `EXPECTED_SCANS`; full scans of an index are accepted. Plans that sort
+in a temporary structure are reported as warnings.
+
+Example:
+    python manage.py explain_queries --products 200000 --verbosity 2
+"""
+import re
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from cart.models import Cart, CartItem
+from store import catalog
+from store.models import Product
+from store.pagination import PAGE_SIZE
+from store.seeding import benchmark_database, seed_carts, seed_catalog
+from store.similar import get_candidates
+
+
+SEQUENTIAL_SCAN = re.compile(r'\bSCAN \w+$|\bSeq Scan\b')
+TEMPORARY_SORT = re.compile(r'USE TEMP B-TREE')
+
+# Queries that read most of a table whatever the indexes, with the reason.
+EXPECTED_SCANS = {
+    'product_list count': 'counts every available product; clients avoid '
+                          'it with count=false or cursor pagination',
+}
+
+
+def endpoint_queries():
+    """
+    Returns `(name, callable)` pairs running the queries of the hot
+    endpoints against seeded rows, as the views issue them.
+    """
+    # Built once per process and then served from memory.
+    catalog.get_snapshot()
+    product = Product.objects.available().select_related('category').first()
+    category = product.category
+    cart = Cart.objects.first()
+    listing = Product.objects.available().listing_rows()
+    return [
+        ('product_list count', listing.count),
+        ('product_list page', lambda: list(listing[:PAGE_SIZE])),
+        ('product_list cursor', lambda: list(
+            listing.order_by('-date_created', '-id').filter(
+                Q(date_created__lt=product.date_created) |
+                Q(date_created=product.date_created, id__lt=product.id)
+            )[:PAGE_SIZE + 1]
+        )),
+        ('category listing', lambda: list(
+            listing.filter(category__slug=category.slug)[:PAGE_SIZE]
+        )),
+        ('product_details', lambda: Product.objects.get(
+            category__slug=category.slug, slug=product.slug
+        )),
+        ('similar candidates', lambda: get_candidates(category.id)),
+        ('product delta', lambda: list(Product.objects.filter(
+            date_modified__gt=timezone.now()
+        ).order_by('date_modified', 'id'))),
+        ('cart by code', lambda: Cart.objects.get(cart_code=cart.cart_code)),
+        ('cart items', lambda: list(
+            Cart.objects.with_items().filter(pk=cart.pk)
+        )),
+        ('cart line', lambda: CartItem.objects.filter(
+            cart=cart, product=product
+        ).exists()),
+    ]
+
+
+def explain(sql, params):
+    """
+    Returns the query plan of a captured query as text.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'{connection.ops.explain_query_prefix()} {sql}', params
+        )
+        return '\n'.join(
+            ' '.join(str(column) for column in row)
+            for row in cursor.fetchall()
+        )
+
+
+class Command(BaseCommand):
+    help = 'Fails if a hot endpoint query plan scans a whole table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=50_000)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--carts', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        with benchmark_database():
+            seed_catalog(options['categories'], options['products'])
+            seed_carts(options['carts'])
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            failures = self.check_plans()
+        if failures:
+            raise CommandError(
+                f'Sequential scans in: {", ".join(failures)}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'No sequential scans in the hot endpoint queries.'
+        ))
+
+    def check_plans(self):
+        failures = []
+        for name, run in endpoint_queries():
+            cache.clear()
+            queries = []
+
+            def record(execute, sql, params, many, context):
+                queries.append((sql, params))
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(record):
+                run()
+            plans = [explain(sql, params) for sql, params in queries]
+            lines = '\n'.join(plans).splitlines()
+            scans = [line for line in lines if SEQUENTIAL_SCAN.search(line)]
+            sorts = [line for line in lines if TEMPORARY_SORT.search(line)]
+            if scans and name in EXPECTED_SCANS:
+                self.stdout.write(
+                    f'scan  {name} (expected: {EXPECTED_SCANS[name]})'
+                )
+            elif scans:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f'SCAN  {name}'))
+            elif sorts:
+                self.stdout.write(self.style.WARNING(f'SORT  {name}'))
+            else:
+                self.stdout.write(f'ok    {name}')
+            if scans or sorts or self.verbosity > 1:
+                for (sql, _), plan in zip(queries, plans):
+                    self.stdout.write(f'      {sql[:100]}')
+                    for line in plan.splitlines():
+                        self.stdout.write(f'        {line}')
+        return failures
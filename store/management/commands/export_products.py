@@ -0,0 +1,75 @@
+"""
+Exports the product catalog as CSV or JSONL.
+
+Products are streamed with `.values()` and `.iterator()`, so memory use
+stays flat however large the catalog is. The output uses the columns
+accepted by `import_products`.
+
+Example:
+    python manage.py export_products catalog.jsonl
+"""
+import csv
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.models import Product
+from .import_products import detect_format
+
+
+COLUMNS = [
+    'product_name', 'slug', 'category', 'description', 'price', 'stock',
+    'is_available', 'available_colors', 'available_sizes',
+]
+
+
+class Command(BaseCommand):
+    help = 'Streams every product to a CSV or JSONL file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to write, or '-' for stdout.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'])
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = detect_format(path, options['format']) if path != '-' \
+            else options['format'] or 'csv'
+        rows = Product.objects.order_by('id').values(
+            'product_name', 'slug', 'category__slug', 'description', 'price',
+            'stock', 'is_available', 'available_colors', 'available_sizes',
+        ).iterator(chunk_size=options['chunk_size'])
+
+        started = time.perf_counter()
+        count = 0
+        stream = sys.stdout if path == '-' else open(path, 'w', newline='')
+        try:
+            writer = None
+            if fmt == 'csv':
+                writer = csv.DictWriter(stream, fieldnames=COLUMNS)
+                writer.writeheader()
+            for row in rows:
+                row['category'] = row.pop('category__slug')
+                if writer is not None:
+                    row['available_colors'] = ', '.join(
+                        row['available_colors'] or []
+                    )
+                    row['available_sizes'] = ', '.join(
+                        row['available_sizes'] or []
+                    )
+                    writer.writerow(row)
+                else:
+                    stream.write(json.dumps(row) + '\n')
+                count += 1
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+
+        if path != '-':
+            elapsed = time.perf_counter() - started
+            rate = count / elapsed if elapsed else 0
+            self.stdout.write(self.style.SUCCESS(
+                f'Exported {count} products ({rate:.0f} rows/sec).'
+            ))
@@ -0,0 +1,77 @@
+"""
+Backfills the resized copies of product and category images.
+
+Saving a product or category generates the variants of its image (see
+`MyShop.images`), but images uploaded before the pipeline existed, or
+written by bulk operations, have none. This command generates the missing
+variants of every image in parallel. Run it with `--overwrite` after
+changing `IMAGE_VARIANT_WIDTHS`, `IMAGE_VARIANT_FORMATS` or
+`IMAGE_VARIANT_QUALITY`.
+
+Example:
+    python manage.py generate_image_variants --workers 8
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Category.models import Category
+from MyShop.images import generate_variants
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Generates the missing variants of every product and ' \
+           'category image.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Images processed at once.'
+        )
+        parser.add_argument(
+            '--overwrite', action='store_true',
+            help='Regenerate variants that already exist.'
+        )
+
+    def handle(self, *args, **options):
+        names = set(
+            Product.objects.exclude(image='').exclude(image=None)
+            .values_list('image', flat=True)
+        )
+        names.update(
+            Category.objects.exclude(cat_image='')
+            .values_list('cat_image', flat=True)
+        )
+        names = sorted(names)
+
+        generated = skipped = 0
+        failed = []
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            futures = {
+                pool.submit(generate_variants, name, options['overwrite']):
+                    name
+                for name in names
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                name = futures[future]
+                try:
+                    written = future.result()
+                except Exception as error:
+                    failed.append(name)
+                    self.stderr.write(f'{name}: {error}')
+                    continue
+                if written:
+                    generated += 1
+                else:
+                    skipped += 1
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'[{done}/{len(names)}] {name}')
+
+        self.stdout.write(
+            f'Generated variants of {generated} images; {skipped} were up '
+            f'to date.'
+        )
+        if failed:
+            raise CommandError(f'{len(failed)} images failed.')
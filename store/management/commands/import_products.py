@@ -0,0 +1,215 @@
+"""
+Imports a product catalog from a CSV or JSONL file.
+
+Rows are streamed and written in chunks: each chunk costs one query to
+find the existing products, one query to allocate slugs, one
+`bulk_create` and one `bulk_update`, so memory use does not grow with the
+size of the file.
+
+Columns (CSV header or JSON keys):
+- product_name (required, matches existing products)
+- category (required, category slug or name)
+- price, stock (required integers)
+- description, is_available, available_colors, available_sizes (optional)
+
+`available_colors` and `available_sizes` are comma-separated, as in the
+admin form; JSONL rows may also give lists.
+
+Example:
+    python manage.py import_products suppliers.csv --chunk-size 2000
+"""
+import csv
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from Category.models import Category
+from MyShop.slugs import unique_slugs
+from store.models import Product
+from store.signals import products_changed
+from store.utils import split_comma_separated
+
+
+UPDATE_FIELDS = [
+    'description', 'price', 'stock', 'is_available', 'category',
+    'available_colors', 'available_sizes', 'date_modified',
+]
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+
+
+def detect_format(path, fmt):
+    """
+    Returns the explicit format, or infers it from the file extension.
+    """
+    if fmt:
+        return fmt
+    if path.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if path.endswith('.csv'):
+        return 'csv'
+    raise CommandError('Cannot infer the format; pass --format.')
+
+
+def read_rows(stream, fmt):
+    """
+    Yields `(line_number, row, error)` triples from a CSV or JSONL stream.
+
+    `line_number` is the physical line of the file the row ends on,
+    counting the CSV header and blank lines. `row` is a dict, or None when
+    `error` describes why the line could not be parsed.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if line:
+            try:
+                yield line_number, json.loads(line), None
+            except ValueError as error:
+                yield line_number, None, f'invalid JSON: {error}'
+
+
+class Command(BaseCommand):
+    help = 'Imports products from a CSV or JSONL file in chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to read, or '-' for stdin.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'])
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = detect_format(path, options['format']) if path != '-' \
+            else options['format'] or 'csv'
+        self.chunk_size = options['chunk_size']
+
+        # Categories are few; resolve them from memory by slug or name.
+        self.categories = {}
+        for pk, slug, name in Category.objects.values_list(
+            'id', 'slug', 'category_name'
+        ):
+            self.categories[slug] = pk
+            self.categories.setdefault(name.lower(), pk)
+
+        self.created = self.updated = self.skipped = 0
+        started = time.perf_counter()
+        stream = sys.stdin if path == '-' else open(path, newline='')
+        try:
+            chunk = []
+            for line, row, error in read_rows(stream, fmt):
+                product = None if error else self.build_product(row, line)
+                if error:
+                    self.warn(line, error)
+                if product is not None:
+                    chunk.append(product)
+                if len(chunk) >= self.chunk_size:
+                    self.write_chunk(chunk)
+                    chunk = []
+                    self.report(started)
+            if chunk:
+                self.write_chunk(chunk)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.report(started)
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {self.created}, updated {self.updated}, '
+            f'skipped {self.skipped} rows.'
+        ))
+
+    def warn(self, line, message):
+        self.skipped += 1
+        self.stderr.write(f'Line {line}: {message}')
+
+    def report(self, started):
+        rows = self.created + self.updated
+        elapsed = time.perf_counter() - started
+        rate = rows / elapsed if elapsed else 0
+        self.stdout.write(f'{rows} rows written, {rate:.0f} rows/sec')
+
+    def build_product(self, row, line):
+        """
+        Converts a raw row into an unsaved `Product`, or None if invalid.
+        """
+        try:
+            name = str(row.get('product_name') or '').strip()
+            if not name:
+                raise ValueError('product_name is required')
+            category = str(row.get('category') or '').strip()
+            category_id = self.categories.get(category) or \
+                self.categories.get(category.lower())
+            if category_id is None:
+                raise ValueError(f'unknown category {category!r}')
+            available = row.get('is_available', True)
+            if isinstance(available, str):
+                available = available.strip().lower() in TRUE_VALUES
+            return Product(
+                product_name=name,
+                description=str(row.get('description') or '').strip(),
+                price=int(row['price']),
+                stock=int(row['stock']),
+                is_available=bool(available),
+                category_id=category_id,
+                available_colors=split_comma_separated(
+                    row.get('available_colors')
+                ),
+                available_sizes=split_comma_separated(
+                    row.get('available_sizes')
+                ),
+            )
+        except (KeyError, TypeError, ValueError) as error:
+            self.warn(line, str(error))
+            return None
+
+    def write_chunk(self, chunk):
+        """
+        Inserts new products and updates existing ones, matched by name.
+        """
+        # A later row for the same product wins.
+        chunk = list({product.product_name: product
+                      for product in chunk}.values())
+        rows = Product.objects.filter(
+            product_name__in=[product.product_name for product in chunk]
+        ).values_list('product_name', 'id', 'category_id')
+        existing = {}
+        previous_category_ids = set()
+        for name, pk, category_id in rows:
+            existing[name] = pk
+            previous_category_ids.add(category_id)
+
+        to_create = [p for p in chunk if p.product_name not in existing]
+        to_update = [p for p in chunk if p.product_name in existing]
+        now = timezone.now()
+        for product in to_update:
+            product.id = existing[product.product_name]
+            product.date_modified = now
+        slugs = unique_slugs(
+            Product, [product.product_name for product in to_create]
+        )
+        for product, slug in zip(to_create, slugs):
+            product.slug = slug
+
+        with transaction.atomic():
+            created = Product.objects.bulk_create(to_create)
+            Product.objects.bulk_update(to_update, UPDATE_FIELDS)
+
+        self.created += len(to_create)
+        self.updated += len(to_update)
+        changed_ids = [product.id for product in created + to_update]
+        if None in changed_ids:
+            # Backends that cannot return ids from bulk_create.
+            changed_ids = list(Product.objects.filter(
+                product_name__in=[p.product_name for p in chunk]
+            ).values_list('id', flat=True))
+        products_changed.send(
+            sender=Product, product_ids=changed_ids,
+            previous_category_ids=previous_category_ids,
+        )
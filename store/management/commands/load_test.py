@@ -0,0 +1,159 @@
+"""
+Measures concurrent-request throughput of the sync and async endpoints.
+
+By default a catalog is seeded into a throwaway test database and every
+path is requested `--requests` times with `--concurrency` requests in
+flight, once through the WSGI handler (one thread per in-flight request,
+like a threaded WSGI server) and once through the ASGI handler (one task
+per in-flight request, like uvicorn). `--db-latency-ms` adds a delay to
+every query to mimic a remote database, which is where async views help.
+
+With `--url`, running servers are load-tested over HTTP instead, e.g. to
+compare `gunicorn MyShop.wsgi --threads 8` with
+`uvicorn MyShop.asgi:application`:
+    python manage.py load_test --url http://127.0.0.1:8000 \\
+        --url http://127.0.0.1:8001 /store/ /async/store/
+
+Sync catalog endpoints are response-cached (see `MyShop.cache`); the async
+variants are not.
+"""
+import asyncio
+import statistics
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client
+
+from store import search
+from store.models import Product
+from store.seeding import benchmark_database, seed_catalog
+
+
+DEFAULT_PATHS = [
+    '/store/', '/async/store/', '/categories/', '/async/categories/',
+    '{detail}', '/async{detail}',
+]
+
+
+def summarize(latencies, elapsed, errors):
+    """
+    Formats throughput and latency percentiles of one run.
+    """
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100) \
+        if len(latencies) > 1 else latencies * 99
+    return (
+        f'{len(latencies) / elapsed:8.0f} req/s  '
+        f'p50 {quantiles[49] * 1000:7.1f} ms  '
+        f'p95 {quantiles[94] * 1000:7.1f} ms  '
+        f'p99 {quantiles[98] * 1000:7.1f} ms  '
+        f'errors {errors}'
+    )
+
+
+class Command(BaseCommand):
+    help = 'Compares concurrent throughput of WSGI and ASGI request paths.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*')
+        parser.add_argument('--url', action='append', default=[],
+                            help='Base URL of a running server to test.')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--products', type=int, default=5000)
+        parser.add_argument('--db-latency-ms', type=float, default=0)
+
+    def handle(self, *args, **options):
+        self.options = options
+        if options['url']:
+            paths = options['paths'] or DEFAULT_PATHS[:4]
+            for base_url in options['url']:
+                for path in paths:
+                    self.report(base_url, path, self.run_http(base_url + path))
+            return
+
+        with benchmark_database(on_disk=True):
+            seed_catalog(products=options['products'])
+            # Seeding bypasses the signals that keep the index current.
+            search.get_backend().rebuild()
+            detail = Product.objects.select_related('category').first()
+            detail = f'/store/{detail.category.slug}/{detail.slug}/'
+            paths = [
+                path.format(detail=detail)
+                for path in options['paths'] or DEFAULT_PATHS
+            ]
+            if options['db_latency_ms']:
+                self.add_db_latency(options['db_latency_ms'] / 1000)
+            for path in paths:
+                self.report('wsgi', path, self.run_wsgi(path))
+                self.report('asgi', path, asyncio.run(self.run_asgi(path)))
+
+    def report(self, mode, path, result):
+        self.stdout.write(f'{mode:>6} {path:<40} {summarize(*result)}')
+
+    def add_db_latency(self, seconds):
+        def delay(execute, sql, params, many, context):
+            time.sleep(seconds)
+            return execute(sql, params, many, context)
+
+        def install(sender, connection, **kwargs):
+            connection.execute_wrappers.append(delay)
+
+        connection_created.connect(install, weak=False)
+        connection.execute_wrappers.append(delay)
+
+    def run_threads(self, request):
+        latencies, errors = [], 0
+
+        def timed(_):
+            started = time.perf_counter()
+            ok = request()
+            return time.perf_counter() - started, ok
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.options['concurrency']) as pool:
+            for latency, ok in pool.map(timed, range(self.options['requests'])):
+                latencies.append(latency)
+                errors += not ok
+        return latencies, time.perf_counter() - started, errors
+
+    def run_http(self, url):
+        def request():
+            try:
+                with urllib.request.urlopen(url, timeout=30) as response:
+                    response.read()
+                    return response.status == 200
+            except OSError:
+                return False
+        return self.run_threads(request)
+
+    def run_wsgi(self, path):
+        def request():
+            try:
+                return Client().get(path).status_code == 200
+            finally:
+                connection.close()
+        return self.run_threads(request)
+
+    async def run_asgi(self, path):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(self.options['concurrency'])
+        latencies, errors = [], 0
+
+        async def request():
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - started)
+                errors += response.status_code != 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            request() for _ in range(self.options['requests'])
+        ])
+        return latencies, time.perf_counter() - started, errors
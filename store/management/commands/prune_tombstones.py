@@ -0,0 +1,31 @@
+"""
+Deletes tombstones older than `settings.DELTA_TOMBSTONE_RETENTION_DAYS`.
+
+Delta sync clients whose watermark predates the retention period receive
+a full reset, so older tombstones are never read. Run it daily, e.g.:
+    python manage.py prune_tombstones
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from Category.models import CategoryTombstone
+from store.models import ProductTombstone
+
+
+class Command(BaseCommand):
+    help = 'Deletes product and category tombstones past their retention.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int,
+            default=settings.DELTA_TOMBSTONE_RETENTION_DAYS,
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        for model in (ProductTombstone, CategoryTombstone):
+            deleted, _ = model.objects.filter(deleted_at__lt=cutoff).delete()
+            self.stdout.write(f'{model.__name__}: deleted {deleted} rows.')
@@ -0,0 +1,23 @@
+"""
+Rebuilds the product search index.
+
+Saves and deletes keep the index current through signals, but bulk
+operations such as `QuerySet.update` or `bulk_create` bypass them.
+Run this command after such operations when using
+`DatabaseSearchBackend`; the in-memory index lives in each server process
+and is rebuilt when the process restarts.
+"""
+from django.core.management.base import BaseCommand
+
+from store.search import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the product search index from the Product table.'
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt search index with {type(backend).__name__}.'
+        ))
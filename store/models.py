@@ -13,8 +13,67 @@ It also ensures unique product names and auto-generates slugs if not provided.
 
 
 from django.db import models
-from django.utils.text import slugify
 from Category.models import Category
+from MyShop.slugs import save_with_unique_slug
+
+
+class ProductQuerySet(models.QuerySet):
+    """
+    Custom queryset for the `Product` model.
+
+    Centralises the query shapes used by the product API endpoints so
+    every listing loads its related data in a fixed number of queries.
+    """
+
+    # Columns emitted by `ProductSerializer`, including the nested category,
+    # plus the cursor pagination key. Also the `.values()` keys read by
+    # `store.serializers.product_rows`.
+    LISTING_FIELDS = (
+        'id', 'product_name', 'description', 'price', 'slug', 'image',
+        'stock', 'date_created', 'category__id', 'category__category_name',
+        'category__slug',
+    )
+
+    def available(self):
+        """
+        Restricts the queryset to products that can be purchased.
+
+        Returns:
+            ProductQuerySet: Products with `is_available` set.
+        """
+        return self.filter(is_available=True)
+
+    def for_listing(self):
+        """
+        Prepares the queryset for serialization with `ProductSerializer`.
+
+        Joins the category in the same query and defers every column the
+        serializer does not emit, so a page of products costs one query no
+        matter how many rows it holds.
+
+        Returns:
+            ProductQuerySet: The optimised queryset.
+        """
+        return self.select_related('category').only(*self.LISTING_FIELDS)
+
+    def listing_rows(self, columns=None):
+        """
+        Reads the listing columns as `.values()` rows.
+
+        Like `for_listing`, but without creating model instances; the rows
+        are rendered with `store.serializers.product_rows`.
+
+        Args:
+            columns (tuple, optional): The columns to read, usually the
+                `values` of a narrowed `product_rows`. The pagination keys
+                `id` and `date_created` are always read. Defaults to
+                `LISTING_FIELDS`.
+
+        Returns:
+            ProductQuerySet: Dicts keyed by the columns.
+        """
+        columns = self.LISTING_FIELDS if columns is None else columns
+        return self.values(*dict.fromkeys((*columns, 'id', 'date_created')))
 
 
 class Product(models.Model):
@@ -48,14 +107,32 @@ class Product(models.Model):
         Category, on_delete=models.CASCADE, related_name='products'
     )
     date_created = models.DateTimeField(auto_now_add=True)
-    date_modified = models.DateTimeField(auto_now=True)
+    date_modified = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = ProductQuerySet.as_manager()
 
     def __str__(self):
         """Returns a string representation of the product."""
         return self.product_name
 
     class Meta:
-        ordering = ['-date_created']
+        ordering = ['-date_created', '-id']
+        # Partial indexes over available products serve the listing
+        # endpoints (newest first, optionally within a category) as
+        # index-ordered range reads. Slug lookups use the unique indexes.
+        # Checked by the `explain_queries` command.
+        indexes = [
+            models.Index(
+                fields=['-date_created', '-id'],
+                condition=models.Q(is_available=True),
+                name='product_available_date_idx',
+            ),
+            models.Index(
+                fields=['category', '-date_created', '-id'],
+                condition=models.Q(is_available=True),
+                name='product_available_cat_idx',
+            ),
+        ]
 
     def save(self, *args, **kwargs):
         """
@@ -63,17 +140,27 @@ class Product(models.Model):
             auto-generate a slug if not provided.
 
         If a product with the same slug already exists\
-            a unique slug is created by appending a counter.
+            a unique slug is created by appending a counter
+            (see `MyShop.slugs`).
         """
         if not self.slug:
-            slug = slugify(self.product_name)
-            base_slug = slug
+            return save_with_unique_slug(
+                self, self.product_name,
+                lambda: super(Product, self).save(*args, **kwargs)
+            )
+        super().save(*args, **kwargs)
 
-            count = 1
 
-            while Product.objects.filter(slug=base_slug).exists():
-                slug = f"{slug}-{count}"
-                count += 1
+class ProductTombstone(models.Model):
+    """
+    Records a deleted product so delta sync clients can drop it.
 
-            self.slug = slug
-        super().save(*args, **kwargs)
+    Attributes:
+        product_id (int): Id of the deleted product.
+        deleted_at (datetime): When the product was deleted.
+    """
+    product_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f'Product {self.product_id} deleted at {self.deleted_at}'
@@ -0,0 +1,302 @@
+"""
+Products App Pagination
+
+This module defines the paginators used by the product listing endpoints.
+
+Paginators:
+- `ProductPageNumberPagination`: Page-number pagination with a
+  client-controlled page size and an optional skip of the `COUNT(*)` query.
+- `ProductCursorPagination`: Keyset pagination on `(date_created, id)`.
+  Every page is an indexed range read, so deep pages cost the same as the
+  first one.
+
+`get_product_paginator` picks the paginator for a request: pass
+`?pagination=cursor` (or a `cursor`) to use keyset pagination.
+
+`apaginate` is the page-number paginator of the async views, which cannot
+use the synchronous DRF paginators.
+"""
+import base64
+import binascii
+
+from django.db.models import Q
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+PAGE_SIZE = 6
+MAX_PAGE_SIZE = 100
+
+
+def wants_count(request):
+    """
+    Returns False when the client asked to skip the total count.
+    """
+    return request.query_params.get('count', '').lower() not in (
+        'false', '0', 'no'
+    )
+
+
+class ProductPageNumberPagination(PageNumberPagination):
+    """
+    Page-number pagination for product listings.
+
+    Query parameters:
+        page (int): The page number.
+        page_size (int): Products per page, capped at `MAX_PAGE_SIZE`.
+        count (bool): Pass `false` to skip the `COUNT(*)` query. The
+            response then omits `count` and detects the next page by
+            fetching one extra row.
+    """
+    page_size = PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.with_count = wants_count(request)
+        if self.with_count:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        try:
+            self.page_number = int(
+                request.query_params.get(self.page_query_param, 1)
+            )
+            if self.page_number < 1:
+                raise ValueError
+        except ValueError:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=request.query_params.get(self.page_query_param),
+                message='Invalid page.'
+            ))
+        offset = (self.page_number - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        self.has_next = len(rows) > page_size
+        return rows[:page_size]
+
+    def get_next_link(self):
+        if self.with_count:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.page_query_param, self.page_number + 1
+        )
+
+    def get_previous_link(self):
+        if self.with_count:
+            return super().get_previous_link()
+        if self.page_number == 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(
+            url, self.page_query_param, self.page_number - 1
+        )
+
+    def get_paginated_response(self, data):
+        if self.with_count:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class ProductCursorPagination(BasePagination):
+    """
+    Keyset pagination over products ordered newest first.
+
+    The cursor encodes the `(date_created, id)` of the last product on the
+    page, and the next page is read with
+    `WHERE (date_created, id) < (cursor)` instead of an `OFFSET`. No total
+    count is computed.
+
+    Ranked search results are already an in-memory list of ids, so for
+    them the cursor encodes a position in that list.
+
+    Query parameters:
+        cursor (str): Opaque cursor taken from a previous `next` link.
+        page_size (int): Products per page, capped at `MAX_PAGE_SIZE`.
+    """
+    cursor_query_param = 'cursor'
+    page_size = PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+    ordering = ('-date_created', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        return PageNumberPagination.get_page_size(self, request)
+
+    @staticmethod
+    def make_cursor(position):
+        """
+        Encodes a cursor position.
+
+        Args:
+            position (int or tuple): A list offset, or the
+                `(date_created, id)` of the last product already returned.
+
+        Returns:
+            str: The opaque cursor.
+        """
+        if isinstance(position, int):
+            raw = f'@{position}'
+        else:
+            date_created, pk = position
+            raw = f'{date_created.isoformat()}|{pk}'
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def encode_cursor(self, position):
+        """
+        Builds the `next` link for the given cursor position.
+        """
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.make_cursor(position)
+        )
+
+    def decode_cursor(self, request):
+        """
+        Parses the cursor of the request.
+
+        Returns:
+            None, int or tuple: No cursor, a list offset, or a
+            `(date_created, id)` key.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode()).decode()
+            if raw.startswith('@'):
+                return int(raw[1:])
+            date_created, pk = raw.rsplit('|', 1)
+            date_created = parse_datetime(date_created)
+            if date_created is None:
+                raise ValueError
+            return date_created, int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        if isinstance(queryset, list):
+            offset = position if isinstance(position, int) else 0
+            page = queryset[offset:offset + page_size]
+            has_next = offset + page_size < len(queryset)
+            next_position = offset + page_size
+        else:
+            if isinstance(position, int):
+                raise NotFound(self.invalid_cursor_message)
+            queryset = queryset.order_by(*self.ordering)
+            if position is not None:
+                date_created, pk = position
+                queryset = queryset.filter(
+                    Q(date_created__lt=date_created) |
+                    Q(date_created=date_created, id__lt=pk)
+                )
+            page = list(queryset[:page_size + 1])
+            has_next = len(page) > page_size
+            page = page[:page_size]
+            if page:
+                last = page[-1]
+                if isinstance(last, dict):
+                    next_position = (last['date_created'], last['id'])
+                else:
+                    next_position = (last.date_created, last.id)
+
+        self.next_link = self.encode_cursor(next_position) \
+            if has_next else None
+        return page
+
+    def get_next_link(self):
+        return self.next_link
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+
+def get_product_paginator(request):
+    """
+    Returns the paginator requested by the client.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        BasePagination: A cursor paginator when `?pagination=cursor` or a
+        `cursor` is given, otherwise a page-number paginator.
+    """
+    if (request.query_params.get('pagination') == 'cursor' or
+            ProductCursorPagination.cursor_query_param in request.query_params):
+        return ProductCursorPagination()
+    return ProductPageNumberPagination()
+
+
+async def apaginate(queryset, request):
+    """
+    Paginates a queryset by page number with the async ORM.
+
+    Reads the same `page` and `page_size` parameters as
+    `ProductPageNumberPagination` and returns the same structure.
+
+    Args:
+        queryset (QuerySet): The ordered queryset.
+        request (HttpRequest): The plain Django request.
+
+    Returns:
+        tuple: `(page, data)` with the page as a list of instances (or
+        rows, for a `.values()` queryset) and
+        `data` holding `count`, `next` and `previous`.
+
+    Raises:
+        Http404: If the page number is invalid or out of range.
+    """
+    try:
+        page_size = min(
+            int(request.GET.get('page_size', PAGE_SIZE)), MAX_PAGE_SIZE
+        )
+        if page_size < 1:
+            page_size = PAGE_SIZE
+    except ValueError:
+        page_size = PAGE_SIZE
+    try:
+        page_number = int(request.GET.get('page', 1))
+        if page_number < 1:
+            raise ValueError
+    except ValueError:
+        raise Http404('Invalid page.')
+
+    count = await queryset.acount()
+    offset = (page_number - 1) * page_size
+    if offset and offset >= count:
+        raise Http404('Invalid page.')
+    page = [item async for item in queryset[offset:offset + page_size]]
+
+    url = request.build_absolute_uri()
+    next_link = previous_link = None
+    if offset + page_size < count:
+        next_link = replace_query_param(url, 'page', page_number + 1)
+    if page_number == 2:
+        previous_link = remove_query_param(url, 'page')
+    elif page_number > 2:
+        previous_link = replace_query_param(url, 'page', page_number - 1)
+    return page, {
+        'count': count, 'next': next_link, 'previous': previous_link,
+    }
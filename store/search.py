@@ -0,0 +1,370 @@
+"""
+Products App Search
+
+This module provides the pluggable search backends behind `/store/search/`.
+
+Backends return product ids ranked by relevance instead of filtering the
+product table with `icontains`, which scans every row on each keystroke.
+
+Backends:
+- `DatabaseSearchBackend` (the default): Uses the database's own
+  full-text engine, SQLite FTS5 or a PostgreSQL `tsvector` expression
+  index, so every server process sees the same index.
+- `InMemorySearchBackend`: A process-local inverted index over product
+  names and descriptions with prefix matching and tf-idf ranking. Each
+  process only applies the writes it performs itself, so it is meant for
+  single-process deployments and tests.
+
+The backend is selected with `settings.STORE_SEARCH_BACKEND` and kept up
+to date by the `Product` signals in `store.signals`.
+"""
+import heapq
+import math
+import re
+import threading
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from .models import Product
+
+
+TOKEN_RE = re.compile(r'\w+')
+
+# Name matches count for more than description matches.
+NAME_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+# Weight of a token that merely starts with the query term.
+PREFIX_WEIGHT = 0.5
+
+
+def tokenize(text):
+    """
+    Splits text into lower-cased word tokens.
+
+    Args:
+        text (str): The text to tokenize.
+
+    Returns:
+        list: The tokens in order of appearance.
+    """
+    return TOKEN_RE.findall((text or '').lower())
+
+
+class BaseSearchBackend:
+    """
+    Interface shared by the product search backends.
+    """
+
+    def search(self, query, limit=None):
+        """
+        Finds the available products matching every term of `query`.
+
+        Args:
+            query (str): The raw search string. Each term matches as a prefix.
+            limit (int, optional): Maximum number of ids to return.
+
+        Returns:
+            list: Product ids, most relevant first.
+        """
+        raise NotImplementedError
+
+    def index_product(self, product):
+        """
+        Adds, refreshes or (if unavailable) removes a product from the index.
+
+        Args:
+            product (Product): The saved product.
+        """
+        raise NotImplementedError
+
+    def remove_product(self, product_id):
+        """
+        Removes a product from the index.
+
+        Args:
+            product_id (int): The id of the deleted product.
+        """
+        raise NotImplementedError
+
+    def rebuild(self):
+        """
+        Rebuilds the whole index from the `Product` table.
+        """
+        raise NotImplementedError
+
+    def prepare(self):
+        """
+        Creates the structures the backend stores in the database, after
+        `migrate`. Does nothing by default.
+        """
+
+
+class InMemorySearchBackend(BaseSearchBackend):
+    """
+    Inverted index held in process memory.
+
+    The index is built from the database on the first search and then
+    maintained incrementally by the signals of this process; writes made
+    by other processes are not seen until `rebuild`. Query cost depends on
+    the number of matching tokens and postings, not on the size of the
+    catalog.
+
+    Attributes:
+        postings (dict): token -> {product_id: weighted term frequency}.
+        tokens (list): Sorted distinct tokens, used for prefix lookups.
+        documents (dict): product_id -> set of tokens the product holds.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.tokens = []
+        self.documents = {}
+        self.built = False
+        self.lock = threading.RLock()
+
+    def _weights(self, product_name, description):
+        weights = {}
+        for token in tokenize(product_name):
+            weights[token] = weights.get(token, 0) + NAME_WEIGHT
+        for token in tokenize(description):
+            weights[token] = weights.get(token, 0) + DESCRIPTION_WEIGHT
+        return weights
+
+    def _add(self, product_id, product_name, description, sort=True):
+        # With `sort=False`, `tokens` is left for the caller to rebuild.
+        weights = self._weights(product_name, description)
+        for token, weight in weights.items():
+            postings = self.postings.get(token)
+            if postings is None:
+                postings = self.postings[token] = {}
+                if sort:
+                    self.tokens.insert(bisect_left(self.tokens, token), token)
+            postings[product_id] = weight
+        self.documents[product_id] = set(weights)
+
+    def _remove(self, product_id):
+        for token in self.documents.pop(product_id, ()):
+            postings = self.postings[token]
+            postings.pop(product_id, None)
+            if not postings:
+                del self.postings[token]
+                del self.tokens[bisect_left(self.tokens, token)]
+
+    def _ensure_built(self):
+        if not self.built:
+            self.rebuild()
+
+    def rebuild(self):
+        with self.lock:
+            self.postings, self.tokens, self.documents = {}, [], {}
+            rows = Product.objects.available().values_list(
+                'id', 'product_name', 'description'
+            )
+            for product_id, product_name, description in rows.iterator():
+                self._add(product_id, product_name, description, sort=False)
+            # Sorting once is O(T log T); inserting each new token in
+            # order would be O(T^2).
+            self.tokens = sorted(self.postings)
+            self.built = True
+
+    def index_product(self, product):
+        with self.lock:
+            if not self.built:
+                return
+            self._remove(product.id)
+            if product.is_available:
+                self._add(
+                    product.id, product.product_name, product.description
+                )
+
+    def remove_product(self, product_id):
+        with self.lock:
+            if self.built:
+                self._remove(product_id)
+
+    def _term_scores(self, term):
+        """
+        Scores every product holding a token that starts with `term`.
+        """
+        total = len(self.documents) or 1
+        scores = {}
+        start = bisect_left(self.tokens, term)
+        for token in self.tokens[start:]:
+            if not token.startswith(term):
+                break
+            postings = self.postings[token]
+            idf = math.log(1 + total / len(postings))
+            factor = idf if token == term else idf * PREFIX_WEIGHT
+            for product_id, weight in postings.items():
+                score = weight * factor
+                if score > scores.get(product_id, 0):
+                    scores[product_id] = score
+        return scores
+
+    def search(self, query, limit=None):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self.lock:
+            self._ensure_built()
+            # Match the rarest term first to keep the intersection small.
+            term_scores = sorted(
+                (self._term_scores(term) for term in set(terms)), key=len
+            )
+            scores = term_scores[0]
+            for other in term_scores[1:]:
+                scores = {
+                    product_id: score + other[product_id]
+                    for product_id, score in scores.items()
+                    if product_id in other
+                }
+        ranked = ((score, product_id) for product_id, score in scores.items())
+        if limit is None:
+            ranked = sorted(ranked, reverse=True)
+        else:
+            ranked = heapq.nlargest(limit, ranked)
+        return [product_id for _, product_id in ranked]
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """
+    Full-text search using the database engine.
+
+    On SQLite an FTS5 table mirrors the searchable columns of available
+    products. On PostgreSQL a GIN index over a `tsvector` expression is
+    queried directly, so saves only need to touch the product row.
+    Both structures are created after `migrate`, or else on first use.
+    """
+
+    FTS_TABLE = 'store_product_fts'
+    PG_INDEX = 'store_product_search_idx'
+    PG_VECTOR = (
+        "setweight(to_tsvector('simple', product_name), 'A') || "
+        "setweight(to_tsvector('simple', description), 'B')"
+    )
+
+    def __init__(self):
+        self.ready = False
+
+    @property
+    def vendor(self):
+        return connection.vendor
+
+    def _ensure_ready(self):
+        if self.ready:
+            return
+        with connection.cursor() as cursor:
+            if self.vendor == 'sqlite':
+                cursor.execute(
+                    'SELECT 1 FROM sqlite_master WHERE name = %s',
+                    [self.FTS_TABLE]
+                )
+                if cursor.fetchone() is None:
+                    self.rebuild()
+            elif self.vendor == 'postgresql':
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {self.PG_INDEX} '
+                    f'ON store_product USING gin (({self.PG_VECTOR}))'
+                )
+            else:
+                raise NotImplementedError(
+                    f'Full-text search is not supported on {self.vendor}'
+                )
+        self.ready = True
+
+    def prepare(self):
+        self.ready = False
+        self._ensure_ready()
+
+    def rebuild(self):
+        if self.vendor != 'sqlite':
+            self.ready = False
+            self._ensure_ready()
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {self.FTS_TABLE}')
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE {self.FTS_TABLE} '
+                'USING fts5(product_name, description)'
+            )
+            cursor.execute(
+                f'INSERT INTO {self.FTS_TABLE} '
+                '(rowid, product_name, description) '
+                'SELECT id, product_name, description FROM store_product '
+                'WHERE is_available'
+            )
+        self.ready = True
+
+    def index_product(self, product):
+        if self.vendor != 'sqlite':
+            return
+        self.remove_product(product.id)
+        if product.is_available:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {self.FTS_TABLE} '
+                    '(rowid, product_name, description) VALUES (%s, %s, %s)',
+                    [product.id, product.product_name, product.description]
+                )
+
+    def remove_product(self, product_id):
+        if self.vendor != 'sqlite':
+            return
+        self._ensure_ready()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.FTS_TABLE} WHERE rowid = %s',
+                [product_id]
+            )
+
+    def search(self, query, limit=None):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        self._ensure_ready()
+        limit = -1 if limit is None else limit
+        with connection.cursor() as cursor:
+            if self.vendor == 'sqlite':
+                match = ' '.join(f'"{term}"*' for term in terms)
+                cursor.execute(
+                    f'SELECT rowid FROM {self.FTS_TABLE} '
+                    f'WHERE {self.FTS_TABLE} MATCH %s '
+                    f'ORDER BY bm25({self.FTS_TABLE}, '
+                    f'{NAME_WEIGHT}, {DESCRIPTION_WEIGHT}), rowid DESC '
+                    'LIMIT %s',
+                    [match, limit]
+                )
+            else:
+                tsquery = ' & '.join(f'{term}:*' for term in terms)
+                cursor.execute(
+                    f'SELECT id FROM store_product '
+                    f'WHERE is_available AND ({self.PG_VECTOR}) @@ '
+                    "to_tsquery('simple', %s) "
+                    f'ORDER BY ts_rank(({self.PG_VECTOR}), '
+                    "to_tsquery('simple', %s)) DESC, id DESC "
+                    'LIMIT %s',
+                    [tsquery, tsquery, None if limit < 0 else limit]
+                )
+            return [row[0] for row in cursor.fetchall()]
+
+
+_backends = {}
+
+
+def get_backend():
+    """
+    Returns the search backend configured in `settings.STORE_SEARCH_BACKEND`.
+
+    Backends are instantiated once per process.
+
+    Returns:
+        BaseSearchBackend: The configured backend.
+    """
+    path = settings.STORE_SEARCH_BACKEND
+    backend = _backends.get(path)
+    if backend is None:
+        backend = _backends[path] = import_string(path)()
+    return backend
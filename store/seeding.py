@@ -0,0 +1,156 @@
+"""
+Catalog Seeding
+
+This module generates deterministic catalog and cart data for benchmarks
+and query-plan checks, and provides a throwaway database to put it in so
+the development database is never touched.
+"""
+import os
+import random
+import tempfile
+import uuid
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import (
+    setup_test_environment, teardown_test_environment
+)
+
+from Category.models import Category
+from cart.models import Cart, CartItem
+from .models import Product
+
+
+COLORS = ['Red', 'Blue', 'Green', 'Black', 'White', 'Yellow']
+SIZES = ['XS', 'S', 'M', 'L', 'XL', 'XXL']
+WORDS = [
+    'classic', 'slim', 'cotton', 'leather', 'denim', 'summer', 'winter',
+    'sport', 'casual', 'premium', 'vintage', 'shirt', 'shoe', 'jacket',
+    'dress', 'hat', 'bag', 'watch', 'belt', 'scarf',
+]
+
+
+@contextmanager
+def benchmark_database(verbosity=0, on_disk=False):
+    """
+    Runs the enclosed block against a freshly created test database.
+
+    The database is created like the test runner does and destroyed on
+    exit, together with everything seeded into it.
+
+    Args:
+        verbosity (int): Verbosity passed to the database creation.
+        on_disk (bool): Use a file instead of an in-memory database on
+            SQLite, so several threads can open their own connection.
+    """
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    old_test_name = test_settings.get('NAME')
+    if on_disk and connection.vendor == 'sqlite' and not old_test_name:
+        test_settings['NAME'] = os.path.join(
+            tempfile.mkdtemp(), 'benchmark.sqlite3'
+        )
+    connection.creation.create_test_db(
+        verbosity=verbosity, autoclobber=True, serialize=False
+    )
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        test_settings['NAME'] = old_test_name
+        teardown_test_environment()
+
+
+def seed_catalog(categories=10, products=1000, batch_size=5000, seed=0):
+    """
+    Bulk-inserts a deterministic catalog.
+
+    Product names, prices, stock, colors and sizes are drawn from a
+    random generator seeded with `seed`, so two runs produce the same
+    catalog. Signals are bypassed, as with any `bulk_create`.
+
+    Args:
+        categories (int): Number of categories to create.
+        products (int): Number of products to create.
+        batch_size (int): Rows per INSERT statement.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        list: The created categories.
+    """
+    rng = random.Random(seed)
+    created = Category.objects.bulk_create([
+        Category(
+            category_name=f'Category {index}',
+            slug=f'category-{index}',
+            description=f'Seeded category {index}',
+        )
+        for index in range(categories)
+    ])
+    category_ids = list(
+        Category.objects.order_by('id').values_list('id', flat=True)
+    )
+
+    batch = []
+    for index in range(products):
+        name = ' '.join(rng.sample(WORDS, 3))
+        batch.append(Product(
+            product_name=f'{name} {index}',
+            slug=f'{name.replace(" ", "-")}-{index}',
+            description=f'A {name} from the seeded catalog.',
+            price=rng.randint(500, 500000),
+            stock=rng.randint(0, 500),
+            is_available=rng.random() < 0.9,
+            available_colors=rng.sample(COLORS, rng.randint(0, 3)),
+            available_sizes=rng.sample(SIZES, rng.randint(0, 3)),
+            category_id=category_ids[index % len(category_ids)],
+        ))
+        if len(batch) == batch_size:
+            Product.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Product.objects.bulk_create(batch)
+    return created
+
+
+def seed_carts(carts=100, max_items=5, batch_size=5000, seed=0):
+    """
+    Bulk-inserts deterministic unpaid carts holding seeded products.
+
+    Each cart holds between one and `max_items` distinct available
+    products. Cart codes are drawn from the seeded generator too, and the
+    denormalized cart summaries are computed at the end.
+
+    Args:
+        carts (int): Number of carts to create.
+        max_items (int): Most lines per cart.
+        batch_size (int): Rows per INSERT statement.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        list: The cart codes, in creation order.
+    """
+    rng = random.Random(seed)
+    product_ids = list(
+        Product.objects.available().order_by('id').values_list('id', flat=True)
+    )
+    codes = [uuid.UUID(int=rng.getrandbits(128), version=4)
+             for _ in range(carts)]
+    created = Cart.objects.bulk_create(
+        [Cart(cart_code=code) for code in codes], batch_size=batch_size
+    )
+    items = []
+    for cart in created:
+        count = rng.randint(1, min(max_items, len(product_ids)))
+        for product_id in rng.sample(product_ids, count):
+            items.append(CartItem(
+                cart_id=cart.id, product_id=product_id,
+                quantity=rng.randint(1, 3),
+            ))
+    CartItem.objects.bulk_create(items, batch_size=batch_size)
+    if created:
+        Cart.objects.filter(
+            id__gte=created[0].id, id__lte=created[-1].id
+        ).refresh_summaries()
+    return codes
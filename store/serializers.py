@@ -9,11 +9,18 @@ Serializers:
     and retrieving product details.
 - `ProductDetailSerializer`: Extends `ProductSerializer`\
     with additional fields, such as similar products.
+- `product_rows`: Renders `.values()` rows like `ProductSerializer`,
+    see `MyShop.compiled`.
 """
 from rest_framework import serializers
 from .models import Product
 from django.shortcuts import get_object_or_404
-from Category.serializers import CategorySerializer
+from Category.serializers import CategorySerializer, category_rows
+from MyShop.compiled import CompiledSerializer
+from MyShop.fieldsets import FieldsetSerializerMixin
+from MyShop.images import ImageVariantsField
+from . import catalog
+from .similar import get_similar_products
 
 
 class ProductSerializer(serializers.ModelSerializer):
@@ -21,50 +28,89 @@ class ProductSerializer(serializers.ModelSerializer):
     Serializes the `Product` model for basic product representation.
 
     Attributes:
-        category (CategorySerializer): Nested serializer for the product\
-            category.
+        image_variants (dict): URLs of the resized copies of the image,
+            see `MyShop.images`.
+        category (dict): The product category, as `CategorySerializer`\
+            renders it.
     """
-    category = CategorySerializer(read_only=True)
+    image_variants = ImageVariantsField(source='image')
+    category = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
         fields = [
             'id', 'product_name', 'description', 'price', 'slug', 'image',
-            'stock', 'category'
+            'image_variants', 'stock', 'category'
         ]
 
+    def get_category(self, product):
+        """
+        Serializes the product category.
+
+        A category already loaded with the product (`select_related`) is
+        used as is; otherwise it is read from the catalog snapshot before
+        falling back to a query.
+        """
+        if not Product.category.is_cached(product):
+            record = catalog.get_category(product.category_id)
+            if record is not None:
+                return catalog.category_data(record)
+        return CategorySerializer(product.category).data
+
 
-class ProductDetailSerializer(serializers.ModelSerializer):
+# Rows need `product_rows.values`, which include the category columns.
+product_rows = CompiledSerializer(ProductSerializer, nested={
+    'category': category_rows.with_prefix('category__'),
+})
+
+
+class ProductDetailSerializer(FieldsetSerializerMixin,
+                              serializers.ModelSerializer):
     """
     Serializes the `Product` model with additional details.
 
     Attributes:
-        similar_products (list): A list of products within the same category.
+        image_variants (dict): URLs of the resized copies of the image,
+            see `MyShop.images`.
+        similar_products (list): A bounded, ranked list of products within
+            the same category. The ranking mode can be passed in the
+            serializer context as `similar_ranking`.
     """
 
+    image_variants = ImageVariantsField(source='image')
     similar_products = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
         fields = [
-            'id', 'product_name', 'description', 'price', 'image', 'stock',
-            'similar_products', 'available_colors', 'available_sizes',
+            'id', 'product_name', 'description', 'price', 'image',
+            'image_variants', 'stock', 'similar_products',
+            'available_colors', 'available_sizes',
         ]
+        # Columns read by fields that are not model fields.
+        fieldset_columns = {
+            'image_variants': ('image',),
+            'similar_products': ('category', 'price'),
+        }
 
     def get_similar_products(self, product):
         """
         Retrieves products from the same category, excluding\
             the current product.
 
+        At most `settings.SIMILAR_PRODUCTS_LIMIT` products are returned,
+        ranked as described in `store.similar`.
+
         Args:
             product (Product): The product instance.
 
         Returns:
             list: A serialized list of similar products.
         """
-        products = Product.objects.filter(
-            category__slug=product.category.slug,
-            is_available=True
-        ).exclude(id=product.id)
-        serializer = ProductSerializer(products, many=True)
+        products = get_similar_products(
+            product, ranking=self.context.get('similar_ranking')
+        )
+        serializer = ProductSerializer(
+            products, many=True, context=self.context
+        )
         return serializer.data
@@ -0,0 +1,156 @@
+"""
+Products App Signals
+
+This module keeps the derived catalog data in sync with the `Product` and
+`Category` tables. The receivers are connected in `StoreConfig.ready`.
+
+Bulk writes (`bulk_create`, `bulk_update`, `QuerySet.update`) do not send
+model signals; code performing them sends `products_changed` instead.
+"""
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from Category.models import Category
+from MyShop.cache import bump_generation
+from MyShop.images import schedule_variants
+from . import catalog, search, similar
+from .models import Product, ProductTombstone
+
+
+# Sent after products were written in bulk.
+# Arguments: `product_ids` (iterable), `fields` (set of changed field
+# names, or None when any field may have changed) and, when the write may
+# have moved products, `previous_category_ids` (iterable of the categories
+# they belonged to before it).
+products_changed = Signal()
+
+# Fields the search index and the similar-products candidates depend on.
+SEARCH_FIELDS = {'product_name', 'description', 'is_available'}
+SIMILAR_FIELDS = {'is_available', 'category', 'price'}
+
+
+@receiver(pre_save, sender=Product)
+def remember_previous_category(sender, instance, using, update_fields=None,
+                               **kwargs):
+    """
+    Records the category a saved product belongs to before the save.
+    """
+    instance._previous_category_id = None
+    if instance._state.adding or (
+        update_fields is not None and 'category' not in update_fields
+    ):
+        return
+    instance._previous_category_id = Product.objects.using(using).filter(
+        pk=instance.pk
+    ).values_list('category_id', flat=True).first()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_similar_products(sender, instance, **kwargs):
+    """
+    Drops the cached similar-product candidates of the product's category,
+    and of its previous category when the product moved.
+    """
+    similar.invalidate_category(instance.category_id)
+    previous = getattr(instance, '_previous_category_id', None)
+    if previous is not None and previous != instance.category_id:
+        similar.invalidate_category(previous)
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    """
+    Refreshes the product's entry in the search index.
+    """
+    search.get_backend().index_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    """
+    Removes the deleted product from the search index.
+    """
+    search.get_backend().remove_product(instance.id)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_catalog_cache(sender, instance, **kwargs):
+    """
+    Invalidates the cached catalog responses and, once committed, has the
+    catalog snapshot of this process reload the product.
+    """
+    bump_generation(
+        instance.date_modified, changes={'products': [instance.id]}
+    )
+    transaction.on_commit(catalog.recheck)
+
+
+@receiver(post_save, sender=Product)
+def generate_image_variants(sender, instance, update_fields=None, **kwargs):
+    """
+    Generates the resized copies of the product image, once committed.
+    """
+    if update_fields is None or 'image' in update_fields:
+        schedule_variants([instance.image.name])
+
+
+@receiver(post_delete, sender=Product)
+def record_tombstone(sender, instance, **kwargs):
+    """
+    Records the deletion for delta sync clients.
+    """
+    ProductTombstone.objects.create(product_id=instance.id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def recheck_snapshot_category(sender, instance, **kwargs):
+    """
+    Has the catalog snapshot of this process reload the category, once
+    committed. The generation is bumped by `Category.signals`.
+    """
+    transaction.on_commit(catalog.recheck)
+
+
+def prepare_search_backend(sender, using, **kwargs):
+    """
+    Creates the search index structures once the tables exist. Connected
+    to `post_migrate` in `StoreConfig.ready`.
+    """
+    if using == DEFAULT_DB_ALIAS:
+        search.get_backend().prepare()
+
+
+@receiver(products_changed)
+def sync_changed_products(sender, product_ids, fields=None,
+                          previous_category_ids=(), **kwargs):
+    """
+    Brings the caches, the catalog snapshot and the search index up to date
+    after a bulk write.
+    """
+    product_ids = list(product_ids)
+    bump_generation(changes={'products': product_ids})
+    transaction.on_commit(catalog.recheck)
+    records = catalog.load_records(product_ids)
+
+    if fields is None or fields & SIMILAR_FIELDS:
+        category_ids = {r.category_id for r in records.values() if r}
+        for category_id in category_ids | set(previous_category_ids):
+            similar.invalidate_category(category_id)
+
+    if fields is None or 'image' in fields:
+        schedule_variants(
+            Product.objects.using(DEFAULT_DB_ALIAS).filter(id__in=product_ids)
+            .exclude(image='').values_list('image', flat=True)
+        )
+
+    if fields is None or fields & SEARCH_FIELDS:
+        backend = search.get_backend()
+        for product_id, record in records.items():
+            if record is None:
+                backend.remove_product(product_id)
+            else:
+                backend.index_product(record)
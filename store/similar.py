@@ -0,0 +1,157 @@
+"""
+Similar Products Engine
+
+This module picks the products shown under "similar products" on the
+product detail page.
+
+Candidates are the available products of a category. They are loaded
+once per category, kept in the catalog cache (see `MyShop.cache`) so
+every process shares them, and dropped by the `Product` save/delete
+signals in `store.signals`, so a detail request only ranks cached ids and
+then loads at most `limit` products.
+
+Ranking modes:
+- `recent`: Newest products first (the catalog's default ordering).
+- `price`: Products whose price is closest to the current product.
+"""
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from MyShop.cache import get_cache
+from .models import Product
+
+
+RANKING_RECENT = 'recent'
+RANKING_PRICE = 'price'
+RANKINGS = (RANKING_RECENT, RANKING_PRICE)
+
+CACHE_KEY = 'store:similar:{category_id}'
+
+
+def get_candidates(category_id):
+    """
+    Returns the cached similar-product candidates of a category.
+
+    Args:
+        category_id (int): The category to load candidates for.
+
+    Returns:
+        dict: `recent` holds product ids newest first; `by_price` holds
+        `(price, id)` pairs sorted by price.
+    """
+    key = CACHE_KEY.format(category_id=category_id)
+    cache = get_cache()
+    candidates = cache.get(key)
+    if candidates is None:
+        # Read from the primary: candidates are loaded right after an
+        # invalidation, when replicas may still lag.
+        rows = list(
+            Product.objects.available().using(DEFAULT_DB_ALIAS)
+            .filter(category_id=category_id)
+            .values_list('id', 'price')
+        )
+        candidates = {
+            'recent': tuple(product_id for product_id, _ in rows),
+            'by_price': tuple(sorted((price, pk) for pk, price in rows)),
+        }
+        cache.set(key, candidates, settings.SIMILAR_PRODUCTS_CACHE_TIMEOUT)
+    return candidates
+
+
+def invalidate_category(category_id):
+    """
+    Drops the cached candidates of a category once the current
+    transaction commits, or at once outside a transaction.
+
+    Dropping them before the commit would let a concurrent request refill
+    the cache from the old rows.
+
+    Args:
+        category_id (int): The category whose products changed.
+    """
+    key = CACHE_KEY.format(category_id=category_id)
+    transaction.on_commit(lambda: get_cache().delete(key))
+
+
+def _closest_by_price(by_price, product, limit):
+    """
+    Walks outwards from the product's price until `limit` ids are found.
+    """
+    right = bisect_left(by_price, (product.price, product.id))
+    left = right - 1
+    ids = []
+    while len(ids) < limit and (left >= 0 or right < len(by_price)):
+        take_left = right >= len(by_price) or (
+            left >= 0 and
+            product.price - by_price[left][0] <=
+            by_price[right][0] - product.price
+        )
+        if take_left:
+            candidate = by_price[left][1]
+            left -= 1
+        else:
+            candidate = by_price[right][1]
+            right += 1
+        if candidate != product.id:
+            ids.append(candidate)
+    return ids
+
+
+def similar_product_ids(product, limit=None, ranking=None):
+    """
+    Ranks the similar products of a product without touching the database
+    once the category candidates are cached.
+
+    Args:
+        product (Product): The product being viewed.
+        limit (int, optional): Maximum number of ids to return. Defaults to
+            `settings.SIMILAR_PRODUCTS_LIMIT`.
+        ranking (str, optional): One of `RANKINGS`. Defaults to
+            `settings.SIMILAR_PRODUCTS_RANKING`.
+
+    Returns:
+        list: Product ids, best match first.
+    """
+    if limit is None:
+        limit = settings.SIMILAR_PRODUCTS_LIMIT
+    if ranking not in RANKINGS:
+        ranking = settings.SIMILAR_PRODUCTS_RANKING
+    candidates = get_candidates(product.category_id)
+
+    if ranking == RANKING_PRICE:
+        return _closest_by_price(candidates['by_price'], product, limit)
+
+    ids = []
+    for candidate in candidates['recent']:
+        if len(ids) == limit:
+            break
+        if candidate != product.id:
+            ids.append(candidate)
+    return ids
+
+
+def get_similar_products(product, limit=None, ranking=None):
+    """
+    Loads the similar products of a product, ready for `ProductSerializer`.
+
+    Args:
+        product (Product): The product being viewed.
+        limit (int, optional): Maximum number of products to return.
+        ranking (str, optional): One of `RANKINGS`.
+
+    Returns:
+        list: Product instances in ranking order.
+    """
+    ids = similar_product_ids(product, limit, ranking)
+    # Re-check availability and category so a product changed by another
+    # process before the cache was dropped is never shown.
+    products = (
+        Product.objects.available()
+        .for_listing()
+        .filter(category_id=product.category_id)
+        .order_by()
+        .in_bulk(ids)
+    )
+    return [products[pk] for pk in ids if pk in products]
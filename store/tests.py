@@ -1,3 +1,1123 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from PIL import Image as PILImage
+from django.core.cache import cache, caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from Category.models import Category
+from MyShop import images, metrics
+from MyShop.db import database_settings
+from MyShop.middleware import RequestProfile, _current_profile
+from MyShop.renderers import ORJSONParser, ORJSONRenderer
+from MyShop.routers import ReplicaRouter, pin_to_primary
+from cart.models import Cart
+from MyShop.slugs import unique_slugs
+from . import catalog, search, similar
+from .benchmarks import (
+    SCENARIOS, benchmark_data, find_regressions, run_scenario,
+)
+from .models import Product, ProductTombstone
+from .pagination import PAGE_SIZE
+from .seeding import seed_carts, seed_catalog
+from .serializers import ProductSerializer, product_rows
+
+
+def clear_caches():
+    """
+    Empties the default and catalog response caches and the catalog
+    snapshot.
+    """
+    cache.clear()
+    caches['catalog'].clear()
+    catalog.reset()
+
+
+def create_products(category, count, prefix='product'):
+    """
+    Creates `count` available products in `category`.
+    """
+    return [
+        Product.objects.create(
+            product_name=f'{prefix} {category.slug} {index}',
+            price=100 + index,
+            stock=10,
+            category=category,
+        )
+        for index in range(count)
+    ]
+
+
+class ProductListQueryCountTests(TestCase):
+    """
+    Guards the product listing endpoints against N+1 queries.
+
+    Every listing page costs one COUNT query plus one SELECT, whether
+    the page holds a single product or a full page of them.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.small = Category.objects.create(
+            category_name='Small', description='One product'
+        )
+        cls.large = Category.objects.create(
+            category_name='Large', description='Many products'
+        )
+        create_products(cls.small, 1)
+        create_products(cls.large, 20)
+
+    def setUp(self):
+        clear_caches()
+
+    def assert_constant_queries(self, url, expected=2):
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_product_list(self):
+        response = self.assert_constant_queries(reverse('product_list'))
+        self.assertEqual(len(response.data['results']), 6)
+        self.assertEqual(
+            set(response.data['results'][0]['category']),
+            {'id', 'category_name', 'slug'}
+        )
+
+    def test_product_list_by_category_is_independent_of_page_size(self):
+        for category, size in ((self.small, 1), (self.large, 6)):
+            url = reverse('product_list_by_category', args=[category.slug])
+            response = self.assert_constant_queries(url)
+            self.assertEqual(len(response.data['results']), size)
+
+    def test_query_search(self):
+        url = reverse('query_search') + '?query=large'
+        response = self.assert_constant_queries(url)
+        self.assertEqual(response.data['count'], 20)
+
+    def test_similar_products(self):
+        product = self.large.products.first()
+        url = reverse(
+            'product_details', args=[self.large.slug, product.slug]
+        )
+        # Product, cached similar-product candidates, similar products.
+        response = self.assert_constant_queries(url, expected=3)
+        self.assertEqual(len(response.data['similar_products']), 6)
+
+
+@override_settings(SIMILAR_PRODUCTS_LIMIT=3)
+class SimilarProductsTests(TestCase):
+    """
+    Tests the bounded, cached similar-products engine.
+    """
+
+    def setUp(self):
+        clear_caches()
+        self.category = Category.objects.create(
+            category_name='Shirts', description='Shirts'
+        )
+        self.products = create_products(self.category, 8)
+        self.product = self.products[4]
+
+    def detail_url(self, product):
+        return reverse(
+            'product_details', args=[self.category.slug, product.slug]
+        )
+
+    def test_limit_and_recent_ranking(self):
+        response = self.client.get(self.detail_url(self.product))
+        ids = [item['id'] for item in response.data['similar_products']]
+        self.assertEqual(
+            ids, [self.products[7].id, self.products[6].id,
+                  self.products[5].id]
+        )
+
+    def test_price_ranking(self):
+        ids = similar.similar_product_ids(
+            self.product, ranking=similar.RANKING_PRICE
+        )
+        self.assertEqual(
+            ids, [self.products[3].id, self.products[5].id,
+                  self.products[2].id]
+        )
+
+    def test_candidates_are_cached(self):
+        self.client.get(self.detail_url(self.product))
+        with self.assertNumQueries(2):
+            self.client.get(self.detail_url(self.products[0]))
+
+    def test_save_and_delete_invalidate_candidates(self):
+        similar.get_candidates(self.category.id)
+        self.products[7].is_available = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[7].save()
+            self.products[6].delete()
+        ids = similar.similar_product_ids(self.product)
+        self.assertEqual(
+            ids, [self.products[5].id, self.products[3].id,
+                  self.products[2].id]
+        )
+
+    def test_invalidation_waits_for_commit(self):
+        similar.get_candidates(self.category.id)
+        key = similar.CACHE_KEY.format(category_id=self.category.id)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.products[7].is_available = False
+            self.products[7].save()
+        self.assertIsNotNone(caches['catalog'].get(key))
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(caches['catalog'].get(key))
+
+    def test_moving_a_product_invalidates_both_categories(self):
+        other = Category.objects.create(
+            category_name='Shoes', description='Shoes'
+        )
+        similar.get_candidates(self.category.id)
+        similar.get_candidates(other.id)
+        self.products[7].category = other
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[7].save()
+        self.assertNotIn(
+            self.products[7].id,
+            similar.get_candidates(self.category.id)['recent'],
+        )
+        self.assertIn(
+            self.products[7].id, similar.get_candidates(other.id)['recent']
+        )
+
+
+class SearchBackendTestMixin:
+    """
+    Shared search tests, run against every backend.
+    """
+    backend_path = None
+
+    def setUp(self):
+        clear_caches()
+        search._backends.clear()
+        self.settings_override = override_settings(
+            STORE_SEARCH_BACKEND=self.backend_path
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.addCleanup(search._backends.clear)
+
+        category = Category.objects.create(
+            category_name='Clothes', description='Clothes'
+        )
+        self.shirt = Product.objects.create(
+            product_name='Blue Shirt', description='Cotton shirt',
+            price=10, stock=1, category=category
+        )
+        self.tshirt = Product.objects.create(
+            product_name='Blue Tee', description='Shirt made of cotton',
+            price=10, stock=1, category=category
+        )
+        self.shoe = Product.objects.create(
+            product_name='Red Shoe', description='Leather',
+            price=10, stock=1, category=category
+        )
+        self.backend = search.get_backend()
+
+    def test_prefix_matching_and_ranking(self):
+        self.assertEqual(
+            self.backend.search('shi'), [self.shirt.id, self.tshirt.id]
+        )
+        self.assertCountEqual(self.backend.search('blue cott'), [
+            self.shirt.id, self.tshirt.id
+        ])
+        self.assertEqual(self.backend.search('red shirt'), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.backend.search('shoe')
+        self.shoe.product_name = 'Red Sneaker'
+        self.shoe.save()
+        self.shirt.is_available = False
+        self.shirt.save()
+        self.tshirt.delete()
+        self.assertEqual(self.backend.search('sneak'), [self.shoe.id])
+        self.assertEqual(self.backend.search('shirt'), [])
+
+    def test_search_endpoint_returns_ranked_page(self):
+        response = self.client.get(reverse('query_search') + '?query=shirt')
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(
+            [product['id'] for product in response.data['results']],
+            [self.shirt.id, self.tshirt.id]
+        )
+
+
+class InMemorySearchBackendTests(SearchBackendTestMixin, TestCase):
+    backend_path = 'store.search.InMemorySearchBackend'
+
+
+class DatabaseSearchBackendTests(SearchBackendTestMixin, TestCase):
+    backend_path = 'store.search.DatabaseSearchBackend'
+
+
+class ProductPaginationTests(TestCase):
+    """
+    Tests the page-number and cursor pagination modes.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(
+            category_name='Hats', description='Hats'
+        )
+        cls.products = create_products(cls.category, 15)
+
+    def setUp(self):
+        clear_caches()
+
+    def collect(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids.extend(product['id'] for product in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_cursor_walks_every_product_once(self):
+        ids = self.collect(
+            reverse('product_list') + '?pagination=cursor&page_size=4'
+        )
+        self.assertEqual(
+            ids, [product.id for product in reversed(self.products)]
+        )
+
+    def test_cursor_page_is_one_query(self):
+        url = reverse('product_list') + '?pagination=cursor'
+        first = self.client.get(url)
+        with self.assertNumQueries(1):
+            self.client.get(first.data['next'])
+
+    def test_cursor_on_search_results(self):
+        search._backends.clear()
+        url = reverse('query_search') + '?query=hats&pagination=cursor'
+        self.assertEqual(len(self.collect(url)), 15)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('product_list') + '?cursor=xyz')
+        self.assertEqual(response.status_code, 404)
+
+    def test_page_size_is_capped(self):
+        create_products(self.category, 100, prefix='extra')
+        response = self.client.get(reverse('product_list') + '?page_size=500')
+        self.assertEqual(len(response.data['results']), 100)
+
+    def test_page_number_without_count(self):
+        url = reverse('product_list') + '?count=false&page_size=10'
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertIsNotNone(response.data['next'])
+        self.assertEqual(len(self.collect(url)), 15)
+
+
+class CatalogResponseCacheTests(TestCase):
+    """
+    Tests the versioned catalog response cache.
+    """
+
+    def setUp(self):
+        clear_caches()
+        self.category = Category.objects.create(
+            category_name='Bags', description='Bags'
+        )
+        self.products = create_products(self.category, 3)
+        self.url = reverse('product_list')
+
+    def test_second_request_is_served_from_cache(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.json(), second.json())
+
+    def test_product_save_invalidates(self):
+        self.client.get(self.url)
+        self.products[0].product_name = 'Renamed bag'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[0].save()
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertIn(
+            'Renamed bag',
+            [product['product_name'] for product in response.data['results']]
+        )
+
+    def test_invalidation_waits_for_commit(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.products[0].save()
+            self.assertEqual(self.client.get(self.url)['X-Cache'], 'HIT')
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.client.get(self.url)['X-Cache'], 'MISS')
+
+    def test_category_delete_invalidates(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.delete()
+        self.assertEqual(self.client.get(self.url).data['results'], [])
+
+    def test_conditional_get(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertEqual(
+            self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code,
+            304
+        )
+        # Dates have a one-second resolution, too coarse for a catalog
+        # changing several times a second.
+        self.assertEqual(
+            self.client.get(
+                self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+            ).status_code,
+            200
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[0].save()
+        self.assertEqual(
+            self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code,
+            200
+        )
+
+    def test_stats_endpoint(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        stats = self.client.get(reverse('cache_stats')).data
+        self.assertGreaterEqual(stats['hits'], 1)
+        self.assertGreaterEqual(stats['misses'], 1)
+
+
+class ProductSlugTests(TestCase):
+    """
+    Tests unique slug allocation for products.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(
+            category_name='Tops', description='Tops'
+        )
+
+    def create(self, name, slug=''):
+        return Product.objects.create(
+            product_name=name, slug=slug, price=1, stock=1,
+            category=self.category
+        )
+
+    def test_suffixes_do_not_compound(self):
+        names = ('Shirt', 'shirt!', 'SHIRT')
+        slugs = [self.create(name).slug for name in names]
+        self.assertEqual(slugs, ['shirt', 'shirt-1', 'shirt-2'])
+
+    def test_suffix_follows_highest_existing(self):
+        self.create('Shirt')
+        self.create('Shirt old', slug='shirt-7')
+        self.create('Shirt blue', slug='shirt-blue')
+        self.assertEqual(self.create('Shirt?').slug, 'shirt-8')
+
+    # The in-memory search index is only built by a search, so saves do
+    # not write to it.
+    @override_settings(
+        STORE_SEARCH_BACKEND='store.search.InMemorySearchBackend'
+    )
+    def test_slug_costs_one_query(self):
+        for index in range(5):
+            self.create(f'Shirt {"!" * index}')
+        # Slug lookup, savepoint, insert, release.
+        with self.assertNumQueries(4):
+            self.assertEqual(self.create('shirt...').slug, 'shirt-5')
+
+    def test_duplicate_name_still_fails(self):
+        self.create('Shirt')
+        with self.assertRaises(IntegrityError):
+            self.create('Shirt')
+
+    def test_bulk_allocation(self):
+        self.create('Shirt')
+        slugs = unique_slugs(Product, ['Shirt', 'Hat', 'shirt', 'Hat'])
+        self.assertEqual(slugs, ['shirt-1', 'hat', 'shirt-2', 'hat-1'])
+
+
+class CatalogImportExportTests(TestCase):
+    """
+    Tests the import_products and export_products commands.
+    """
+
+    def setUp(self):
+        clear_caches()
+        search._backends.clear()
+        self.category = Category.objects.create(
+            category_name='Shoes', description='Shoes'
+        )
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def path(self, name, content=None):
+        path = os.path.join(self.directory.name, name)
+        if content is not None:
+            with open(path, 'w') as stream:
+                stream.write(content)
+        return path
+
+    def test_csv_import_creates_and_updates(self):
+        Product.objects.create(
+            product_name='Runner', price=1, stock=1, category=self.category
+        )
+        search.get_backend().search('runner')
+        path = self.path('products.csv', (
+            'product_name,category,price,stock,available_colors,'
+            'available_sizes,is_available\n'
+            'Runner,shoes,5000,3,"Red, Blue",,yes\n'
+            'Boot,Shoes,9000,2,,"42, 43",true\n'
+            'Sandal,hats,100,1,,,true\n'
+            'Loafer,shoes,cheap,1,,,true\n'
+        ))
+        out, err = StringIO(), StringIO()
+        call_command('import_products', path, '--chunk-size', '1',
+                     stdout=out, stderr=err)
+
+        self.assertIn('Created 1, updated 1, skipped 2', out.getvalue())
+        self.assertIn("Line 4: unknown category 'hats'", err.getvalue())
+        runner = Product.objects.get(product_name='Runner')
+        self.assertEqual((runner.price, runner.stock), (5000, 3))
+        self.assertEqual(runner.available_colors, ['Red', 'Blue'])
+        boot = Product.objects.get(product_name='Boot')
+        self.assertEqual((boot.slug, boot.available_sizes),
+                         ('boot', ['42', '43']))
+        self.assertEqual(search.get_backend().search('boot'), [boot.id])
+
+    def test_jsonl_round_trip(self):
+        Product.objects.create(
+            product_name='Clog', price=10, stock=4, category=self.category,
+            available_colors=['Green'],
+        )
+        path = self.path('products.jsonl')
+        call_command('export_products', path, stdout=StringIO())
+        with open(path) as stream:
+            rows = [json.loads(line) for line in stream]
+        self.assertEqual(rows[0]['category'], 'shoes')
+        self.assertEqual(rows[0]['available_colors'], ['Green'])
+
+        Product.objects.all().delete()
+        call_command('import_products', path, stdout=StringIO())
+        clog = Product.objects.get()
+        self.assertEqual(
+            (clog.product_name, clog.price, clog.available_colors),
+            ('Clog', 10, ['Green'])
+        )
+
+    def test_jsonl_errors_name_physical_lines(self):
+        path = self.path('products.jsonl', (
+            '\n'
+            '{"product_name": "Clog", "category": "shoes", "price": 1, '
+            '"stock": 1}\n'
+            '\n'
+            '{"product_name": \n'
+        ))
+        err = StringIO()
+        call_command('import_products', path, stdout=StringIO(), stderr=err)
+        self.assertIn('Line 4: invalid JSON', err.getvalue())
+
+
+class ProductFeedTests(TestCase):
+    """
+    Tests the NDJSON product feed.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shoes = Category.objects.create(
+            category_name='Shoes', description='Shoes'
+        )
+        cls.hats = Category.objects.create(
+            category_name='Hats', description='Hats'
+        )
+        cls.shoe = create_products(cls.shoes, 3)
+        cls.hat = create_products(cls.hats, 2)
+        cls.hat[1].is_available = False
+        cls.hat[1].save()
+
+    def feed(self, **params):
+        response = self.client.get(reverse('product_feed'), params)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return [
+            json.loads(line)
+            for line in b''.join(response.streaming_content).splitlines()
+        ]
+
+    def test_streams_available_products(self):
+        rows = self.feed()
+        self.assertEqual(
+            [row['id'] for row in rows],
+            [p.id for p in self.shoe] + [self.hat[0].id]
+        )
+        self.assertEqual(rows[0]['category'], 'shoes')
+        self.assertIsNone(rows[0]['image'])
+
+    def test_filters(self):
+        self.assertEqual(len(self.feed(category='hats')), 1)
+        later = timezone.now() + timedelta(minutes=1)
+        Product.objects.filter(pk=self.shoe[0].pk).update(
+            date_modified=later + timedelta(minutes=1)
+        )
+        since = later.isoformat()
+        self.assertEqual(
+            [row['id'] for row in self.feed(since=since)],
+            [self.shoe[0].id]
+        )
+
+    def test_invalid_since(self):
+        response = self.client.get(reverse('product_feed'), {'since': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ProductDeltaTests(TestCase):
+    """
+    Tests the product delta sync endpoint.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(
+            category_name='Shoes', description='Shoes'
+        )
+        cls.products = create_products(cls.category, 3)
+
+    def delta(self, **params):
+        return self.client.get(reverse('product_delta'), params)
+
+    def test_without_watermark_returns_everything(self):
+        response = self.delta()
+        self.assertTrue(response.data['reset'])
+        self.assertEqual(len(response.data['updated']), 3)
+        self.assertEqual(response.data['deleted'], [])
+
+    def test_returns_changes_since_watermark(self):
+        watermark = self.delta().data['watermark']
+        changed, hidden, removed = self.products
+        changed.price = 999
+        changed.save()
+        hidden.is_available = False
+        hidden.save()
+        removed_id = removed.id
+        removed.delete()
+
+        with self.assertNumQueries(3):
+            response = self.delta(since=watermark)
+        self.assertFalse(response.data['reset'])
+        self.assertEqual(
+            [(p['id'], p['price']) for p in response.data['updated']],
+            [(changed.id, 999)]
+        )
+        self.assertCountEqual(
+            response.data['deleted'], [hidden.id, removed_id]
+        )
+
+        # Consecutive deltas overlap by the watermark margin.
+        response = self.delta(since=response.data['watermark'])
+        self.assertEqual(
+            [p['id'] for p in response.data['updated']], [changed.id]
+        )
+        with self.settings(DELTA_WATERMARK_MARGIN_SECONDS=0):
+            watermark = self.delta(since=watermark).data['watermark']
+        response = self.delta(since=watermark)
+        self.assertEqual(response.data['updated'], [])
+        self.assertEqual(response.data['deleted'], [])
+
+    def test_watermark_covers_open_transactions(self):
+        with self.settings(DELTA_WATERMARK_MARGIN_SECONDS=60):
+            watermark = self.delta().data['watermark']
+        # Stamped before the delta ran, but committed after it.
+        Product.objects.filter(pk=self.products[0].pk).update(
+            price=999, date_modified=timezone.now() - timedelta(seconds=30)
+        )
+        response = self.delta(since=watermark)
+        self.assertIn(
+            (self.products[0].id, 999),
+            [(p['id'], p['price']) for p in response.data['updated']]
+        )
+
+    def test_stale_watermark_resets(self):
+        stale = timezone.now() - timedelta(days=365)
+        response = self.delta(since=stale.isoformat())
+        self.assertTrue(response.data['reset'])
+        self.assertEqual(len(response.data['updated']), 3)
+
+    def test_invalid_watermark(self):
+        self.assertEqual(self.delta(since='yesterday').status_code, 400)
+
+    def test_prune_tombstones(self):
+        self.products[0].delete()
+        ProductTombstone.objects.update(
+            deleted_at=timezone.now() - timedelta(days=60)
+        )
+        call_command('prune_tombstones', stdout=StringIO())
+        self.assertFalse(ProductTombstone.objects.exists())
+
+
+class AsyncCatalogViewTests(TestCase):
+    """
+    Checks that the async catalog views return what the sync views do.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(
+            category_name='Shoes', description='Shoes'
+        )
+        cls.products = create_products(cls.category, 8)
+
+    def setUp(self):
+        clear_caches()
+
+    async def assertSameResponse(self, sync_url, async_url):
+        expected = await sync_to_async(self.client.get)(sync_url)
+        response = await self.async_client.get(async_url)
+        self.assertEqual(response.status_code, expected.status_code)
+        # Pagination links point at the async endpoint itself.
+        self.assertEqual(
+            json.loads(response.content.decode().replace('/async/', '/')),
+            expected.json()
+        )
+
+    async def test_product_list(self):
+        await self.assertSameResponse('/store/', '/async/store/')
+        await self.assertSameResponse(
+            '/store/shoes/?page=2', '/async/store/shoes/?page=2'
+        )
+        await self.assertSameResponse(
+            '/store/?page=9', '/async/store/?page=9'
+        )
+
+    async def test_product_list_rejects_unsupported_pagination(self):
+        for query in ('pagination=cursor', 'cursor=abc', 'count=false'):
+            response = await self.async_client.get(f'/async/store/?{query}')
+            self.assertEqual(response.status_code, 400, query)
+
+    async def test_product_details(self):
+        slug = self.products[0].slug
+        await self.assertSameResponse(
+            f'/store/shoes/{slug}/', f'/async/store/shoes/{slug}/'
+        )
+        response = await self.async_client.get('/async/store/shoes/nope/')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_category_list(self):
+        await self.assertSameResponse('/categories/', '/async/categories/')
+
+
+class DatabaseProfileTests(SimpleTestCase):
+    """
+    Tests the env-driven database settings and the replica router.
+    """
+
+    def test_profiles(self):
+        base_dir = Path('/srv/shop')
+        dev = database_settings(base_dir, {})
+        self.assertEqual(dev['default']['NAME'], base_dir / 'db.sqlite3')
+        self.assertNotIn('OPTIONS', dev['default'])
+
+        sqlite = database_settings(base_dir, {'DB_PROFILE': 'sqlite'})
+        options = sqlite['default']['OPTIONS']
+        self.assertEqual(options['transaction_mode'], 'IMMEDIATE')
+        self.assertIn('journal_mode=WAL', options['init_command'])
+
+        postgres = database_settings(base_dir, {
+            'DB_PROFILE': 'postgres', 'DB_REPLICA_HOSTS': 'r1, r2',
+            'DB_POOL_MAX_SIZE': '20',
+        })
+        self.assertEqual(
+            list(postgres), ['default', 'replica_1', 'replica_2']
+        )
+        self.assertEqual(postgres['replica_2']['HOST'], 'r2')
+        self.assertEqual(postgres['default']['CONN_MAX_AGE'], 0)
+        self.assertEqual(
+            postgres['default']['OPTIONS']['pool']['max_size'], 20
+        )
+        self.assertEqual(
+            postgres['replica_1']['TEST'], {'MIRROR': 'default'}
+        )
+
+        with self.assertRaises(ValueError):
+            database_settings(base_dir, {'DB_PROFILE': 'oracle'})
+
+    def test_router_sends_catalog_reads_to_replicas(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Product), 'default')
+
+        router.replicas = ['replica_1']
+        self.assertEqual(router.db_for_read(Product), 'replica_1')
+        self.assertEqual(router.db_for_read(Category), 'replica_1')
+        self.assertEqual(router.db_for_read(Cart), 'default')
+        self.assertEqual(router.db_for_write(Product), 'default')
+        self.assertFalse(router.allow_migrate('replica_1', 'store'))
+
+        with pin_to_primary():
+            self.assertEqual(router.db_for_read(Product), 'default')
+        self.assertEqual(router.db_for_read(Product), 'replica_1')
+
+
+class ReplicaRouterTransactionTests(TestCase):
+    """
+    Tests that reads inside a transaction stay on the primary.
+    """
+
+    def test_router_keeps_transactional_reads_on_primary(self):
+        router = ReplicaRouter()
+        router.replicas = ['replica_1']
+        # Test cases run inside a transaction, like checkout does.
+        self.assertEqual(router.db_for_read(Product), 'default')
+
+
+class ProfilingMiddlewareTests(TestCase):
+    """
+    Tests the request profiling headers and metrics.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(
+            category_name='Shoes', description='Shoes'
+        )
+        create_products(cls.category, 3)
+
+    def setUp(self):
+        clear_caches()
+        metrics.reset()
+
+    def test_server_timing_and_metrics(self):
+        response = self.client.get(reverse('product_list'))
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^total;dur=[\d.]+, db;dur=[\d.]+;')
+        self.assertIn('desc="2 queries"', timing)
+
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn(
+            'myshop_request_duration_seconds_count'
+            '{view="product_list",method="GET",status="200"} 1', body
+        )
+        self.assertIn('myshop_db_queries_sum{view="product_list"} 2', body)
+        self.assertIn('myshop_catalog_cache_misses_total', body)
+
+    def test_duplicate_queries_are_counted(self):
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        try:
+            for product in Product.objects.all():
+                Category.objects.filter(pk=product.category_id).exists()
+        finally:
+            _current_profile.reset(token)
+        self.assertEqual(profile.query_count, 4)
+        self.assertEqual(profile.duplicate_count, 2)
+
+
+class BenchmarkTests(TestCase):
+    """
+    Tests the benchmark scenarios and the regression check.
+    """
+
+    def test_scenarios_run_without_errors(self):
+        seed_catalog(categories=3, products=600)
+        search.get_backend().rebuild()
+        data = benchmark_data(seed_carts(carts=5))
+        clear_caches()
+        scenario = next(s for s in SCENARIOS if s.name == 'store:search')
+        response = scenario.request(self.client, 0, data)
+        self.assertGreater(len(response.json()['results']), 0)
+        for scenario in SCENARIOS:
+            with self.subTest(scenario.name):
+                result = run_scenario(scenario, self.client, data, 3)
+                self.assertEqual(result['errors'], 0)
+                self.assertGreater(result['rps'], 0)
+
+    def test_catalog_requests_are_not_cache_hits(self):
+        seed_catalog(categories=3, products=60)
+        data = benchmark_data(seed_carts(carts=1))
+        clear_caches()
+        scenario = next(s for s in SCENARIOS if s.name == 'categories:list')
+        self.assertEqual(
+            run_scenario(scenario, self.client, data, 3)['queries'], 1
+        )
+        cached = run_scenario(scenario, self.client, data, 3,
+                              cache_responses=True)
+        self.assertLess(cached['queries'], 1)
+
+    def test_find_regressions(self):
+        baseline = {
+            'fast': {'p95': 10.0, 'queries': 2},
+            'slow': {'p95': 10.0, 'queries': 2},
+            'chatty': {'p95': 10.0, 'queries': 2},
+            'noisy': {'p95': 0.5, 'queries': 2},
+        }
+        results = {
+            'fast': {'p95': 11.0, 'queries': 2},
+            'slow': {'p95': 13.0, 'queries': 2},
+            'chatty': {'p95': 10.0, 'queries': 3},
+            'noisy': {'p95': 1.0, 'queries': 2},
+            'new': {'p95': 50.0, 'queries': 9},
+        }
+        regressions = find_regressions(results, baseline, threshold=0.2)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith('slow: p95'))
+        self.assertTrue(regressions[1].startswith('chatty: 2 -> 3'))
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    """
+    Tests the orjson renderer and parser against the DRF ones.
+    """
+
+    def test_matches_json_renderer(self):
+        data = {
+            'cart_code': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'price': Decimal('12.50'),
+            'name': gettext_lazy('Shoes'),
+            'note': 'caf\u00e9 \u2028',
+            1: [None, True, 1.5],
+        }
+        self.assertEqual(
+            ORJSONRenderer().render(data), JSONRenderer().render(data)
+        )
+
+    def test_datetimes_and_images(self):
+        data = {
+            'at': datetime(2024, 5, 1, 12, 30, tzinfo=dt_timezone.utc),
+            'image': Product(image='products/a.jpg').image,
+            'missing': Product().image,
+        }
+        self.assertEqual(
+            ORJSONRenderer().render(data),
+            b'{"at":"2024-05-01T12:30:00Z",'
+            b'"image":"/media/products/a.jpg","missing":null}',
+        )
+
+    def test_parser(self):
+        parser = ORJSONParser()
+        self.assertEqual(
+            parser.parse(BytesIO(b'{"quantity": 2}')), {'quantity': 2}
+        )
+        with self.assertRaises(ParseError):
+            parser.parse(BytesIO(b'{"quantity":'))
+
+
+class CompiledProductSerializerTests(TestCase):
+    """
+    Tests that `product_rows` renders exactly like `ProductSerializer`.
+    """
+
+    def test_output_is_byte_identical(self):
+        seed_catalog(categories=3, products=50)
+        Product.objects.filter(id__lte=10).update(
+            image='photos/products/a b.jpg'
+        )
+        Product.objects.filter(id=11).update(
+            description='caf\u00e9 \u2028 "quoted"'
+        )
+        request = RequestFactory().get('/store/')
+        renderer = JSONRenderer()
+        products = Product.objects.order_by('id')
+        for context in ({}, {'request': request}):
+            with self.subTest(context=context):
+                expected = ProductSerializer(
+                    products.select_related('category'), many=True,
+                    context=context,
+                ).data
+                rows = product_rows.many(
+                    products.values(*product_rows.values), context
+                )
+                self.assertEqual(
+                    renderer.render(rows), renderer.render(expected)
+                )
+
+    def test_listing_serves_compiled_rows(self):
+        seed_catalog(categories=2, products=20)
+        clear_caches()
+        response = self.client.get(
+            reverse('product_list'), {'pagination': 'cursor'}
+        )
+        expected = ProductSerializer(
+            Product.objects.available().for_listing()[:PAGE_SIZE], many=True
+        ).data
+        self.assertEqual(response.json()['results'], expected)
+        next_page = self.client.get(response.json()['next'])
+        self.assertEqual(next_page.status_code, 200)
+
+
+class ProductFieldsetTests(TestCase):
+    """
+    Tests the `fields` and `expand` parameters of the product endpoints.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(
+            category_name='Shoes', description='Shoes'
+        )
+        cls.products = create_products(cls.category, 3)
+
+    def setUp(self):
+        clear_caches()
+
+    def test_fields_narrow_output_and_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('product_list'), {
+                'fields': 'id,product_name,price,image', 'count': 'false',
+            })
+        self.assertEqual(
+            list(response.json()['results'][0]),
+            ['id', 'product_name', 'price', 'image'],
+        )
+        sql = queries[-1]['sql']
+        self.assertNotIn('description', sql)
+        self.assertNotIn('JOIN', sql)
+
+    def test_expand_renders_relations_as_ids(self):
+        response = self.client.get(reverse('product_list'), {'expand': ''})
+        product = response.json()['results'][0]
+        self.assertEqual(product['category'], self.category.id)
+        self.assertIn('description', product)
+
+        response = self.client.get(
+            reverse('product_list'), {'expand': 'category'}
+        )
+        self.assertEqual(
+            response.json()['results'][0]['category']['slug'],
+            self.category.slug,
+        )
+
+    def test_equivalent_fieldsets_share_a_variant(self):
+        variant = product_rows.narrow(('price', 'id', 'price'))
+        self.assertIs(product_rows.narrow(['id', 'price']), variant)
+        self.assertEqual(variant.fields, ('id', 'price'))
+        response = self.client.get(
+            reverse('product_list'), {'fields': 'price,id,price'}
+        )
+        self.assertEqual(
+            list(response.json()['results'][0]), ['id', 'price']
+        )
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get(
+            reverse('product_list'), {'fields': 'id,secret'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Unknown fields: secret'})
+
+    def test_details_skip_similar_products(self):
+        product = self.products[0]
+        url = reverse('product_details', args=[
+            self.category.slug, product.slug
+        ])
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'fields': 'id,price'})
+        self.assertEqual(
+            response.json(), {'id': product.id, 'price': product.price}
+        )
+
+
+class ImageVariantTests(TestCase):
+    """
+    Tests the generation and listing of resized product images.
+    """
+
+    def setUp(self):
+        clear_caches()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(
+            MEDIA_ROOT=directory.name, IMAGE_VARIANT_WORKERS=0,
+            IMAGE_VARIANT_WIDTHS=(100, 400), IMAGE_VARIANT_FORMATS=(
+                'webp', 'jpeg',
+            ),
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.category = Category.objects.create(
+            category_name='Shoes', description='Shoes'
+        )
+
+    def upload(self, name='shoe.png', size=(300, 150)):
+        buffer = BytesIO()
+        PILImage.new('RGBA', size, (200, 30, 30, 128)).save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue())
+
+    def variant_width(self, name):
+        with default_storage.open(name) as stream:
+            return PILImage.open(stream).width
+
+    def test_variant_names_keep_the_original_extension(self):
+        self.assertEqual(
+            images.variant_name('photos/shoe.jpg', 320, 'webp'),
+            'photos/shoe.jpg.320w.webp'
+        )
+        self.assertNotEqual(
+            images.variant_name('photos/shoe.jpg', 320, 'webp'),
+            images.variant_name('photos/shoe.png', 320, 'webp'),
+        )
+
+    def test_saving_generates_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(
+                product_name='Runner', price=1, stock=1,
+                category=self.category, image=self.upload(),
+            )
+        name = product.image.name
+        self.assertEqual(
+            self.variant_width(images.variant_name(name, 100, 'webp')), 100
+        )
+        # Never upscaled.
+        self.assertEqual(
+            self.variant_width(images.variant_name(name, 400, 'jpeg')), 300
+        )
+
+        data = self.client.get(reverse('product_list')).json()['results'][0]
+        self.assertEqual(
+            data['image_variants']['webp']['100'],
+            default_storage.url(images.variant_name(name, 100, 'webp')),
+        )
+        self.assertEqual(list(data['image_variants']), ['webp', 'jpeg'])
+
+    def test_backfill_command(self):
+        product = Product.objects.create(
+            product_name='Runner', price=1, stock=1, category=self.category,
+        )
+        name = default_storage.save('photos/products/old.png', self.upload())
+        Product.objects.filter(pk=product.pk).update(image=name)
+
+        out = StringIO()
+        call_command('generate_image_variants', workers=2, stdout=out)
+        self.assertIn(
+            'Generated variants of 1 images; 0 were up', out.getvalue()
+        )
+        self.assertTrue(default_storage.exists(
+            images.variant_name(name, 400, 'webp')
+        ))
+        call_command('generate_image_variants', stdout=out)
+        self.assertIn('of 0 images; 1 were up to date', out.getvalue())
@@ -5,8 +5,15 @@ This module defines URL patterns for the Products app.
 
 Routes:
 - `/` → List all products or filter by category (optional).
+- `/search/` → Search products.
+- `/catalog-stats/` → Report the state of the in-memory catalog snapshot.
+- `/feed/` → Stream every available product as NDJSON.
+- `/delta/` → Products changed since a watermark.
 - `/<category_slug>/` → List products within a specific category.
 - `/<category_slug>/<product_slug>/` → Retrieve details of a specific product.
+
+The fixed routes come first and shadow categories of the same slug, so
+their names are listed in `Category.RESERVED_SLUGS`.
 """
 
 from . import views
@@ -20,6 +27,9 @@ urlpatterns = [
         views.query_product_list,
         name='query_search'
     ),
+    path('catalog-stats/', views.catalog_stats, name='catalog_stats'),
+    path('feed/', views.product_feed, name='product_feed'),
+    path('delta/', views.product_delta, name='product_delta'),
     path(
         '<slug:category_slug>/',
         views.product_list,
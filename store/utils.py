@@ -0,0 +1,28 @@
+"""
+Products App Utilities
+
+Helpers shared by the admin form and the catalog import commands.
+"""
+
+
+def split_comma_separated(value):
+    """
+    Converts comma-separated text into a list of trimmed, non-empty values.
+
+    Lists are accepted as well and cleaned the same way, so JSON input can
+    provide either form.
+
+    Example:
+        - "Red, Blue,,Green " → ["Red", "Blue", "Green"]
+
+    Args:
+        value (str or list): The raw value.
+
+    Returns:
+        list: The cleaned values.
+    """
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    return [str(item).strip() for item in value if str(item).strip()]
@@ -6,19 +6,44 @@ This module defines API views for retrieving product information in the eCommerc
 The available views are:
 - `product_list`: Retrieves a paginated list of available products. Optionally filters products by category.
 - `product_details`: Retrieves detailed information about a specific product.
+- `query_product_list`: Searches products through the configured search backend.
+- `catalog_stats`: Reports the state of the in-memory catalog snapshot.
+- `product_feed`: Streams every available product as NDJSON.
+- `product_delta`: Returns the products changed since a watermark.
+- `async_product_list`, `async_product_details`: Async variants of the
+  listing and detail views for ASGI deployments (see `MyShop.async_urls`).
 
 These views interact with the `Product` model and its associated serializers to return product data as JSON responses.
 """
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_GET
 from rest_framework.decorators import api_view
-from .models import Product
-from .serializers import ProductSerializer, ProductDetailSerializer
+from .models import Product, ProductTombstone
+from .search import get_backend
+from .serializers import (
+    ProductSerializer, ProductDetailSerializer, product_rows,
+)
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
+from MyShop.cache import cache_response
+from MyShop.delta import (
+    InvalidWatermark, delta_response_data, get_delta_window,
+)
+from MyShop.fieldsets import (
+    InvalidFieldset, get_fieldset, narrow_serializer,
+)
+from . import catalog
+from .pagination import apaginate, get_product_paginator
 # Create your views here.
 
 
 @api_view(['GET'])
+@cache_response
 def product_list(request, category_slug=None):
     """
     Retrieves a paginated list of available products.
@@ -32,24 +57,35 @@ def product_list(request, category_slug=None):
     Returns:
         Response: A paginated JSON response containing the list of serialized products.
     
+    Responses are cached until the catalog changes (see `MyShop.cache`).
+
     Pagination:
-        This view supports pagination using the `PageNumberPagination` class.
-        The number of products per page is set to 6.
+        Page-number pagination with 6 products per page by default. Pass
+        `?pagination=cursor` for keyset pagination, `page_size` to change
+        the page size (up to 100) and `count=false` to skip the total
+        count. See `store.pagination`.
+
+    Fieldsets:
+        `fields` keeps only some product fields and `expand=` (empty)
+        renders the category as its id; only the columns needed are read.
+        See `MyShop.fieldsets`.
     """
+    try:
+        serializer = narrow_serializer(request, product_rows)
+    except InvalidFieldset as error:
+        return Response({'error': str(error)}, status=400)
+    products = Product.objects.available().listing_rows(serializer.values)
     if category_slug:
-        products = Product.objects.filter(
-            category__slug=category_slug, is_available=True
-        )
-    else:
-        products = Product.objects.filter(is_available=True)
-    paginator = PageNumberPagination()
-    paginator.page_size = 6
+        products = products.filter(category__slug=category_slug)
+    paginator = get_product_paginator(request)
     paginated_products = paginator.paginate_queryset(products, request)
-    serializer = ProductSerializer(paginated_products, many=True)
-    return paginator.get_paginated_response(serializer.data)
+    return paginator.get_paginated_response(
+        serializer.many(paginated_products)
+    )
 
 
 @api_view(['GET'])
+@cache_response
 def product_details(request, category_slug, product_slug):
     """
     Retrieves detailed information about a specific product.
@@ -59,27 +95,245 @@ def product_details(request, category_slug, product_slug):
         category_slug (str): The slug of the category the product belongs to.
         product_slug (str): The slug of the product.
 
+    Query parameters:
+        similar_ranking (str, optional): How similar products are ranked,
+            `recent` or `price` (closest price first).
+        fields (str, optional): Comma-separated fields to render; only
+            their columns are loaded, and similar products are only
+            looked up when requested.
+
     Returns:
         Response: A JSON response containing the serialized details of the product.
     
     If the product does not exist in the specified category, a 404 error is raised.
+    Responses are cached until the catalog changes (see `MyShop.cache`).
     """
+    try:
+        fields, _ = get_fieldset(request, ProductDetailSerializer.Meta.fields)
+    except InvalidFieldset as error:
+        return Response({'error': str(error)}, status=400)
     product = get_object_or_404(
-        Product, category__slug=category_slug, slug=product_slug
+        ProductDetailSerializer.narrow_queryset(Product.objects, fields),
+        category__slug=category_slug, slug=product_slug,
     )
-    serializer = ProductDetailSerializer(product)
+    serializer = ProductDetailSerializer(product, fields=fields, context={
+        'similar_ranking': request.query_params.get('similar_ranking'),
+    })
     return Response(serializer.data)
 
 @api_view(['GET'])
 def query_product_list(request):
+    """
+    Searches the available products.
+
+    Matching and ranking are delegated to the search backend configured in
+    `settings.STORE_SEARCH_BACKEND`; only the products on the requested
+    page are loaded from the database.
+
+    Query parameters:
+        query (str, optional): Search terms, each matched as a word prefix
+            against product names and descriptions.
+
+    Returns:
+        Response: A paginated JSON response of products, most relevant
+        first. Without a query, all available products are listed.
+        Supports the same pagination and fieldset options as
+        `product_list`.
+    """
     query = request.query_params.get('query')
-    
+    try:
+        serializer = narrow_serializer(request, product_rows)
+    except InvalidFieldset as error:
+        return Response({'error': str(error)}, status=400)
+    paginator = get_product_paginator(request)
+
     if query:
-        products = Product.objects.filter(product_name__icontains=query, is_available=True)
+        ranked_ids = get_backend().search(
+            query, limit=settings.STORE_SEARCH_MAX_RESULTS
+        )
+        page_ids = paginator.paginate_queryset(ranked_ids, request)
+        products = {
+            row['id']: row for row in Product.objects.available()
+            .listing_rows(serializer.values).filter(id__in=page_ids)
+            .order_by()
+        }
+        paginated_products = [
+            products[pk] for pk in page_ids if pk in products
+        ]
     else:
-        products = Product.objects.filter(is_available=True)
-    paginator = PageNumberPagination()
-    paginator.page_size = 6
-    paginated_products = paginator.paginate_queryset(products, request)
-    serializer = ProductSerializer(paginated_products, many=True)
-    return paginator.get_paginated_response(serializer.data)
+        products = Product.objects.available().listing_rows(
+            serializer.values
+        )
+        paginated_products = paginator.paginate_queryset(products, request)
+    return paginator.get_paginated_response(
+        serializer.many(paginated_products)
+    )
+
+
+@api_view(['GET'])
+def catalog_stats(request):
+    """
+    Reports the size, memory budget and hit counters of the catalog snapshot
+    held by the serving process.
+
+    Returns:
+        Response: A JSON object of snapshot statistics.
+    """
+    return Response(catalog.get_stats())
+
+
+FEED_FIELDS = (
+    'id', 'product_name', 'slug', 'description', 'price', 'image', 'stock',
+    'category__slug', 'available_colors', 'available_sizes', 'date_modified',
+)
+
+
+def _feed_lines(rows, request):
+    """
+    Encodes feed rows as newline-delimited JSON.
+    """
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        row['category'] = row.pop('category__slug')
+        if row['image']:
+            row['image'] = request.build_absolute_uri(
+                default_storage.url(row['image'])
+            )
+        else:
+            row['image'] = None
+        yield encoder.encode(row) + '\n'
+
+
+@require_GET
+def product_feed(request):
+    """
+    Streams every available product as NDJSON, one JSON object per line.
+
+    Rows are read with `.values()` in chunks of `settings.FEED_CHUNK_SIZE`
+    and written as they arrive, so memory stays flat and no model
+    instances are created.
+
+    Query parameters:
+        category (str, optional): Only products in this category slug.
+        since (str, optional): ISO 8601 timestamp; only products modified
+            after it.
+
+    Returns:
+        StreamingHttpResponse: An `application/x-ndjson` stream ordered by
+        product id.
+    """
+    products = Product.objects.available().order_by('id')
+    category_slug = request.GET.get('category')
+    if category_slug:
+        products = products.filter(category__slug=category_slug)
+    since = request.GET.get('since')
+    if since:
+        since = parse_datetime(since)
+        if since is None:
+            return JsonResponse(
+                {'error': 'since must be an ISO 8601 timestamp'}, status=400
+            )
+        products = products.filter(date_modified__gt=since)
+
+    rows = products.values(*FEED_FIELDS).iterator(
+        chunk_size=settings.FEED_CHUNK_SIZE
+    )
+    return StreamingHttpResponse(
+        _feed_lines(rows, request), content_type='application/x-ndjson'
+    )
+
+
+@api_view(['GET'])
+def product_delta(request):
+    """
+    Returns the products created, updated or deleted since a watermark.
+
+    Query parameters:
+        since (str, optional): The `watermark` of the previous response.
+            Without it, or when it is older than the tombstone retention,
+            every available product is returned with `reset` set.
+
+    Returns:
+        Response: `watermark`, `reset`, `updated` (serialized products) and
+        `deleted` (ids of deleted or no longer available products).
+    """
+    try:
+        since, watermark, reset = get_delta_window(request)
+    except InvalidWatermark as error:
+        return Response({'error': str(error)}, status=400)
+
+    products = Product.objects.for_listing().order_by('date_modified', 'id')
+    deleted = []
+    if since is not None:
+        products = products.filter(date_modified__gt=since)
+        deleted = list(ProductTombstone.objects.filter(
+            deleted_at__gt=since
+        ).values_list('product_id', flat=True))
+        deleted += products.filter(
+            is_available=False
+        ).values_list('id', flat=True)
+    serializer = ProductSerializer(products.available(), many=True)
+    return Response(
+        delta_response_data(serializer.data, deleted, watermark, reset)
+    )
+
+
+@require_GET
+async def async_product_list(request, category_slug=None):
+    """
+    Async variant of `product_list`.
+
+    The count and the page are read with the async ORM; the category is
+    joined in, so serialization needs no further queries. Supports
+    page-number pagination with a count only: `?pagination=cursor`, a
+    `cursor` or `count=false` is answered with 400 rather than ignored.
+    Responses are not cached.
+    """
+    if (request.GET.get('pagination') == 'cursor' or 'cursor' in request.GET
+            or request.GET.get('count', '').lower() in ('false', '0', 'no')):
+        return JsonResponse({
+            'error': 'only page-number pagination with a count is supported'
+        }, status=400)
+    try:
+        serializer = narrow_serializer(request, product_rows)
+    except InvalidFieldset as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    products = Product.objects.available().listing_rows(serializer.values)
+    if category_slug:
+        products = products.filter(category__slug=category_slug)
+    try:
+        page, data = await apaginate(products, request)
+    except Http404 as error:
+        return JsonResponse({'detail': str(error)}, status=404)
+    data['results'] = serializer.many(page)
+    return JsonResponse(data)
+
+
+@require_GET
+async def async_product_details(request, category_slug, product_slug):
+    """
+    Async variant of `product_details`.
+
+    Similar products come from the cache or the database through
+    synchronous helpers, so serialization runs in a worker thread.
+    """
+    try:
+        fields, _ = get_fieldset(request, ProductDetailSerializer.Meta.fields)
+    except InvalidFieldset as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    products = Product.objects.select_related('category')
+    if fields is not None:
+        products = ProductDetailSerializer.narrow_queryset(
+            Product.objects.all(), fields
+        )
+    try:
+        product = await products.aget(
+            category__slug=category_slug, slug=product_slug
+        )
+    except Product.DoesNotExist:
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+    serializer = ProductDetailSerializer(product, fields=fields, context={
+        'similar_ranking': request.GET.get('similar_ranking'),
+    })
+    data = await sync_to_async(lambda: serializer.data)()
+    return JsonResponse(data)